@@ -1,32 +1,89 @@
 from .algorithms import (
+    ALGORITHM_VERSION,
     adjust_for_inorganic,
+    assignment_tolerances,
+    assignment_tolerances_batch,
     base_sugar_matrix,
+    bottleneck_lexicographic_algorithm,
+    bottleneck_max_algorithm,
+    bottleneck_max_batch,
     braunschweig,
+    capacity_greedy_algorithm,
+    capacity_greedy_then_thrifty,
+    capacity_thrifty_algorithm,
+    capacity_thrifty_then_greedy,
     greedy_algorithm,
+    greedy_batch,
     greedy_then_thrifty,
+    greedy_then_thrifty_batch,
     hungarian_max_algorithm,
+    hungarian_max_batch,
+    hungarian_max_k_best,
+    hungarian_max_potentials,
+    hungarian_max_potentials_batch,
     inorganic_matrix,
+    lookahead_batch,
     merge_matrices,
     random_matrix,
+    rollout_batch,
     thrifty_algorithm,
+    thrifty_batch,
     thrifty_then_greedy,
+    thrifty_then_greedy_batch,
+    transportation_max_algorithm,
+    uniform_matrix_batch,
     concentrated_matrix,
+    concentrated_matrix_batch,
     calculate_losses_matrix,
+    losses_matrix_from_i0,
+    losses_matrix_from_i0_batch,
+    sugar_matrix_from_initial,
 )
+from .strategies import STRATEGIES, Strategy, register_strategy, unregister_strategy
 
 
 __all__ = [
+    "ALGORITHM_VERSION",
     "adjust_for_inorganic",
+    "assignment_tolerances",
+    "assignment_tolerances_batch",
     "base_sugar_matrix",
+    "bottleneck_lexicographic_algorithm",
+    "bottleneck_max_algorithm",
+    "bottleneck_max_batch",
     "braunschweig",
+    "capacity_greedy_algorithm",
+    "capacity_greedy_then_thrifty",
+    "capacity_thrifty_algorithm",
+    "capacity_thrifty_then_greedy",
     "greedy_algorithm",
+    "greedy_batch",
     "greedy_then_thrifty",
+    "greedy_then_thrifty_batch",
     "hungarian_max_algorithm",
+    "hungarian_max_batch",
+    "hungarian_max_k_best",
+    "hungarian_max_potentials",
+    "hungarian_max_potentials_batch",
     "inorganic_matrix",
+    "lookahead_batch",
     "merge_matrices",
     "random_matrix",
+    "rollout_batch",
     "thrifty_algorithm",
+    "thrifty_batch",
     "thrifty_then_greedy",
+    "thrifty_then_greedy_batch",
+    "transportation_max_algorithm",
+    "uniform_matrix_batch",
     "concentrated_matrix",
+    "concentrated_matrix_batch",
     "calculate_losses_matrix",
+    "losses_matrix_from_i0",
+    "losses_matrix_from_i0_batch",
+    "sugar_matrix_from_initial",
+    "STRATEGIES",
+    "Strategy",
+    "register_strategy",
+    "unregister_strategy",
 ]
@@ -1,14 +1,31 @@
 from __future__ import annotations  
 
+import heapq
+import itertools
+import os
 import random
-from typing import List, Sequence, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Protocol, Sequence, Tuple
 
 import numpy as np
-from scipy.optimize import linear_sum_assignment
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linear_sum_assignment, linprog, milp
+from scipy.sparse.csgraph import maximum_bipartite_matching
+
+# Bump whenever a change here or in the simulation alters results: compiled
+# builds have no sources to tell saved models of the old code apart.
+ALGORITHM_VERSION = 1
 
 Matrix = List[List[float]]
 
 
+class UniformSource(Protocol):
+    """Anything drawing uniform values like the ``random`` module"""
+
+    def uniform(self, a: float, b: float) -> float: ...
+
+
 def _validate_dimensions(matrix: Sequence[Sequence[float]]) -> None:
     """Ensure the matrix is rectangular and not empty"""
     if not matrix:
@@ -21,18 +38,20 @@ def _validate_dimensions(matrix: Sequence[Sequence[float]]) -> None:
             raise ValueError("All matrix rows must have the same length.")
 
 
-def random_matrix(rows: int, cols: int, min_value: float, max_value: float) -> Matrix:
+def random_matrix(
+    rows: int, cols: int, min_value: float, max_value: float, rng: UniformSource = random
+) -> Matrix:
     """Generate a matrix populated with random values in the given range"""
     if rows <= 0 or cols <= 0:
         raise ValueError("Matrix dimensions must be positive.")
     if min_value > max_value:
         raise ValueError("Minimum value cannot exceed maximum value.")
 
-    return [[random.uniform(min_value, max_value) for _ in range(cols)] for _ in range(rows)]
+    return [[rng.uniform(min_value, max_value) for _ in range(cols)] for _ in range(rows)]
 
 
 def concentrated_matrix(
-    rows: int, cols: int, min_val: float, max_val: float
+    rows: int, cols: int, min_val: float, max_val: float, rng: UniformSource = random
 ) -> Matrix:
     """Generates a matrix with concentrated distribution"""
     if rows <= 0 or cols <= 0:
@@ -44,22 +63,46 @@ def concentrated_matrix(
 
     matrix: Matrix = []
     for _ in range(rows):
-        delta_i = random.uniform(0, base_delta) if base_delta > 0 else 0.0
+        delta_i = rng.uniform(0, base_delta) if base_delta > 0 else 0.0
 
         if delta_i == 0:
-            beta_i1 = beta_i2 = random.uniform(min_val, max_val)
+            beta_i1 = beta_i2 = rng.uniform(min_val, max_val)
         else:
-            beta_i1 = random.uniform(min_val, max_val - delta_i)
+            beta_i1 = rng.uniform(min_val, max_val - delta_i)
             beta_i2 = beta_i1 + delta_i
 
-        row = [random.uniform(beta_i1, beta_i2) for _ in range(cols)]
+        row = [rng.uniform(beta_i1, beta_i2) for _ in range(cols)]
         matrix.append(row)
 
     return matrix
 
 
+def uniform_matrix_batch(min_value: float, max_value: float, draws: np.ndarray) -> np.ndarray:
+    """Vectorised :func:`random_matrix` from uniforms in ``[0, 1)`` drawn beforehand"""
+    if min_value > max_value:
+        raise ValueError("Minimum value cannot exceed maximum value.")
+    return min_value + (max_value - min_value) * np.asarray(draws, dtype=float)
+
+
+def concentrated_matrix_batch(
+    min_val: float, max_val: float, row_draws: np.ndarray, draws: np.ndarray
+) -> np.ndarray:
+    """Vectorised :func:`concentrated_matrix` from uniforms drawn beforehand.
+
+    ``row_draws[..., 0]`` and ``row_draws[..., 1]`` place each row's width and
+    band; ``draws`` has one extra trailing axis with the values of the row.
+    """
+    if min_val > max_val:
+        raise ValueError("Minimum value cannot exceed maximum value.")
+    base_delta = (max_val - min_val) / 4
+    delta = np.asarray(row_draws[..., 0], dtype=float) * base_delta
+    beta = min_val + np.asarray(row_draws[..., 1], dtype=float) * (max_val - delta - min_val)
+    return beta[..., np.newaxis] + delta[..., np.newaxis] * np.asarray(draws, dtype=float)
+
+
 def base_sugar_matrix(
-    size: int, min_sugar: float, max_sugar: float, coefficients: Matrix
+    size: int, min_sugar: float, max_sugar: float, coefficients: Matrix,
+    rng: UniformSource = random,
 ) -> Matrix:
     """Generate the base sugar matrix using coefficient multipliers for each day"""
     if size <= 0:
@@ -72,9 +115,22 @@ def base_sugar_matrix(
     if min_sugar > max_sugar:
         raise ValueError("Minimum sugar cannot exceed maximum sugar.")
 
+    initial_sugar = [rng.uniform(min_sugar, max_sugar) for _ in range(size)]
+    return sugar_matrix_from_initial(initial_sugar, coefficients)
+
+
+def sugar_matrix_from_initial(initial_sugar: Sequence[float], coefficients: Matrix) -> Matrix:
+    """Build the sugar matrix from known initial values and daily coefficient multipliers"""
+    size = len(initial_sugar)
+    if size == 0:
+        raise ValueError("Size must be positive.")
+    _validate_dimensions(coefficients)
+    if len(coefficients) != size or any(len(row) != size for row in coefficients):
+        raise ValueError("Coefficient matrix must be square with dimensions equal to size.")
+
     matrix = [[0.0 for _ in range(size)] for _ in range(size)]
     for variety in range(size):
-        matrix[variety][0] = random.uniform(min_sugar, max_sugar)
+        matrix[variety][0] = initial_sugar[variety]
         for day in range(1, size):
             matrix[variety][day] = matrix[variety][day - 1] * coefficients[variety][day]
     return matrix
@@ -102,7 +158,8 @@ def first_available_index(used_indices: Sequence[int], size: int) -> int:
 
 
 def inorganic_matrix(
-    size: int, min_k: float, max_k: float, min_na: float, max_na: float, min_n: float, max_n: float
+    size: int, min_k: float, max_k: float, min_na: float, max_na: float, min_n: float, max_n: float,
+    rng: UniformSource = random,
 ) -> Matrix:
     """Generate inorganic compound measurements for each variety"""
     if size <= 0:
@@ -116,7 +173,7 @@ def inorganic_matrix(
             raise ValueError(f"Minimum {label} value cannot exceed its maximum.")
 
     return [
-        [random.uniform(min_k, max_k), random.uniform(min_na, max_na), random.uniform(min_n, max_n)]
+        [rng.uniform(min_k, max_k), rng.uniform(min_na, max_na), rng.uniform(min_n, max_n)]
         for _ in range(size)
     ]
 
@@ -267,26 +324,932 @@ def hungarian_max_algorithm(matrix: Matrix) -> Tuple[List[float], List[int]]:
     return totals, permutation
 
 
-def calculate_losses_matrix(size: int, inorganic: Matrix, i0_min: float, i0_max: float) -> Matrix:
-    """Sugar loss matrix by days"""
-    losses = [[0.0 for _ in range(size)] for _ in range(size)]
+def _validate_stack(stack: np.ndarray) -> np.ndarray:
+    values = np.asarray(stack, dtype=float)
+    if values.ndim != 3 or values.shape[1] != values.shape[2] or values.shape[1] == 0:
+        raise ValueError("Stack must have shape k x n x n with n > 0.")
+    return values
+
+
+def _select_batch(values: np.ndarray, pick_max: Sequence[bool]) -> Tuple[np.ndarray, np.ndarray]:
+    """Column-by-column selection over a stack of matrices, like ``_select_by_strategy``"""
+    count, size, _ = values.shape
+    used = np.zeros((count, size), dtype=bool)
+    permutations = np.empty((count, size), dtype=int)
+    picked = np.empty((count, size))
+    experiments = np.arange(count)
+    for column in range(size):
+        current = values[:, :, column]
+        if pick_max[column]:
+            index = np.where(used, -np.inf, current).argmax(axis=1)
+        else:
+            index = np.where(used, np.inf, current).argmin(axis=1)
+        used[experiments, index] = True
+        permutations[:, column] = index
+        picked[:, column] = current[experiments, index]
+    return np.cumsum(picked, axis=1), permutations
+
 
-    for row_idx in range(size):
-        K, Na, N = inorganic[row_idx]
-        I0 = random.uniform(i0_min, i0_max)
+def greedy_batch(stack: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`greedy_algorithm` over a ``k x n x n`` stack"""
+    values = _validate_stack(stack)
+    return _select_batch(values, [True] * values.shape[1])
 
-        for day in range(size):
-            j = day + 1
-            I_curr = I0 * (1.029 ** (j - 7))
 
-            loss_melassa = (
-                0.1541 * (K + Na)
-                + 0.2159 * N
-                + 0.9989 * I_curr
-                + 0.1967
-            )
+def thrifty_batch(stack: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`thrifty_algorithm` over a ``k x n x n`` stack"""
+    values = _validate_stack(stack)
+    return _select_batch(values, [False] * values.shape[1])
 
-            total_loss = 1.1 + loss_melassa
-            losses[row_idx][day] = total_loss
 
-    return losses
+def greedy_then_thrifty_batch(
+    stack: np.ndarray, ripening_period: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`greedy_then_thrifty` over a ``k x n x n`` stack"""
+    values = _validate_stack(stack)
+    size = values.shape[1]
+    if ripening_period < 0 or ripening_period > size:
+        raise ValueError("Ripening period must be between 0 and the matrix size.")
+    return _select_batch(values, [column < ripening_period for column in range(size)])
+
+
+def thrifty_then_greedy_batch(
+    stack: np.ndarray, ripening_period: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised :func:`thrifty_then_greedy` over a ``k x n x n`` stack"""
+    values = _validate_stack(stack)
+    size = values.shape[1]
+    if ripening_period < 0 or ripening_period > size:
+        raise ValueError("Ripening period must be between 0 and the matrix size.")
+    return _select_batch(values, [column >= ripening_period for column in range(size)])
+
+
+_SOLVER_POOL: Optional[ThreadPoolExecutor] = None
+_SOLVER_LOCK = threading.Lock()
+
+
+def _solver_pool() -> ThreadPoolExecutor:
+    global _SOLVER_POOL
+    with _SOLVER_LOCK:
+        if _SOLVER_POOL is None:
+            _SOLVER_POOL = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="hungarian")
+        return _SOLVER_POOL
+
+
+def _reset_solver_pool() -> None:
+    # Threads do not survive a fork; forked worker processes start their own pool.
+    global _SOLVER_POOL, _SOLVER_LOCK
+    _SOLVER_POOL = None
+    _SOLVER_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_solver_pool)
+
+
+def hungarian_max_batch(
+    stack: np.ndarray, workers: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """:func:`hungarian_max_algorithm` over a ``k x n x n`` stack.
+
+    Returns ``k x n`` cumulative totals in day order and ``k x n`` plans
+    (``plan[d]`` is the batch of day ``d``). The stack is split into one
+    contiguous slice per worker; the SciPy solver releases the GIL, so the
+    slices are solved in parallel on a shared thread pool. Each slice negates
+    its matrices into one reused workspace and writes the plans straight into
+    the output array.
+    """
+    values = _validate_stack(stack)
+    count, size, _ = values.shape
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("Number of workers must be positive.")
+    # An empty stack runs the (no-op) solve inline.
+    workers = max(1, min(workers, count))
+    permutations = np.empty((count, size), dtype=int)
+
+    def solve(start: int, stop: int) -> None:
+        workspace = np.empty((size, size))
+        for index in range(start, stop):
+            np.negative(values[index], out=workspace)
+            rows, cols = linear_sum_assignment(workspace)
+            permutations[index, cols] = rows
+
+    bounds = np.linspace(0, count, workers + 1).astype(int)
+    if workers == 1:
+        solve(0, count)
+    else:
+        pool = _solver_pool()
+        for task in [pool.submit(solve, start, stop)
+                     for start, stop in zip(bounds[:-1], bounds[1:])]:
+            task.result()
+
+    picked = values[np.arange(count)[:, np.newaxis], permutations, np.arange(size)]
+    return np.cumsum(picked, axis=1, out=picked), permutations
+
+
+def _top_matching(order: np.ndarray, count: int, size: int) -> np.ndarray:
+    """Plan using only the ``count`` largest entries; days left unmatched get -1"""
+    entries = order[:count]
+    graph = sparse.csr_matrix(
+        (np.ones(count, dtype=bool), (entries // size, entries % size)), shape=(size, size))
+    return maximum_bipartite_matching(graph, perm_type="row")
+
+
+def bottleneck_max_plan(values: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Largest worst-day value over all plans and a plan that reaches it.
+
+    No plan beats the smallest row or column maximum, so every entry above it
+    can always be used. The answer is the number of further entries, taken
+    largest first, that completes a perfect matching, found with
+    Hopcroft-Karp on the sparse graph of the usable entries. Only a growing
+    slice of the remaining entries is selected and sorted, and the search
+    gallops up from the bound before it bisects, so it stays close to the
+    answer whether that lies near the top of the matrix or near its bottom.
+    """
+    size = len(values)
+    flat = values.ravel()
+    cover = min(values.max(axis=0).min(), values.max(axis=1).min())
+    head = np.flatnonzero(flat > cover)
+    rest = np.flatnonzero(flat <= cover)
+    slack = 4 * size
+    while True:
+        if slack < len(rest):
+            tail = rest[np.argpartition(-flat[rest], slack - 1)[:slack]]
+        else:
+            tail = rest
+        order = np.concatenate([head, tail[np.argsort(-flat[tail], kind="stable")]])
+        plan = _top_matching(order, len(order), size)
+        if (plan >= 0).all():
+            break
+        slack *= 4
+
+    # ``low`` leading entries are known to be too few, ``high`` enough.
+    low, high, step = len(head), len(order), 1
+    while low + 1 < high:
+        middle = min(low + step, (low + high) // 2)
+        matching = _top_matching(order, middle, size)
+        if (matching >= 0).all():
+            high, plan = middle, matching
+        else:
+            low, step = middle, 2 * step
+    return float(flat[order[high - 1]]), plan
+
+
+def _best_total_above(values: np.ndarray, bottleneck: float) -> np.ndarray:
+    """Plan with the largest total among those using no entry below ``bottleneck``"""
+    costs = np.where(values >= bottleneck, -values, np.inf)
+    rows, cols = linear_sum_assignment(costs)
+    plan = np.empty(len(values), dtype=int)
+    plan[cols] = rows
+    return plan
+
+
+def bottleneck_lexicographic_plan(values: np.ndarray) -> np.ndarray:
+    """Plan with the best worst day and, among those, the largest total"""
+    bottleneck, _ = bottleneck_max_plan(values)
+    return _best_total_above(values, bottleneck)
+
+
+def _plan_algorithm(
+    matrix: Matrix, solve: Callable[[np.ndarray], np.ndarray]
+) -> Tuple[List[float], List[int]]:
+    _validate_dimensions(matrix)
+    size = len(matrix)
+    if any(len(row) != size for row in matrix):
+        raise ValueError("Matrix must be square for the assignment algorithms.")
+    values = np.array(matrix, dtype=float)
+    plan = solve(values)
+    return np.cumsum(values[plan, np.arange(size)]).tolist(), plan.tolist()
+
+
+def bottleneck_max_algorithm(matrix: Matrix) -> Tuple[List[float], List[int]]:
+    """Maximize the sugar of the worst day (bottleneck assignment)"""
+    return _plan_algorithm(matrix, lambda values: bottleneck_max_plan(values)[1])
+
+
+def bottleneck_lexicographic_algorithm(matrix: Matrix) -> Tuple[List[float], List[int]]:
+    """Maximize the worst day first, then the total sugar"""
+    return _plan_algorithm(matrix, bottleneck_lexicographic_plan)
+
+
+# Largest matrix size searched by :func:`bottleneck_max_batch` as one stack.
+STACKED_BOTTLENECK_SIZE = 40
+
+
+def _stack_matching(order: np.ndarray, counts: np.ndarray, size: int) -> np.ndarray:
+    """:func:`_top_matching` of every matrix of a stack, with ``counts[i]`` entries of matrix ``i``.
+
+    The graphs of the matrices are the diagonal blocks of one sparse graph,
+    so a single Hopcroft-Karp call matches them all.
+    """
+    count = len(counts)
+    matrix, position = np.nonzero(np.arange(order.shape[1]) < counts[:, np.newaxis])
+    entries = order[matrix, position]
+    offset = matrix * size
+    graph = sparse.csr_matrix(
+        (np.ones(len(entries), dtype=bool), (offset + entries // size, offset + entries % size)),
+        shape=(count * size, count * size))
+    matching = maximum_bipartite_matching(graph, perm_type="row").reshape(count, size)
+    offsets = (np.arange(count) * size)[:, np.newaxis]
+    return np.where(matching >= 0, matching - offsets, -1)
+
+
+def bottleneck_max_batch(
+    stack: np.ndarray, lexicographic: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """:func:`bottleneck_max_algorithm` (or its lexicographic variant) over a ``k x n x n`` stack.
+
+    For small matrices the prefix search of :func:`bottleneck_max_plan` runs
+    for all of them at once: every step tests the prefixes of the matrices
+    still searching in one matching over the block-diagonal graph, so the
+    number of solver calls grows with the number of steps, not with ``k``.
+    Larger matrices, whose graphs dwarf the per-call overhead, are searched
+    one at a time.
+    """
+    values = _validate_stack(stack)
+    count, size, _ = values.shape
+    if count == 0:
+        return np.empty((0, size)), np.empty((0, size), dtype=int)
+    if size > STACKED_BOTTLENECK_SIZE:
+        solve = bottleneck_lexicographic_plan if lexicographic else (
+            lambda matrix: bottleneck_max_plan(matrix)[1])
+        permutations = np.array([solve(matrix) for matrix in values], dtype=int)
+        picked = values[np.arange(count)[:, np.newaxis], permutations, np.arange(size)]
+        return np.cumsum(picked, axis=1, out=picked), permutations
+
+    flat = values.reshape(count, -1)
+    order = np.argsort(-flat, axis=1, kind="stable")
+    cover = np.minimum(values.max(axis=1).min(axis=1), values.max(axis=2).min(axis=1))
+
+    # ``low`` leading entries are known to be too few, ``high`` enough.
+    low = (flat > cover[:, np.newaxis]).sum(axis=1)
+    high = np.full(count, size * size)
+    step = np.ones(count, dtype=int)
+    permutations = np.full((count, size), -1)
+    while True:
+        active = np.flatnonzero(low + 1 < high)
+        if not len(active):
+            break
+        middle = np.minimum(low[active] + step[active], (low[active] + high[active]) // 2)
+        matching = _stack_matching(order[active], middle, size)
+        found = (matching >= 0).all(axis=1)
+        high[active[found]] = middle[found]
+        permutations[active[found]] = matching[found]
+        low[active[~found]] = middle[~found]
+        step[active[~found]] *= 2
+    # Matrices that needed every entry were never matched at ``high``.
+    missing = np.flatnonzero((permutations < 0).any(axis=1))
+    if len(missing):
+        permutations[missing] = _stack_matching(order[missing], high[missing], size)
+
+    if lexicographic:
+        bottlenecks = flat[np.arange(count), order[np.arange(count), high - 1]]
+        for index in range(count):
+            permutations[index] = _best_total_above(values[index], bottlenecks[index])
+    picked = values[np.arange(count)[:, np.newaxis], permutations, np.arange(size)]
+    return np.cumsum(picked, axis=1, out=picked), permutations
+
+
+def _axis_shape(count: int, width: int, *axes: int) -> Tuple[int, ...]:
+    shape = [count] + [1] * width
+    for axis in axes:
+        shape[axis + 1] = width
+    return tuple(shape)
+
+
+def lookahead_batch(stack: np.ndarray, depth: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Process, on each day, the batch of the best assignment of the next ``depth`` days.
+
+    Only the columns of the current window are read, as with a forecast of
+    ``depth`` days. The window optimum only ever gives a day one of that day's
+    ``depth`` best remaining batches, so it is found among those
+    ``depth ** depth`` combinations, scored for the whole stack at once.
+    """
+    values = _validate_stack(stack)
+    if depth <= 0:
+        raise ValueError("Lookahead depth must be positive.")
+    count, size, _ = values.shape
+    experiments = np.arange(count)
+    used = np.zeros((count, size), dtype=bool)
+    permutations = np.empty((count, size), dtype=int)
+    picked = np.empty((count, size))
+
+    for day in range(size):
+        width = min(depth, size - day)
+        window = np.where(used[:, :, np.newaxis], -np.inf, values[:, :, day:day + width])
+        best_rows = np.argpartition(-window, width - 1, axis=1)[:, :width, :]
+        best_values = np.take_along_axis(window, best_rows, axis=1)
+
+        # gains[e, r0, ..., rw] is the window total when day j takes its rj-th best batch.
+        gains = np.zeros((count,) + (width,) * width)
+        for column in range(width):
+            gains = gains + best_values[:, :, column].reshape(_axis_shape(count, width, column))
+        for left, right in itertools.combinations(range(width), 2):
+            clash = best_rows[:, :, left, np.newaxis] == best_rows[:, np.newaxis, :, right]
+            gains[np.broadcast_to(
+                clash.reshape(_axis_shape(count, width, left, right)), gains.shape)] = -np.inf
+        rank = gains.reshape(count, width ** width).argmax(axis=1) // width ** (width - 1)
+        index = best_rows[experiments, rank, 0]
+
+        used[experiments, index] = True
+        permutations[:, day] = index
+        picked[:, day] = values[experiments, index, day]
+    return np.cumsum(picked, axis=1), permutations
+
+
+def rollout_batch(
+    stack: np.ndarray, depth: int = 3, candidates: int = 8
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Greedy rollout: score today's best ``candidates`` by ``depth`` days of greedy play.
+
+    Each candidate is scored by its sugar today plus what :func:`greedy_algorithm`
+    would collect over the following ``depth`` days without it; the best
+    candidate is processed. All candidates of all experiments are simulated
+    together, so a day costs ``O(depth * candidates * n)`` per experiment.
+    """
+    values = _validate_stack(stack)
+    if depth < 0:
+        raise ValueError("Rollout depth cannot be negative.")
+    if candidates <= 0:
+        raise ValueError("Candidate count must be positive.")
+    count, size, _ = values.shape
+    experiments = np.arange(count)[:, np.newaxis]
+    used = np.zeros((count, size), dtype=bool)
+    permutations = np.empty((count, size), dtype=int)
+    picked = np.empty((count, size))
+
+    for day in range(size):
+        today = np.where(used, -np.inf, values[:, :, day])
+        width = min(candidates, size - day)
+        options = np.argpartition(-today, width - 1, axis=1)[:, :width]
+        scores = today[experiments, options]
+
+        simulated = np.repeat(used[:, np.newaxis, :], width, axis=1)
+        lanes = np.arange(width)[np.newaxis, :]
+        simulated[experiments, lanes, options] = True
+        for step in range(1, min(depth, size - day - 1) + 1):
+            future = np.where(simulated, -np.inf, values[:, np.newaxis, :, day + step])
+            choice = future.argmax(axis=2)
+            scores += np.take_along_axis(future, choice[:, :, np.newaxis], axis=2)[:, :, 0]
+            simulated[experiments, lanes, choice] = True
+
+        index = options[experiments[:, 0], scores.argmax(axis=1)]
+        used[experiments[:, 0], index] = True
+        permutations[:, day] = index
+        picked[:, day] = values[experiments[:, 0], index, day]
+    return np.cumsum(picked, axis=1), permutations
+
+
+def _validate_capacities(
+    matrix: Matrix, masses: Sequence[float], capacities: Sequence[float]
+) -> np.ndarray:
+    _validate_dimensions(matrix)
+    values = np.array(matrix, dtype=float)
+    rows, cols = values.shape
+    if len(masses) != rows:
+        raise ValueError("Each batch must have exactly one mass.")
+    if len(capacities) != cols:
+        raise ValueError("Each day must have exactly one capacity.")
+    if min(masses) < 0 or min(capacities) < 0:
+        raise ValueError("Masses and capacities cannot be negative.")
+    if sum(masses) > sum(capacities) * (1 + 1e-9):
+        raise ValueError("Total batch mass exceeds the total processing capacity.")
+    return values
+
+
+def _plan_totals(values: np.ndarray, plan: np.ndarray) -> Tuple[List[float], Matrix]:
+    daily = (plan * values).sum(axis=0) / 100.0
+    return np.cumsum(daily).tolist(), plan.tolist()
+
+
+def transportation_max_algorithm(
+    matrix: Matrix, masses: Sequence[float], capacities: Sequence[float]
+) -> Tuple[List[float], Matrix]:
+    """Split batch masses across days to maximise sugar under daily capacities.
+
+    ``matrix[i][j]`` is the sugar content (%) of batch ``i`` on day ``j``. Returns
+    the cumulative sugar (t) by day and the plan of tonnes of each batch per day.
+    """
+    values = _validate_capacities(matrix, masses, capacities)
+    rows, cols = values.shape
+
+    variables = np.arange(rows * cols)
+    batch_rows = sparse.csr_matrix(
+        (np.ones(rows * cols), (variables // cols, variables)), shape=(rows, rows * cols))
+    day_rows = sparse.csr_matrix(
+        (np.ones(rows * cols), (variables % cols, variables)), shape=(cols, rows * cols))
+
+    solution = linprog(
+        -values.ravel(),
+        A_ub=day_rows,
+        b_ub=np.asarray(capacities, dtype=float),
+        A_eq=batch_rows,
+        b_eq=np.asarray(masses, dtype=float),
+        bounds=(0, None),
+        method="highs",
+    )
+    if not solution.success:
+        raise ValueError(f"Transportation problem could not be solved: {solution.message}")
+
+    plan = np.maximum(solution.x.reshape(rows, cols), 0.0)
+    return _plan_totals(values, plan)
+
+
+def plan_totals_batch(stack: np.ndarray, permutation: Sequence[int]) -> np.ndarray:
+    """Cumulative totals (``k x n``) of one fixed plan on every matrix of ``stack``"""
+    values = _validate_stack(stack)
+    plan = np.asarray(permutation, dtype=int)
+    if sorted(plan.tolist()) != list(range(values.shape[1])):
+        raise ValueError("Plan must be a permutation of the batches.")
+    return np.cumsum(values[:, plan, np.arange(values.shape[1])], axis=1)
+
+
+# Scenario-exchange cells (32 MiB of float64) scored at once by the swap search.
+_SWAP_CELLS = 1 << 22
+
+
+def _tail_mean(totals: np.ndarray, tail: int) -> np.ndarray:
+    # Mean of the ``tail`` smallest values along the last axis.
+    return np.partition(totals, tail - 1, axis=-1)[..., :tail].mean(axis=-1)
+
+
+def _assignment_plan(matrix: np.ndarray) -> np.ndarray:
+    rows, cols = linear_sum_assignment(matrix, maximize=True)
+    plan = np.empty(len(cols), dtype=int)
+    plan[cols] = rows
+    return plan
+
+
+def _swap_search(values: np.ndarray, plan: np.ndarray, tail: int) -> Tuple[np.ndarray, float]:
+    """Best-improvement search over exchanges of two days' batches"""
+    plan = plan.copy()
+    count, size, _ = values.shape
+    first, second = np.triu_indices(size, 1)
+    step = max(1, _SWAP_CELLS // max(count, 1))
+    while True:
+        finals = values[:, plan, np.arange(size)].sum(axis=1)
+        current = float(_tail_mean(finals, tail))
+        best, best_value = -1, current + 1e-12
+        for start in range(0, len(first), step):
+            i, j = first[start:start + step], second[start:start + step]
+            delta = (values[:, plan[i], j] + values[:, plan[j], i]
+                     - values[:, plan[i], i] - values[:, plan[j], j])
+            candidates = _tail_mean((finals[:, np.newaxis] + delta).T, tail)
+            index = int(candidates.argmax())
+            if candidates[index] > best_value:
+                best, best_value = start + index, float(candidates[index])
+        if best < 0:
+            return plan, current
+        plan[first[best]], plan[second[best]] = plan[second[best]], plan[first[best]]
+
+
+def _cvar_milp(values: np.ndarray, alpha: float, time_limit: float) -> Optional[np.ndarray]:
+    count, size, _ = values.shape
+    cells = size * size
+
+    variables = np.arange(cells)
+    assignment = sparse.vstack([
+        sparse.csr_matrix((np.ones(cells), (variables // size, variables)), shape=(size, cells)),
+        sparse.csr_matrix((np.ones(cells), (variables % size, variables)), shape=(size, cells)),
+    ])
+    # Columns: plan cells, eta, one shortfall u_s per scenario.
+    scenario_rows = sparse.hstack([
+        sparse.csr_matrix(-values.reshape(count, cells)),
+        sparse.csr_matrix(np.ones((count, 1))),
+        -sparse.identity(count, format="csr"),
+    ])
+    constraints = [
+        LinearConstraint(
+            sparse.hstack([assignment, sparse.csr_matrix((2 * size, 1 + count))]), 1.0, 1.0),
+        LinearConstraint(scenario_rows, -np.inf, 0.0),
+    ]
+    objective = np.concatenate([np.zeros(cells), [-1.0], np.full(count, 1.0 / (alpha * count))])
+    integrality = np.concatenate([np.ones(cells), np.zeros(1 + count)])
+    bounds = Bounds(
+        np.concatenate([np.zeros(cells), [-np.inf], np.zeros(count)]),
+        np.concatenate([np.ones(cells), [np.inf], np.full(count, np.inf)]),
+    )
+
+    solution = milp(
+        objective,
+        constraints=constraints,
+        integrality=integrality,
+        bounds=bounds,
+        options={"time_limit": time_limit},
+    )
+    if solution.x is None:
+        return None
+    return solution.x[:cells].reshape(size, size).argmax(axis=0)
+
+
+def cvar_max_assignment(stack: np.ndarray, alpha: float, time_limit: float = 0.0) -> List[int]:
+    """Plan maximising the CVaR of total sugar over the scenarios of ``stack``.
+
+    The CVaR at level ``alpha`` is the mean total of the worst ``alpha`` share of
+    scenarios. Starting from the scenario-mean optimum and from the optimum of
+    its worst tail, two-day exchanges are applied while they raise the CVaR,
+    each round scoring the exchanges on every scenario in blocks bounded by
+    ``_SWAP_CELLS``. With a positive ``time_limit`` the Rockafellar-Uryasev MILP
+    is also run for that many seconds and kept if better. ``result[d]`` is the batch processed on day ``d``.
+    """
+    values = _validate_stack(stack)
+    if not 0 < alpha <= 1:
+        raise ValueError("CVaR level must be in (0, 1].")
+    if not len(values):
+        raise ValueError("No scenarios to plan over.")
+    tail = max(1, int(np.ceil(alpha * values.shape[0])))
+
+    start = _assignment_plan(values.mean(axis=0))
+    finals = values[:, start, np.arange(len(start))].sum(axis=1)
+    worst = np.argpartition(finals, tail - 1)[:tail]
+    starts = [start, _assignment_plan(values[worst].mean(axis=0))]
+    if time_limit > 0:
+        exact = _cvar_milp(values, alpha, time_limit)
+        if exact is not None:
+            starts.append(exact)
+
+    best_plan, best_value = None, -np.inf
+    for plan in starts:
+        plan, value = _swap_search(values, plan, tail)
+        if value > best_value:
+            best_plan, best_value = plan, value
+    return best_plan.tolist()
+
+
+def _fill_by_strategy(
+    values: np.ndarray, masses: Sequence[float], capacities: Sequence[float],
+    pick_max: Sequence[bool],
+) -> Tuple[List[float], Matrix]:
+    rows, cols = values.shape
+    remaining = np.array(masses, dtype=float)
+    plan = np.zeros((rows, cols))
+    for day in range(cols):
+        room = float(capacities[day])
+        order = np.argsort(-values[:, day] if pick_max[day] else values[:, day], kind="stable")
+        for batch in order:
+            if room <= 0:
+                break
+            if remaining[batch] <= 0:
+                continue
+            taken = min(room, remaining[batch])
+            plan[batch, day] = taken
+            remaining[batch] -= taken
+            room -= taken
+    return _plan_totals(values, plan)
+
+
+def capacity_greedy_algorithm(
+    matrix: Matrix, masses: Sequence[float], capacities: Sequence[float]
+) -> Tuple[List[float], Matrix]:
+    """Fill each day with the richest remaining batches"""
+    values = _validate_capacities(matrix, masses, capacities)
+    return _fill_by_strategy(values, masses, capacities, [True] * values.shape[1])
+
+
+def capacity_thrifty_algorithm(
+    matrix: Matrix, masses: Sequence[float], capacities: Sequence[float]
+) -> Tuple[List[float], Matrix]:
+    """Fill each day with the poorest remaining batches"""
+    values = _validate_capacities(matrix, masses, capacities)
+    return _fill_by_strategy(values, masses, capacities, [False] * values.shape[1])
+
+
+def capacity_greedy_then_thrifty(
+    matrix: Matrix, masses: Sequence[float], capacities: Sequence[float], ripening_period: int
+) -> Tuple[List[float], Matrix]:
+    """Greedy filling during ripening, then thrifty filling"""
+    values = _validate_capacities(matrix, masses, capacities)
+    cols = values.shape[1]
+    if ripening_period < 0 or ripening_period > cols:
+        raise ValueError("Ripening period must be between 0 and the number of days.")
+    pick_max = [day < ripening_period for day in range(cols)]
+    return _fill_by_strategy(values, masses, capacities, pick_max)
+
+
+def capacity_thrifty_then_greedy(
+    matrix: Matrix, masses: Sequence[float], capacities: Sequence[float], ripening_period: int
+) -> Tuple[List[float], Matrix]:
+    """Thrifty filling during ripening, then greedy filling"""
+    values = _validate_capacities(matrix, masses, capacities)
+    cols = values.shape[1]
+    if ripening_period < 0 or ripening_period > cols:
+        raise ValueError("Ripening period must be between 0 and the number of days.")
+    pick_max = [day >= ripening_period for day in range(cols)]
+    return _fill_by_strategy(values, masses, capacities, pick_max)
+
+
+def _column_potentials_batch(values: np.ndarray, permutations: np.ndarray) -> np.ndarray:
+    """Shortest-path column prices for optimal permutations (day -> batch) of a stack"""
+    count, size = permutations.shape
+    assigned = values[np.arange(count)[:, np.newaxis], permutations, np.arange(size)]
+    # Edge j -> d with weight a[p, d] - a[p, j], where p is the batch on day d.
+    weights = (assigned[:, :, np.newaxis]
+               - values[np.arange(count)[:, np.newaxis], permutations, :]).transpose(0, 2, 1)
+    prices = np.zeros((count, size))
+    for _ in range(size):
+        relaxed = np.minimum(prices, (prices[:, :, np.newaxis] + weights).min(axis=1))
+        if np.allclose(relaxed, prices, rtol=0.0, atol=1e-12):
+            break
+        prices = relaxed
+    return prices - prices.min(axis=1, keepdims=True)
+
+
+def _column_potentials(values: np.ndarray, permutation: np.ndarray) -> np.ndarray:
+    """Shortest-path column prices for an optimal permutation (day -> batch)"""
+    return _column_potentials_batch(values[np.newaxis], np.asarray(permutation)[np.newaxis])[0]
+
+
+def _prices_batch(values: np.ndarray, permutations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Batch and day prices of a stack for its optimal permutations"""
+    count, size = permutations.shape
+    col_prices = _column_potentials_batch(values, permutations)
+    row_prices = np.empty((count, size))
+    rows = np.arange(count)[:, np.newaxis]
+    row_prices[rows, permutations] = values[rows, permutations, np.arange(size)] - col_prices
+    return row_prices, col_prices
+
+
+def hungarian_max_potentials_batch(
+    stack: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """:func:`hungarian_max_potentials` over a ``k x n x n`` stack.
+
+    Returns ``k x n`` cumulative totals in day order, plans, batch prices and
+    day prices.
+    """
+    values = _validate_stack(stack)
+    totals, permutations = hungarian_max_batch(values)
+    return (totals, permutations) + _prices_batch(values, permutations)
+
+
+def hungarian_max_potentials(
+    matrix: Matrix,
+) -> Tuple[List[float], List[int], List[float], List[float]]:
+    """Solve the maximisation problem and return the LP dual prices as well.
+
+    Returns cumulative totals in day order, the permutation (day -> batch), the
+    row prices of the batches and the column prices of the days. The prices
+    satisfy ``row[i] + col[j] >= matrix[i][j]`` with equality on the chosen plan
+    and sum to the optimum; the cheapest day is normalised to a price of zero.
+    """
+    _, permutation = hungarian_max_algorithm(matrix)
+    values = np.array(matrix, dtype=float)
+    plan = np.array(permutation)
+    totals = np.cumsum(values[plan, np.arange(len(plan))])
+    row_prices, col_prices = _prices_batch(values[np.newaxis], plan[np.newaxis])
+    return totals.tolist(), permutation, row_prices[0].tolist(), col_prices[0].tolist()
+
+
+class _Subproblem:
+    """A solved node of Murty's partition: its plan, duals and constraints.
+
+    Costs are the negated matrix; ``row_duals[i] + col_duals[j] <= cost[i, j]``
+    with equality on the plan. Fixed batches keep their day in every
+    descendant, forbidden entries may not be used. ``blocked`` holds the
+    reduced costs its children search, set once the node is partitioned.
+    """
+
+    __slots__ = ("cost", "row_of_col", "col_of_row", "row_duals", "col_duals", "fixed",
+                 "forbidden", "blocked")
+
+    def __init__(
+        self,
+        cost: float,
+        row_of_col: np.ndarray,
+        row_duals: np.ndarray,
+        col_duals: np.ndarray,
+        fixed: np.ndarray,
+        forbidden: np.ndarray,
+    ) -> None:
+        self.cost = cost
+        self.row_of_col = row_of_col
+        self.col_of_row = np.empty_like(row_of_col)
+        self.col_of_row[row_of_col] = np.arange(len(row_of_col))
+        self.row_duals = row_duals
+        self.col_duals = col_duals
+        self.fixed = fixed
+        self.forbidden = forbidden
+        self.blocked: Optional[np.ndarray] = None
+
+
+def _child_bounds(costs: np.ndarray, node: _Subproblem, rows: np.ndarray) -> np.ndarray:
+    """Lower bounds on the cost of the children forbidding each ``(row, day of row)``.
+
+    Re-assigning a batch takes an edge out of its row and another into its
+    freed day, and neither is a planned entry; both cost at least the smallest
+    reduced cost of their row or column. Also stores the reduced costs, with
+    unusable entries blocked, for :func:`_solve_child`.
+    """
+    reduced = costs - node.row_duals[:, np.newaxis] - node.col_duals
+    np.maximum(reduced, 0.0, out=reduced)
+    reduced[node.forbidden] = np.inf
+    reduced[node.fixed] = np.inf
+    reduced[:, node.col_of_row[node.fixed]] = np.inf
+    reduced[np.arange(len(costs)), node.col_of_row] = np.inf
+    node.blocked = reduced
+    cols = node.col_of_row[rows]
+    return node.cost + reduced[rows].min(axis=1) + reduced[:, cols].min(axis=0)
+
+
+def _solve_child(
+    costs: np.ndarray, node: _Subproblem, rows: np.ndarray, position: int
+) -> Optional[_Subproblem]:
+    """Forbid the plan entry of ``rows[position]`` and fix those of the rows before it.
+
+    The parent's duals stay feasible when an entry is forbidden, so the child
+    is one shortest augmenting path (Dijkstra on the parent's reduced costs)
+    from the released batch to its released day, followed by the usual dual
+    update. Returns ``None`` when the child has no complete plan.
+    """
+    size = len(costs)
+    source = int(rows[position])
+    target = int(node.col_of_row[source])
+    fixed = node.fixed.copy()
+    fixed[rows[:position]] = True
+    forbidden = node.forbidden.copy()
+    forbidden[source, target] = True
+
+    row_of_col = node.row_of_col.copy()
+    col_of_row = node.col_of_row.copy()
+    # Planned entries are blocked, so a path only ever reaches the target day
+    # through the released batch's alternatives.
+    reduced = node.blocked
+    # Scanned and fixed days are locked out of further updates.
+    lock = np.where(fixed[row_of_col], np.inf, 0.0)
+    lock[target] = 0.0
+    dist = np.full(size, np.inf)
+    final = np.full(size, np.inf)
+    pred = np.full(size, -1)
+    row, base = source, 0.0
+    while True:
+        candidate = reduced[row] + lock
+        candidate += base
+        better = candidate < dist
+        dist[better] = candidate[better]
+        pred[better] = row
+        col = int(dist.argmin())
+        base = dist[col]
+        if not np.isfinite(base):
+            return None
+        final[col] = base
+        dist[col] = np.inf
+        lock[col] = np.inf
+        if col == target:
+            break
+        row = row_of_col[col]
+
+    shift = np.minimum(final, base)
+    row_shift = shift[col_of_row]
+    row_shift[source] = 0.0
+    col_duals = node.col_duals + shift
+    row_duals = node.row_duals - row_shift
+
+    col = target
+    while True:
+        row = pred[col]
+        previous = col_of_row[row]
+        row_of_col[col] = row
+        col_of_row[row] = col
+        if row == source:
+            break
+        col = previous
+
+    cost = float(costs[row_of_col, np.arange(size)].sum())
+    return _Subproblem(cost, row_of_col, row_duals, col_duals, fixed, forbidden)
+
+
+def hungarian_max_k_best(matrix: Matrix, k: int) -> List[Tuple[List[float], List[int]]]:
+    """The ``k`` best plans (Murty's partitioning), best first, as (totals, permutation).
+
+    Each popped plan is split into subproblems that forbid one of its entries
+    and fix the entries before it. A subproblem enters the queue with a cheap
+    lower bound and is only solved once it reaches the front; solving reuses
+    the parent's dual prices, so it costs one augmenting path instead of a new
+    assignment. Fewer plans are returned when the matrix has fewer than ``k``.
+    """
+    if k <= 0:
+        raise ValueError("Number of plans must be positive.")
+    _, permutation = hungarian_max_algorithm(matrix)
+    values = np.array(matrix, dtype=float)
+    size = len(values)
+    costs = -values
+    order = np.array(permutation)
+    col_prices = _column_potentials(values, order)
+    row_prices = np.empty(size)
+    row_prices[order] = values[order, np.arange(size)] - col_prices
+    root = _Subproblem(
+        float(costs[order, np.arange(size)].sum()), order, -row_prices, -col_prices,
+        np.zeros(size, dtype=bool), np.zeros((size, size), dtype=bool),
+    )
+
+    plans: List[Tuple[List[float], List[int]]] = []
+    counter = itertools.count()
+    # (cost or lower bound, tie-break, solved node or (parent, rows, position))
+    queue: List[Tuple[float, int, Any]] = [(root.cost, next(counter), root)]
+    while queue and len(plans) < k:
+        _, _, entry = heapq.heappop(queue)
+        if not isinstance(entry, _Subproblem):
+            child = _solve_child(costs, *entry)
+            if child is not None:
+                heapq.heappush(queue, (child.cost, next(counter), child))
+            continue
+
+        picked = values[entry.row_of_col, np.arange(size)]
+        plans.append((np.cumsum(picked).tolist(), entry.row_of_col.tolist()))
+        rows = np.flatnonzero(~entry.fixed)
+        if len(rows) < 2:
+            continue
+        rows = rows[np.argsort(entry.col_of_row[rows])]
+        for position, bound in enumerate(_child_bounds(costs, entry, rows)):
+            if np.isfinite(bound):
+                heapq.heappush(queue, (float(bound), next(counter), (entry, rows, position)))
+    return plans
+
+
+def assignment_tolerances_batch(
+    stack: np.ndarray, permutations: np.ndarray, row_prices: np.ndarray, col_prices: np.ndarray
+) -> np.ndarray:
+    """:func:`assignment_tolerances` of every matrix of a stack, as a ``k x n`` array.
+
+    One Dijkstra search per batch and matrix, all advanced together: each step
+    settles the closest pending day of every search.
+    """
+    values = _validate_stack(stack)
+    count, size, _ = values.shape
+    rows = np.arange(count)[:, np.newaxis]
+    day_of = np.empty((count, size), dtype=int)
+    day_of[rows, permutations] = np.arange(size)
+
+    reduced = np.asarray(row_prices)[:, :, np.newaxis] + np.asarray(col_prices)[:, np.newaxis, :] \
+        - values
+    np.maximum(reduced, 0.0, out=reduced)
+
+    # dist[m, b, d]: cheapest reduced path from batch b's planned day to day d.
+    dist = reduced.copy()
+    dist[rows, np.arange(size), day_of] = np.inf
+    done = np.zeros_like(dist, dtype=bool)
+    best = np.full((count, size), np.inf)
+    searches = np.arange(size)
+    for _ in range(size):
+        pending = np.where(done, np.inf, dist)
+        day = pending.argmin(axis=2)
+        nearest = np.take_along_axis(pending, day[:, :, np.newaxis], axis=2)[:, :, 0]
+        done[rows, searches, day] = True
+        owner = permutations[rows, day]
+        best = np.minimum(best, nearest + reduced[rows, owner, day_of])
+        np.minimum(dist, nearest[:, :, np.newaxis] + reduced[rows, owner], out=dist)
+    return best
+
+
+def assignment_tolerances(
+    matrix: Matrix, permutation: Sequence[int], row_prices: Sequence[float],
+    col_prices: Sequence[float],
+) -> List[float]:
+    """How far each batch's value on its planned day may drop before the plan changes"""
+    return assignment_tolerances_batch(
+        np.array(matrix, dtype=float)[np.newaxis], np.array(permutation)[np.newaxis],
+        np.array(row_prices, dtype=float)[np.newaxis],
+        np.array(col_prices, dtype=float)[np.newaxis],
+    )[0].tolist()
+
+
+def calculate_losses_matrix(
+    size: int, inorganic: Matrix, i0_min: float, i0_max: float, rng: UniformSource = random
+) -> Matrix:
+    """Sugar loss matrix by days"""
+    i0_values = [rng.uniform(i0_min, i0_max) for _ in range(size)]
+    return losses_matrix_from_i0(size, inorganic, i0_values)
+
+
+def losses_matrix_from_i0_batch(inorganic: np.ndarray, i0_values: np.ndarray) -> np.ndarray:
+    """:func:`losses_matrix_from_i0` of ``k`` experiments.
+
+    ``inorganic`` holds the K, Na and N of every batch (``k x n x 3``) and
+    ``i0_values`` their I0 (``k x n``); returns a ``k x n x n`` stack.
+    """
+    inorganic = np.asarray(inorganic, dtype=float)
+    i0_values = np.asarray(i0_values, dtype=float)
+    if inorganic.ndim != 3 or inorganic.shape[2] != 3 or i0_values.shape != inorganic.shape[:2]:
+        raise ValueError("Inorganic data and I0 values must have one entry per batch.")
+    size = inorganic.shape[1]
+    k_value, na_value, n_value = (inorganic[:, :, index, np.newaxis] for index in range(3))
+    growth = 1.029 ** (np.arange(1, size + 1) - 7.0)
+    loss_melassa = (
+        0.1541 * (k_value + na_value)
+        + 0.2159 * n_value
+        + 0.9989 * (i0_values[:, :, np.newaxis] * growth)
+        + 0.1967
+    )
+    return 1.1 + loss_melassa
+
+
+def losses_matrix_from_i0(size: int, inorganic: Matrix, i0_values: Sequence[float]) -> Matrix:
+    """Sugar loss matrix by days for known per-batch I0 values"""
+    if len(inorganic) != size or len(i0_values) != size:
+        raise ValueError("Inorganic data and I0 values must have one entry per batch.")
+    return losses_matrix_from_i0_batch(
+        np.array(inorganic, dtype=float).reshape(1, size, 3),
+        np.array(i0_values, dtype=float).reshape(1, size),
+    )[0].tolist()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List
+
+from .algorithms import Matrix, hungarian_max_k_best
+
+
+@dataclass
+class AlternativePlan:
+    """One of the best plans of a working matrix.
+
+    ``plan[d]`` is the batch processed on day ``d`` and ``totals`` the
+    cumulative sugar. ``gap`` is the shortfall against the optimal plan, in
+    the units of the matrix and in percent of the optimum, and
+    ``changed_days`` lists the days whose batch differs from the optimal plan.
+    """
+
+    rank: int
+    plan: List[int]
+    totals: List[float]
+    gap: float = 0.0
+    gap_percent: float = 0.0
+    changed_days: List[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return self.totals[-1]
+
+
+def alternative_plans(matrix: Matrix, k: int = 20) -> List[AlternativePlan]:
+    """The ``k`` best plans of ``matrix``, starting with the optimum"""
+    ranked = hungarian_max_k_best(matrix, k)
+    best_totals, best_plan = ranked[0]
+    optimum = best_totals[-1]
+    plans = []
+    for rank, (totals, plan) in enumerate(ranked, start=1):
+        gap = optimum - totals[-1]
+        plans.append(AlternativePlan(
+            rank=rank,
+            plan=plan,
+            totals=totals,
+            gap=gap,
+            gap_percent=gap / optimum * 100 if optimum else 0.0,
+            changed_days=[day for day, batch in enumerate(plan) if batch != best_plan[day]],
+        ))
+    return plans
+
+
+__all__ = ["AlternativePlan", "alternative_plans"]
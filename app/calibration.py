@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import minimize
+
+from .algorithms import concentrated_matrix_batch, uniform_matrix_batch
+from .ingest import BatchRecord
+from .simulation import SimulationConfig
+
+DISTRIBUTIONS = ("uniform", "concentrated")
+QUANTILES = np.linspace(0.05, 0.95, 19)
+
+Range = Tuple[float, float]
+
+
+@dataclass
+class CalibrationResult:
+    """Fitted configuration and the fit of each coefficient distribution.
+
+    ``losses`` holds the final objective of both distribution types; the one
+    with the lower loss is used in ``config``.
+    """
+
+    config: SimulationConfig
+    losses: Dict[str, float]
+    batches: int
+
+
+def _quantile_distance(simulated: np.ndarray, target: np.ndarray, scale: float) -> float:
+    return float(np.mean(((np.quantile(simulated, QUANTILES) - target) / scale) ** 2))
+
+
+def _scale(values: np.ndarray) -> float:
+    spread = float(np.std(values))
+    return spread if spread > 0 else max(abs(float(np.mean(values))) * 1e-3, 1e-9)
+
+
+def _fit(objective: Callable[[np.ndarray], float], start: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Minimise over ranges given as (low, width) pairs; widths are kept non-negative"""
+    def bounded(point: np.ndarray) -> float:
+        return objective(_ranges(point))
+
+    result = minimize(
+        bounded, start, method="Nelder-Mead",
+        options={"xatol": 1e-7, "fatol": 1e-10, "maxiter": 4000},
+    )
+    return _ranges(result.x), float(result.fun)
+
+
+def _ranges(point: np.ndarray) -> np.ndarray:
+    ranges = np.array(point, dtype=float).reshape(-1, 2)
+    ranges[:, 1] = ranges[:, 0] + np.abs(ranges[:, 1])
+    return ranges
+
+
+def fit_uniform_range(observed: np.ndarray, draws: np.ndarray) -> Range:
+    """Range whose uniform samples (from ``draws``) best match the quantiles of ``observed``"""
+    target = np.quantile(observed, QUANTILES)
+    scale = _scale(observed)
+    start = np.array([observed.min(), observed.max() - observed.min()])
+    fitted, _ = _fit(
+        lambda ranges: _quantile_distance(
+            uniform_matrix_batch(ranges[0, 0], ranges[0, 1], draws), target, scale),
+        start,
+    )
+    return float(fitted[0, 0]), float(fitted[0, 1])
+
+
+class _PhaseTarget:
+    """Quantiles of the pooled coefficients and of their spread within a batch"""
+
+    def __init__(self, observed: np.ndarray) -> None:
+        self.columns = observed.shape[1]
+        self.values = np.quantile(observed, QUANTILES)
+        self.value_scale = _scale(observed)
+        self.spread: Optional[np.ndarray] = None
+        if self.columns > 1:
+            spread = observed.std(axis=1)
+            self.spread = np.quantile(spread, QUANTILES)
+            self.spread_scale = _scale(self.spread)
+        self.start = np.array([observed.min(), observed.max() - observed.min()])
+
+    def loss(self, simulated: np.ndarray) -> float:
+        total = _quantile_distance(simulated, self.values, self.value_scale)
+        if self.spread is not None:
+            total += _quantile_distance(simulated.std(axis=1), self.spread, self.spread_scale)
+        return total
+
+
+def _coefficient_phases(records: List[BatchRecord], config: SimulationConfig) -> List[np.ndarray]:
+    """Observed coefficients split into the ripening and degradation phases"""
+    length = min(len(record.coefficients) for record in records)
+    length = min(length, config.batches - 1)
+    if length <= 0:
+        raise ValueError("Records need at least one daily coefficient.")
+    observed = np.array([record.coefficients[:length] for record in records])
+    # coefficients[d] is column d + 1 of the generated coefficient matrix.
+    ripening = config.ripening_period - 1 if config.include_ripening else 0
+    ripening = max(0, min(ripening, length))
+    return [observed[:, :ripening], observed[:, ripening:]]
+
+
+def calibrate(
+    records: Iterable[BatchRecord],
+    config: SimulationConfig,
+    draws: int = 4000,
+    seed: int = 0,
+) -> CalibrationResult:
+    """Fit the generator ranges of ``config`` and its ``dist_type`` to measured batches.
+
+    Each objective evaluation transforms the same ``draws`` simulated batches of
+    fixed uniforms (common random numbers), so the objective is a smooth
+    function of the ranges. Sugar and inorganic ranges are fitted to the
+    quantiles of the measurements; coefficient ranges also match the spread of
+    coefficients within a batch, which tells the two distributions apart. The
+    number of batches, ripening period and the other fields are kept from
+    ``config``.
+    """
+    batches = list(records)
+    if len(batches) < 2:
+        raise ValueError("At least two measured batches are required.")
+    if draws <= 0:
+        raise ValueError("Number of simulated batches must be positive.")
+    generator = np.random.default_rng(seed)
+
+    fitted = {}
+    for field, attribute in (("sugar", "sugar"), ("k", "k"), ("na", "na"), ("n", "n"),
+                             ("i0", "i0")):
+        observed = np.array([getattr(record, attribute) for record in batches])
+        fitted[field] = fit_uniform_range(observed, generator.random(draws))
+
+    phases = [
+        (phase, _PhaseTarget(values))
+        for phase, values in zip(("rip", "deg"), _coefficient_phases(batches, config))
+        if values.shape[1] > 0
+    ]
+    phase_draws = {
+        phase: (generator.random((draws, 2)), generator.random((draws, target.columns)))
+        for phase, target in phases
+    }
+
+    losses: Dict[str, float] = {}
+    coefficient_fits: Dict[str, np.ndarray] = {}
+    for dist_type in DISTRIBUTIONS:
+        def objective(ranges: np.ndarray, dist_type: str = dist_type) -> float:
+            total = 0.0
+            for (phase, target), (low, high) in zip(phases, ranges):
+                row_draws, value_draws = phase_draws[phase]
+                if dist_type == "uniform":
+                    simulated = uniform_matrix_batch(low, high, value_draws)
+                else:
+                    simulated = concentrated_matrix_batch(low, high, row_draws, value_draws)
+                total += target.loss(simulated)
+            return total
+
+        start = np.concatenate([target.start for _, target in phases])
+        coefficient_fits[dist_type], losses[dist_type] = _fit(objective, start)
+
+    best = min(losses, key=losses.get)
+    coefficients = {phase: tuple(ranges) for (phase, _), ranges
+                    in zip(phases, coefficient_fits[best])}
+    rip = coefficients.get("rip", (config.min_rip_coeff, config.max_rip_coeff))
+    deg = coefficients.get("deg", (config.min_deg_coeff, config.max_deg_coeff))
+
+    calibrated = replace(
+        config,
+        dist_type=best,
+        min_sugar=fitted["sugar"][0], max_sugar=fitted["sugar"][1],
+        min_rip_coeff=float(rip[0]), max_rip_coeff=float(rip[1]),
+        min_deg_coeff=float(deg[0]), max_deg_coeff=float(deg[1]),
+        min_k=fitted["k"][0], max_k=fitted["k"][1],
+        min_na=fitted["na"][0], max_na=fitted["na"][1],
+        min_n=fitted["n"][0], max_n=fitted["n"][1],
+        min_i0=fitted["i0"][0], max_i0=fitted["i0"][1],
+    )
+    return CalibrationResult(config=calibrated, losses=losses, batches=len(batches))
+
+
+__all__ = ["CalibrationResult", "DISTRIBUTIONS", "calibrate", "fit_uniform_range"]
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+from .comparison import PairedComparison
+from .frequency import AssignmentFrequency
+from .runstats import RunStatistics
+from .sampling import ExperimentSampler, VarianceTracker
+
+if TYPE_CHECKING:
+    from .simulation import MatrixSummary, SimulationConfig
+
+CHECKPOINT_VERSION = 6
+
+
+class SimulationCheckpoint:
+    """Periodic snapshot of a running simulation in a small JSON file.
+
+    A snapshot holds the configuration, the running averages, the sampler
+    position, the state of the ``random`` module, if tracked, the variance
+    sums, assignment counts and run statistics and, if given, the ``origin``
+    state the run's scenarios can be replayed from. Resuming from it
+    reproduces the uninterrupted run exactly.
+    """
+
+    def __init__(self, path: Union[str, Path], interval: float = 30.0) -> None:
+        if interval < 0:
+            raise ValueError("Checkpoint interval cannot be negative.")
+        self.path = Path(path)
+        self.interval = interval
+        self._last_save = time.monotonic()
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_save >= self.interval
+
+    def load(self, config: SimulationConfig) -> Optional[Dict[str, Any]]:
+        """Saved state for ``config``, or ``None`` if there is none to resume"""
+        try:
+            with self.path.open("r", encoding="utf-8") as handle:
+                state = json.load(handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return None
+
+        if state.get("version") != CHECKPOINT_VERSION or state.get("config") != asdict(config):
+            return None
+        return state
+
+    def save(
+        self,
+        config: SimulationConfig,
+        averages: MatrixSummary,
+        sampler: ExperimentSampler,
+        variance: Optional[VarianceTracker] = None,
+        origin: Optional[Dict[str, Any]] = None,
+        frequencies: Optional[AssignmentFrequency] = None,
+        comparison: Optional[PairedComparison] = None,
+        statistics: Optional[RunStatistics] = None,
+    ) -> None:
+        """Atomically replace the checkpoint file with the current state"""
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "config": asdict(config),
+            "averages": averages,
+            "sampler": sampler.state(),
+            "random": capture_random_state(),
+            "variance": variance.state() if variance is not None else None,
+            "origin": origin,
+            "frequencies": frequencies.state() if frequencies is not None else None,
+            "comparison": comparison.state() if comparison is not None else None,
+            "statistics": statistics.state() if statistics is not None else None,
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with temporary.open("w", encoding="utf-8") as handle:
+            json.dump(state, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, self.path)
+        self._last_save = time.monotonic()
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def capture_random_state() -> List[Any]:
+    """JSON-friendly state of the ``random`` module"""
+    version, internal, gauss_next = random.getstate()
+    return [version, list(internal), gauss_next]
+
+
+def restore_random_state(saved: Any) -> None:
+    """Put the ``random`` module back into a state written by :meth:`save`"""
+    version, internal, gauss_next = saved
+    random.setstate((version, tuple(internal), gauss_next))
+
+
+__all__ = ["SimulationCheckpoint", "capture_random_state", "restore_random_state"]
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import stats
+
+
+@dataclass
+class PairedDifference:
+    """Mean of ``first - second`` over the experiments, its confidence interval and win rate"""
+
+    first: str
+    second: str
+    mean: float
+    low: float
+    high: float
+    win_rate: float
+    experiments: int
+
+    @property
+    def significant(self) -> bool:
+        return self.low > 0 or self.high < 0
+
+
+class PairedComparison:
+    """Streaming paired comparison of strategies evaluated on the same experiments.
+
+    Every strategy sees the same working matrix in an experiment, so the
+    differences of their final totals have a much smaller variance than the
+    totals themselves. The tracker keeps the mean vector and co-moment matrix of
+    the final totals, merged chunk by chunk, and the pairwise win and tie
+    counts; its size does not grow with the number of experiments. Intervals
+    treat experiments as independent, which is conservative for the
+    variance-reducing sampling schemes.
+    """
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.count = 0
+        self.mean = np.zeros(0)
+        self.comoment = np.zeros((0, 0))
+        self.wins = np.zeros((0, 0), dtype=np.int64)
+        self.ties = np.zeros((0, 0), dtype=np.int64)
+
+    def _start(self, names: List[str]) -> None:
+        size = len(names)
+        self.names = names
+        self.mean = np.zeros(size)
+        self.comoment = np.zeros((size, size))
+        self.wins = np.zeros((size, size), dtype=np.int64)
+        self.ties = np.zeros((size, size), dtype=np.int64)
+
+    def add(self, finals: Dict[str, np.ndarray]) -> None:
+        """Record the final totals of a chunk of experiments, one array per strategy"""
+        names = list(finals)
+        if not self.names:
+            self._start(names)
+        elif names != self.names:
+            raise ValueError("Every chunk must contain the same strategies.")
+        values = np.column_stack([np.asarray(finals[name], dtype=float) for name in names])
+        experiments = len(values)
+        if experiments == 0:
+            return
+
+        chunk_mean = values.mean(axis=0)
+        centred = values - chunk_mean
+        delta = chunk_mean - self.mean
+        total = self.count + experiments
+        self.comoment += centred.T @ centred + np.outer(delta, delta) * (
+            self.count * experiments / total)
+        self.mean += delta * (experiments / total)
+        self.count = total
+
+        differences = values[:, :, np.newaxis] - values[:, np.newaxis, :]
+        tolerance = 1e-9 * max(1.0, float(np.abs(values).max()))
+        self.wins += (differences > tolerance).sum(axis=0)
+        self.ties += (np.abs(differences) <= tolerance).sum(axis=0)
+
+    def merge(self, other: "PairedComparison") -> None:
+        if not other.count:
+            return
+        if not self.count:
+            self.restore(other.state())
+            return
+        if other.names != self.names:
+            raise ValueError("Comparisons of different strategies cannot be merged.")
+        delta = other.mean - self.mean
+        total = self.count + other.count
+        self.comoment += other.comoment + np.outer(delta, delta) * (
+            self.count * other.count / total)
+        self.mean += delta * (other.count / total)
+        self.count = total
+        self.wins += other.wins
+        self.ties += other.ties
+
+    def covariance(self) -> np.ndarray:
+        """Sample covariance of the final totals across experiments"""
+        if self.count < 2:
+            raise ValueError("At least two experiments are needed.")
+        return self.comoment / (self.count - 1)
+
+    def win_rate(self, first: str, second: str) -> float:
+        """Share of experiments where ``first`` beats ``second``; ties count as half"""
+        i, j = self.names.index(first), self.names.index(second)
+        return float(self.wins[i, j] + 0.5 * self.ties[i, j]) / self.count
+
+    def difference(
+        self, first: str, second: str, confidence: float = 0.95, scale: float = 1.0
+    ) -> PairedDifference:
+        """Paired mean difference ``first - second`` with a Student-t interval.
+
+        ``scale`` converts the totals into display units, e.g. tonnes.
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("Confidence level must be in (0, 1).")
+        i, j = self.names.index(first), self.names.index(second)
+        covariance = self.covariance()
+        variance = max(covariance[i, i] + covariance[j, j] - 2 * covariance[i, j], 0.0)
+        mean = (self.mean[i] - self.mean[j]) * scale
+        half = (stats.t.ppf(0.5 + confidence / 2, self.count - 1)
+                * np.sqrt(variance / self.count) * abs(scale))
+        return PairedDifference(
+            first=first, second=second, mean=float(mean),
+            low=float(mean - half), high=float(mean + half),
+            win_rate=self.win_rate(first, second), experiments=self.count,
+        )
+
+    def probability_best(
+        self, names: Optional[Sequence[str]] = None, draws: int = 20000, seed: int = 0
+    ) -> Dict[str, float]:
+        """Probability that each strategy has the highest expected total.
+
+        Draws the vector of mean totals from its normal approximation, whose
+        covariance is the paired sample covariance over the number of
+        experiments, and counts how often each strategy comes out on top.
+        """
+        names = list(names) if names is not None else list(self.names)
+        if not names:
+            return {}
+        index = [self.names.index(name) for name in names]
+        if self.count < 2:
+            return {name: 1.0 / len(names) for name in names}
+        covariance = self.covariance()[np.ix_(index, index)] / self.count
+        samples = np.random.default_rng(seed).multivariate_normal(
+            self.mean[index], covariance, size=draws, method="eigh")
+        best = np.bincount(samples.argmax(axis=1), minlength=len(names))
+        return {name: float(best[position]) / draws for position, name in enumerate(names)}
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "names": list(self.names),
+            "count": self.count,
+            "mean": self.mean.tolist(),
+            "comoment": self.comoment.tolist(),
+            "wins": self.wins.tolist(),
+            "ties": self.ties.tolist(),
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.names = list(state["names"])
+        self.count = int(state["count"])
+        self.mean = np.array(state["mean"], dtype=float)
+        self.comoment = np.array(state["comoment"], dtype=float).reshape(len(self.names), -1)
+        self.wins = np.array(state["wins"], dtype=np.int64).reshape(len(self.names), -1)
+        self.ties = np.array(state["ties"], dtype=np.int64).reshape(len(self.names), -1)
+
+
+__all__ = ["PairedComparison", "PairedDifference"]
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import os
+import queue
+import random
+import time
+from dataclasses import dataclass, field, replace
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple, Union
+
+from .runstats import RunStatistics
+from .simulation import MatrixSummary, SimulationConfig, run_simulation
+
+Address = Tuple[str, int]
+
+# Managers exchange pickles, so the key is what keeps strangers from running
+# code on the coordinator and the workers; there is deliberately no default.
+AUTHKEY_ENV = "SUGAR_BEET_AUTHKEY"
+_POLL_INTERVAL = 0.5
+
+
+def resolve_authkey(authkey: Union[str, bytes, None] = None) -> bytes:
+    """``authkey``, or the key in the environment; raises ``ValueError`` if neither is set"""
+    if authkey is None:
+        authkey = os.environ.get(AUTHKEY_ENV)
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    if not authkey:
+        raise ValueError(
+            f"Sharded runs need an authentication key: pass one or set {AUTHKEY_ENV}.")
+    return authkey
+
+
+@dataclass
+class PartialResult:
+    """Per-day sums of the strategy totals over a number of experiments, and their statistics"""
+
+    sums: MatrixSummary
+    experiments: int
+    statistics: RunStatistics = field(default_factory=RunStatistics)
+
+    def merge(self, other: "PartialResult") -> "PartialResult":
+        if self.sums.keys() != other.sums.keys():
+            raise ValueError("Partial results cover different strategies.")
+        sums = {
+            name: [left + right for left, right in zip(values, other.sums[name])]
+            for name, values in self.sums.items()
+        }
+        statistics = RunStatistics()
+        statistics.merge(self.statistics)
+        statistics.merge(other.statistics)
+        return PartialResult(sums, self.experiments + other.experiments, statistics)
+
+    def averages(self) -> MatrixSummary:
+        if self.experiments == 0:
+            raise ValueError("No experiments have been merged.")
+        return {
+            name: [value / self.experiments for value in values]
+            for name, values in self.sums.items()
+        }
+
+
+def run_shard(config: SimulationConfig, experiments: int, seed: int) -> PartialResult:
+    """Run ``experiments`` experiments of ``config`` from a fixed seed"""
+    if config.robust_objective != "none":
+        raise ValueError("The robust plan cannot be sharded; run it in one process.")
+    random.seed(seed)
+    statistics = RunStatistics()
+    averages = run_simulation(replace(config, experiments=experiments), statistics=statistics)
+    sums = {name: [value * experiments for value in values] for name, values in averages.items()}
+    return PartialResult(sums, experiments, statistics)
+
+
+@dataclass
+class _Shard:
+    run: int
+    index: int
+    experiments: int
+    seed: int
+    attempt: int = 0
+
+
+class _Dispatcher:
+    """Task queue that reports, from the coordinator's side, when a shard leaves it.
+
+    The report is made in the manager process as the shard is handed out, so
+    a worker that dies right after taking a shard cannot keep it from timing out.
+    """
+
+    def __init__(self, results: queue.Queue) -> None:
+        self._tasks: queue.Queue = queue.Queue()
+        self._results = results
+
+    def put(self, item: Optional[Tuple[SimulationConfig, "_Shard"]]) -> None:
+        self._tasks.put(item)
+
+    def take(self, timeout: float) -> Optional[Tuple[SimulationConfig, "_Shard"]]:
+        item = self._tasks.get(timeout=timeout)
+        if item is not None:
+            _, shard = item
+            self._results.put(("taken", shard.run, shard.index, shard.attempt, time.monotonic()))
+        return item
+
+
+_RESULTS: queue.Queue = queue.Queue()
+_DISPATCHER = _Dispatcher(_RESULTS)
+
+
+def _dispatcher() -> _Dispatcher:
+    return _DISPATCHER
+
+
+def _result_queue() -> queue.Queue:
+    return _RESULTS
+
+
+class _CoordinatorManager(BaseManager):
+    pass
+
+
+class _WorkerManager(BaseManager):
+    pass
+
+
+# The coordinator's manager runs in its own process, so these module-level
+# queues exist once per coordinator.
+_CoordinatorManager.register("tasks", callable=_dispatcher)
+_CoordinatorManager.register("results", callable=_result_queue)
+_WorkerManager.register("tasks")
+_WorkerManager.register("results")
+
+
+class ShardCoordinator:
+    """Split a run into seeded shards and serve them to workers over a socket.
+
+    Workers started with :func:`run_worker` (on this or another host) pull shards
+    from the task queue and push back :class:`PartialResult` objects. A shard
+    whose worker fails, or that is not back ``shard_timeout`` seconds after it
+    left the queue, is queued again, up to ``max_retries`` times; ``retried``
+    counts the requeued shards of the last run. Because every shard has its own
+    seed, a retried shard produces the same partial result. A run raises
+    ``RuntimeError`` when shards are waiting and no worker has taken one for
+    ``worker_timeout`` seconds, e.g. because none is connected.
+    """
+
+    def __init__(
+        self,
+        address: Address = ("127.0.0.1", 0),
+        authkey: Union[str, bytes, None] = None,
+        shard_size: int = 1000,
+        max_retries: int = 3,
+        shard_timeout: float = 600.0,
+        worker_timeout: float = 120.0,
+    ) -> None:
+        if shard_size <= 0:
+            raise ValueError("Shard size must be positive.")
+        if max_retries < 0:
+            raise ValueError("Retry count cannot be negative.")
+        self.shard_size = shard_size
+        self.max_retries = max_retries
+        self.shard_timeout = shard_timeout
+        self.worker_timeout = worker_timeout
+        self.retried = 0
+
+        self._runs = 0
+        self._manager = _CoordinatorManager(address=address, authkey=resolve_authkey(authkey))
+        self._manager.start()
+        self._tasks = self._manager.tasks()
+        self._results = self._manager.results()
+
+    @property
+    def address(self) -> Address:
+        return self._manager.address
+
+    def run(
+        self,
+        config: SimulationConfig,
+        seed: Optional[int] = None,
+        statistics: Optional[RunStatistics] = None,
+    ) -> MatrixSummary:
+        """Distribute ``config.experiments`` over the workers and merge their results.
+
+        ``statistics``, when given, receives the merged statistics of the shards.
+        The robust plan has to see every scenario at once, so configs asking
+        for it are rejected.
+        """
+        if config.experiments <= 0:
+            raise ValueError("Number of experiments must be positive.")
+        if config.robust_objective != "none":
+            raise ValueError("The robust plan cannot be sharded; run it in one process.")
+        if seed is None:
+            seed = random.getrandbits(32)
+        self._runs += 1
+        self.retried = 0
+
+        shards: List[_Shard] = []
+        for index, start in enumerate(range(0, config.experiments, self.shard_size)):
+            size = min(self.shard_size, config.experiments - start)
+            shards.append(_Shard(self._runs, index, size, seed + index))
+        for shard in shards:
+            self._tasks.put((config, shard))
+
+        partials: Dict[int, PartialResult] = {}
+        # Shards out with a worker, and when each has to be back.
+        deadlines: Dict[int, float] = {}
+        attempts = {shard.index: 0 for shard in shards}
+        last_taken = time.monotonic()
+
+        while len(partials) < len(shards):
+            try:
+                kind, run, index, attempt, payload = self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+            else:
+                if run != self._runs or index in partials:
+                    # Late answers from an earlier run or a retried shard.
+                    continue
+                if kind == "done":
+                    # Any attempt of a shard yields the same result.
+                    partials[index] = payload
+                    deadlines.pop(index, None)
+                elif attempt != attempts[index]:
+                    continue
+                elif kind == "taken":
+                    deadlines[index] = payload + self.shard_timeout
+                    last_taken = time.monotonic()
+                elif kind == "failed":
+                    self._retry(config, shards[index], attempts, deadlines, payload)
+
+            now = time.monotonic()
+            for index, deadline in list(deadlines.items()):
+                if deadline <= now:
+                    self._retry(config, shards[index], attempts, deadlines, "timed out")
+            if not deadlines and len(partials) < len(shards) \
+                    and now - last_taken > self.worker_timeout:
+                raise RuntimeError(
+                    f"No worker has taken a shard for {self.worker_timeout:.0f} s.")
+
+        merged = partials[0]
+        for index in range(1, len(shards)):
+            merged = merged.merge(partials[index])
+        if statistics is not None:
+            statistics.merge(merged.statistics)
+        return merged.averages()
+
+    def _retry(
+        self,
+        config: SimulationConfig,
+        shard: _Shard,
+        attempts: Dict[int, int],
+        deadlines: Dict[int, float],
+        reason: str,
+    ) -> None:
+        deadlines.pop(shard.index, None)
+        attempts[shard.index] += 1
+        self.retried += 1
+        if attempts[shard.index] > self.max_retries:
+            raise RuntimeError(
+                f"Shard {shard.index} failed {attempts[shard.index]} times: {reason}")
+        self._tasks.put((config, replace(shard, attempt=attempts[shard.index])))
+
+    def close(self) -> None:
+        """Tell the workers to stop and shut the server down"""
+        self._tasks.put(None)
+        # Give connected workers a moment to see the stop marker.
+        time.sleep(2 * _POLL_INTERVAL)
+        self._manager.shutdown()
+
+
+def run_worker(address: Address, authkey: Union[str, bytes, None] = None) -> int:
+    """Process shards from a coordinator until it closes; returns the shard count"""
+    manager = _WorkerManager(address=address, authkey=resolve_authkey(authkey))
+    manager.connect()
+    tasks = manager.tasks()
+    results = manager.results()
+
+    processed = 0
+    while True:
+        try:
+            item = tasks.take(_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        except (EOFError, ConnectionError):
+            return processed
+        if item is None:
+            # Leave the stop marker for the other workers.
+            tasks.put(None)
+            return processed
+
+        config, shard = item
+        try:
+            partial = run_shard(config, shard.experiments, shard.seed)
+        except Exception as exc:
+            results.put(("failed", shard.run, shard.index, shard.attempt, str(exc)))
+        else:
+            results.put(("done", shard.run, shard.index, shard.attempt, partial))
+        processed += 1
+
+
+__all__ = [
+    "AUTHKEY_ENV",
+    "PartialResult",
+    "ShardCoordinator",
+    "resolve_authkey",
+    "run_shard",
+    "run_worker",
+]
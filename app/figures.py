@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import plotly.graph_objects as go
+
+from .simulation import MatrixSummary
+from .strategies import reference_strategy, strategy_color
+
+PALETTE = ["#26a69a", "#ec407a", "#66bb6a", "#ffa726", "#ab47bc"]
+
+
+def build_loss_figure(final_values: Dict[str, float]) -> go.Figure:
+    fig = go.Figure()
+
+    if not final_values:
+        fig.update_layout(
+            template="plotly_white",
+            annotations=[dict(
+                text="Запустите расчёт",
+                x=0.5, y=0.5, xref="paper", yref="paper",
+                showarrow=False, font=dict(size=18, color="gray")
+            )]
+        )
+        return fig
+
+    reference = reference_strategy()
+    if reference not in final_values:
+        reference = max(final_values, key=final_values.get)
+    ideal = final_values[reference]
+
+    algorithms = []
+    losses = []
+
+    for name, val in final_values.items():
+        if name == reference:
+            continue
+        algorithms.append(name)
+        losses.append((ideal - val) / ideal * 100)
+
+    fig.add_trace(go.Bar(
+        x=algorithms,
+        y=losses,
+        text=[f"{l:.2f}%" for l in losses],
+        textposition="outside",
+        marker=dict(color="#26a69a")
+    ))
+
+    fig.update_layout(
+        template="plotly_white",
+        yaxis_title="Потери (%)",
+        xaxis_title="Алгоритм",
+        margin=dict(l=40, r=40, t=40, b=40),
+    )
+
+    return fig
+
+
+def build_chart_figure(
+    show_annotation: bool = False, text: str = "Нажмите 'Запустить расчёт'"
+) -> go.Figure:
+    fig = go.Figure()
+    annotations_list = []
+    if show_annotation:
+        annotations_list.append(dict(
+            text=text, xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False, font=dict(color="gray", size=18),
+        ))
+
+    fig.update_layout(
+        template="plotly_white", margin=dict(l=40, r=20, t=40, b=40),
+        xaxis_title="День", yaxis_title="Кумулятивный показатель",
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        annotations=annotations_list,
+        font=dict(size=14)
+    )
+    return fig
+
+
+def build_cumulative_figure(days: List[int], averages: MatrixSummary) -> go.Figure:
+    fig = build_chart_figure(show_annotation=False)
+    for i, (name, values) in enumerate(averages.items()):
+        color = strategy_color(name, PALETTE[i % len(PALETTE)])
+        fig.add_trace(go.Scatter(
+            x=days, y=values, mode="lines+markers", name=name,
+            line=dict(color=color, width=3, shape='spline'),
+            marker=dict(size=8, line=dict(width=2, color='white')),
+        ))
+    return fig
+
+
+def build_preview_figure(days: List[int], averages: MatrixSummary, experiments: int) -> go.Figure:
+    """Cumulative figure of an estimate, faded until the full run replaces it"""
+    fig = build_cumulative_figure(days, averages)
+    fig.update_traces(opacity=0.45, line_dash="dash", marker_size=5)
+    fig.update_layout(annotations=[dict(
+        text=f"Предпросмотр: {experiments} эксп.",
+        xref="paper", yref="paper", x=0, y=1.08, xanchor="left",
+        showarrow=False, font=dict(color="gray", size=14),
+    )])
+    return fig
+
+
+def build_summary_figure(final_values: Dict[str, float]) -> go.Figure:
+    """Summary table of final tonnage and loss against the best strategy"""
+    sorted_items = sorted(final_values.items(), key=lambda item: item[1], reverse=True)
+    max_val = sorted_items[0][1] if sorted_items else 0.0
+
+    names = [name for name, _ in sorted_items]
+    scores = [f"{score:,.0f} т" for _, score in sorted_items]
+    losses = [
+        f"-{((max_val - score) / max_val) * 100 if max_val != 0 else 0:.2f}%"
+        for _, score in sorted_items
+    ]
+
+    fig = go.Figure(go.Table(
+        header=dict(
+            values=["Алгоритм", "Сахар (тонн)", "Потери"],
+            fill_color="#eeeeee",
+            align=["left", "right", "right"],
+            font=dict(size=15),
+        ),
+        cells=dict(
+            values=[names, scores, losses],
+            align=["left", "right", "right"],
+            font=dict(size=14),
+            height=28,
+        ),
+    ))
+    fig.update_layout(template="plotly_white", margin=dict(l=20, r=20, t=20, b=20))
+    return fig
+
+
+def build_frequency_figure(
+    frequencies: Optional[np.ndarray], agreement: Optional[float] = None
+) -> go.Figure:
+    """Heatmap of the share of experiments in which batch ``i`` is processed on day ``j``"""
+    fig = go.Figure()
+    if frequencies is None:
+        fig.update_layout(
+            template="plotly_white",
+            annotations=[dict(
+                text="Запустите расчёт",
+                x=0.5, y=0.5, xref="paper", yref="paper",
+                showarrow=False, font=dict(size=18, color="gray")
+            )]
+        )
+        return fig
+
+    size = frequencies.shape[0]
+    fig.add_trace(go.Heatmap(
+        z=frequencies * 100,
+        x=list(range(1, size + 1)),
+        y=list(range(1, size + 1)),
+        zmin=0, zmax=100,
+        colorscale="Teal",
+        colorbar=dict(title="%"),
+        hovertemplate="Партия %{y}, день %{x}: %{z:.1f}%<extra></extra>",
+    ))
+    title = None
+    if agreement is not None:
+        title = f"Совпадение с оптимальным планом: {agreement * 100:.1f}% дней"
+    fig.update_layout(
+        template="plotly_white",
+        title=title,
+        xaxis_title="День",
+        yaxis_title="Партия",
+        yaxis=dict(autorange="reversed"),
+        margin=dict(l=40, r=40, t=60, b=40),
+    )
+    return fig
+
+
+__all__ = [
+    "PALETTE",
+    "build_chart_figure",
+    "build_cumulative_figure",
+    "build_frequency_figure",
+    "build_loss_figure",
+    "build_preview_figure",
+    "build_summary_figure",
+]
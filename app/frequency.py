@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class AssignmentFrequency:
+    """How often each strategy processes batch ``i`` on day ``j``.
+
+    Keeps one ``n x n`` count matrix per strategy and, for every strategy, the
+    number of (experiment, day) cells where it picks the same batch as the
+    reference strategy. Memory does not grow with the number of experiments.
+    """
+
+    def __init__(self, reference: Optional[str] = None) -> None:
+        self.reference = reference
+        self.counts: Dict[str, np.ndarray] = {}
+        self.matches: Dict[str, int] = {}
+        self.cells = 0
+
+    def add(self, permutations: Dict[str, np.ndarray]) -> None:
+        """Count a ``k x n`` stack of plans per strategy; ``plan[d]`` is the batch of day ``d``"""
+        if not permutations:
+            return
+        first = next(iter(permutations.values()))
+        experiments, size = first.shape
+        days = np.broadcast_to(np.arange(size), (experiments, size)).ravel()
+        reference = permutations.get(self.reference) if self.reference else None
+
+        for name, plans in permutations.items():
+            counts = self.counts.get(name)
+            if counts is None:
+                counts = self.counts[name] = np.zeros((size, size), dtype=np.int64)
+            np.add.at(counts, (np.asarray(plans).ravel(), days), 1)
+            if reference is not None:
+                self.matches[name] = self.matches.get(name, 0) + int((plans == reference).sum())
+        if reference is not None:
+            self.cells += experiments * size
+
+    def merge(self, other: "AssignmentFrequency") -> None:
+        for name, counts in other.counts.items():
+            if name in self.counts:
+                self.counts[name] = self.counts[name] + counts
+            else:
+                self.counts[name] = counts.copy()
+        for name, matches in other.matches.items():
+            self.matches[name] = self.matches.get(name, 0) + matches
+        self.cells += other.cells
+        if self.reference is None:
+            self.reference = other.reference
+
+    def frequencies(self, name: str) -> np.ndarray:
+        """Share of experiments in which each batch is processed on each day"""
+        counts = self.counts[name]
+        experiments = counts[:, 0].sum()
+        return counts / experiments if experiments else counts.astype(float)
+
+    def agreement(self) -> Dict[str, float]:
+        """Share of days on which each strategy picks the reference strategy's batch"""
+        if not self.cells:
+            return {}
+        return {name: matches / self.cells for name, matches in self.matches.items()}
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "reference": self.reference,
+            "counts": {name: counts.tolist() for name, counts in self.counts.items()},
+            "matches": dict(self.matches),
+            "cells": self.cells,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.reference = state["reference"]
+        self.counts = {
+            name: np.array(counts, dtype=np.int64) for name, counts in state["counts"].items()}
+        self.matches = {name: int(value) for name, value in state["matches"].items()}
+        self.cells = int(state["cells"])
+
+
+__all__ = ["AssignmentFrequency"]
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, fields, replace
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import stats
+from scipy.stats import qmc
+
+from .pipeline import IncrementalSimulation
+from .simulation import SimulationConfig
+from .strategies import active_strategies, reference_strategy
+
+# Ranges whose bounds are sampled separately and swapped when they cross.
+RANGE_FIELDS = (
+    ("min_sugar", "max_sugar"),
+    ("min_rip_coeff", "max_rip_coeff"),
+    ("min_deg_coeff", "max_deg_coeff"),
+    ("min_k", "max_k"),
+    ("min_na", "max_na"),
+    ("min_n", "max_n"),
+    ("min_i0", "max_i0"),
+)
+INORGANIC_FIELDS = ("min_k", "max_k", "min_na", "max_na", "min_n", "max_n", "min_i0", "max_i0")
+COEFFICIENT_FIELDS = ("min_rip_coeff", "max_rip_coeff", "min_deg_coeff", "max_deg_coeff")
+
+# done, total design points
+ProgressCallback = Callable[[int, int], None]
+
+_CONFIG_FIELDS = {item.name for item in fields(SimulationConfig)}
+
+
+@dataclass(frozen=True)
+class Factor:
+    """One uncertain input: a config field and the interval or choices it is drawn from"""
+
+    field: str
+    low: float = 0.0
+    high: float = 1.0
+    integer: bool = False
+    choices: Tuple[Any, ...] = ()
+
+    def __post_init__(self) -> None:
+        if self.field not in _CONFIG_FIELDS:
+            raise ValueError(f"Unknown configuration field: {self.field}")
+        if not self.choices and self.low > self.high:
+            raise ValueError(f"Interval of {self.field} is empty.")
+
+    def value(self, point: float) -> Any:
+        """Value of the field at ``point`` in [0, 1)"""
+        if self.choices:
+            return self.choices[min(int(point * len(self.choices)), len(self.choices) - 1)]
+        if self.integer:
+            low, high = int(self.low), int(self.high)
+            return min(low + int(point * (high - low + 1)), high)
+        return self.low + point * (self.high - self.low)
+
+    def coordinate(self, value: Any) -> float:
+        """Position of ``value`` in [0, 1], the inverse of :meth:`value`.
+
+        Raises ``ValueError`` for a value outside the factor's range or choices.
+        """
+        if self.choices:
+            return (self.choices.index(value) + 0.5) / len(self.choices)
+        if self.integer:
+            low, high = int(self.low), int(self.high)
+            if not low <= value <= high:
+                raise ValueError(f"{self.field} = {value} lies outside [{low}, {high}].")
+            return (value - low + 0.5) / (high - low + 1)
+        if not self.low <= value <= self.high:
+            raise ValueError(f"{self.field} = {value} lies outside [{self.low}, {self.high}].")
+        span = self.high - self.low
+        return (value - self.low) / span if span else 0.5
+
+
+def default_factors(config: SimulationConfig, spread: float = 0.2) -> List[Factor]:
+    """Factors around ``config``: every range bound varies by ``spread`` of its value.
+
+    Coefficient bounds vary by ``spread`` of their distance from 1, the ripening
+    period by two days either way and the distribution type over both choices.
+    Inorganic ranges are only included when ``config.include_inorganic`` is set.
+    """
+    if not 0 < spread < 1:
+        raise ValueError("Spread must be in (0, 1).")
+    factors = []
+    for low, high in RANGE_FIELDS:
+        for name in (low, high):
+            if name in INORGANIC_FIELDS and not config.include_inorganic:
+                continue
+            value = getattr(config, name)
+            if name in COEFFICIENT_FIELDS:
+                bounds = sorted((1 + (value - 1) * (1 - spread), 1 + (value - 1) * (1 + spread)))
+            else:
+                bounds = sorted((value * (1 - spread), value * (1 + spread)))
+            factors.append(Factor(name, *bounds))
+    factors.append(Factor(
+        "ripening_period",
+        max(1, config.ripening_period - 2),
+        min(config.batches, config.ripening_period + 2),
+        integer=True,
+    ))
+    factors.append(Factor("dist_type", choices=("uniform", "concentrated")))
+    return factors
+
+
+def design_config(
+    config: SimulationConfig, factors: Sequence[Factor], point: Sequence[float]
+) -> SimulationConfig:
+    """``config`` with every factor set to its value at ``point``"""
+    values = {factor.field: factor.value(u) for factor, u in zip(factors, point)}
+    designed = replace(config, **values)
+    swapped = {}
+    for low, high in RANGE_FIELDS:
+        if getattr(designed, low) > getattr(designed, high):
+            swapped[low], swapped[high] = getattr(designed, high), getattr(designed, low)
+    return replace(designed, **swapped) if swapped else designed
+
+
+@dataclass
+class SobolResult:
+    """First-order and total Sobol indices of each strategy's loss.
+
+    ``first_order`` and ``total_order`` have one row per entry of ``outputs``
+    (the loss, in percent, of a strategy against the reference optimum) and one
+    column per entry of ``factors``.
+    """
+
+    factors: List[str]
+    outputs: List[str]
+    first_order: np.ndarray
+    total_order: np.ndarray
+    evaluations: int
+
+    def ranking(self, output: str) -> List[Tuple[str, float, float]]:
+        """Factors of ``output`` ordered by total index: (factor, first order, total)"""
+        row = self.outputs.index(output)
+        order = np.argsort(-self.total_order[row])
+        return [(self.factors[column], float(self.first_order[row, column]),
+                 float(self.total_order[row, column])) for column in order]
+
+
+_WORKER_PIPELINE: Optional[IncrementalSimulation] = None
+
+
+def _evaluate_points(
+    config: SimulationConfig,
+    factors: Sequence[Factor],
+    points: np.ndarray,
+    seed: int,
+    names: Sequence[str],
+) -> np.ndarray:
+    """Mean final total of each named strategy at every design point"""
+    global _WORKER_PIPELINE
+    if _WORKER_PIPELINE is None or _WORKER_PIPELINE.seed != seed:
+        _WORKER_PIPELINE = IncrementalSimulation(seed)
+    finals = np.empty((len(names), len(points)))
+    for column, point in enumerate(points):
+        averages = _WORKER_PIPELINE.run(design_config(config, factors, point))
+        for row, name in enumerate(names):
+            finals[row, column] = averages[name][-1]
+    return finals
+
+
+def evaluate_design(
+    config: SimulationConfig,
+    factors: Sequence[Factor],
+    points: np.ndarray,
+    names: Sequence[str],
+    seed: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> np.ndarray:
+    """Mean final totals (``len(names) x len(points)``) at design ``points`` in [0, 1)^d.
+
+    Every point runs ``config.experiments`` experiments on the incremental
+    pipeline with the same ``seed``, so the totals are a deterministic function
+    of the factors, and consecutive points reuse the cached stages their
+    differing factors do not touch. Contiguous chunks of points run in
+    ``workers`` processes; ``progress`` is called as each one finishes.
+    """
+    if not IncrementalSimulation.supports(config):
+        raise ValueError("Designed runs need plain random sampling without capacities.")
+    points = np.asarray(points, dtype=float)
+    total = len(points)
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, math.ceil(total / (4 * workers)))
+    spans = [(start, min(start + chunk, total)) for start in range(0, total, chunk)]
+    finals = np.empty((len(names), total))
+    done = 0
+
+    def store(span: Tuple[int, int], values: np.ndarray) -> None:
+        nonlocal done
+        finals[:, span[0]:span[1]] = values
+        done += span[1] - span[0]
+        if progress is not None:
+            progress(done, total)
+
+    if workers == 1:
+        for start, stop in spans:
+            store((start, stop), _evaluate_points(
+                config, factors, points[start:stop], seed, names))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = {
+                pool.submit(_evaluate_points, config, factors, points[start:stop], seed,
+                            names): (start, stop)
+                for start, stop in spans
+            }
+            for task in as_completed(tasks):
+                store(tasks[task], task.result())
+    return finals
+
+
+def losses_against(optimum: np.ndarray, finals: np.ndarray) -> np.ndarray:
+    """Loss in percent of each row of ``finals`` against ``optimum``"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        losses = (optimum - finals) / optimum * 100
+    return np.where(optimum != 0, losses, 0.0)
+
+
+def sobol_analysis(
+    config: SimulationConfig,
+    factors: Optional[Sequence[Factor]] = None,
+    samples: int = 256,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> SobolResult:
+    """Sobol indices of the strategies' losses over the ``factors`` of ``config``.
+
+    A scrambled Sobol' sequence of ``2d`` dimensions gives the Saltelli base
+    matrices ``A`` and ``B``; the ``d`` matrices ``AB_i`` take column ``i`` from
+    ``B``, which makes ``samples * (d + 2)`` design points, evaluated with
+    :func:`evaluate_design`. Points are ordered sample by sample, so
+    consecutive points differ in a few factors. The indices use the Saltelli
+    (first order) and Jansen (total) estimators of
+    :func:`scipy.stats.sobol_indices`.
+    """
+    factors = list(factors) if factors is not None else default_factors(config)
+    if not factors:
+        raise ValueError("At least one factor is required.")
+    if samples < 2 or samples & (samples - 1):
+        raise ValueError("Number of samples must be a power of two.")
+    reference = reference_strategy()
+    if reference is None:
+        raise ValueError("Sensitivity analysis needs a reference strategy.")
+    outputs = [strategy.name for strategy in active_strategies() if strategy.name != reference]
+
+    dimension = len(factors)
+    base = qmc.Sobol(d=2 * dimension, scramble=True, seed=seed).random(samples)
+    a, b = base[:, :dimension], base[:, dimension:]
+    # design[j] holds A_j, B_j, then AB_1j ... AB_dj.
+    design = np.repeat(a[:, np.newaxis, :], dimension + 2, axis=1)
+    design[:, 1] = b
+    for index in range(dimension):
+        design[:, index + 2, index] = b[:, index]
+
+    finals = evaluate_design(
+        config, factors, design.reshape(-1, dimension), [reference] + outputs,
+        seed=seed, workers=workers, progress=progress,
+    )
+    results = losses_against(finals[0], finals[1:]).reshape(len(outputs), samples, dimension + 2)
+
+    indices = stats.sobol_indices(
+        func={
+            "f_A": results[:, :, 0],
+            "f_B": results[:, :, 1],
+            "f_AB": np.moveaxis(results[:, :, 2:], -1, 0),
+        },
+        n=samples,
+    )
+    return SobolResult(
+        factors=[factor.field for factor in factors],
+        outputs=outputs,
+        first_order=np.atleast_2d(indices.first_order),
+        total_order=np.atleast_2d(indices.total_order),
+        evaluations=samples * (dimension + 2),
+    )
+
+
+__all__ = [
+    "Factor",
+    "SobolResult",
+    "default_factors",
+    "design_config",
+    "evaluate_design",
+    "losses_against",
+    "sobol_analysis",
+]
@@ -2,63 +2,69 @@ from __future__ import annotations
 
 import threading
 import time
-from dataclasses import dataclass
-from typing import Dict, List
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
 import flet as ft
 from flet.plotly_chart import PlotlyChart
 
 import plotly.graph_objects as go
 
-from . import (
-    adjust_for_inorganic,
-    base_sugar_matrix,
-    greedy_algorithm,
-    greedy_then_thrifty,
-    hungarian_max_algorithm,
-    inorganic_matrix,
-    calculate_losses_matrix,
-    merge_matrices,
-    random_matrix,
-    concentrated_matrix,
-    thrifty_algorithm,
-    thrifty_then_greedy,
+from .checkpoint import SimulationCheckpoint
+from .comparison import PairedComparison
+from .figures import (
+    build_chart_figure,
+    build_cumulative_figure,
+    build_frequency_figure,
+    build_loss_figure,
+    build_preview_figure,
 )
-
-MatrixSummary = Dict[str, List[float]]
-
-
-@dataclass
-class SimulationConfig:
-    batches: int
-    ripening_period: int
-    min_sugar: float
-    max_sugar: float
-
-    min_rip_coeff: float
-    max_rip_coeff: float
-    min_deg_coeff: float
-    max_deg_coeff: float
-
-    include_inorganic: bool
-    include_ripening: bool
-    experiments: int
-    dist_type: str
-    daily_tonnage: float
-
-    min_k: float
-    max_k: float
-    min_na: float
-    max_na: float
-    min_n: float
-    max_n: float
-    min_i0: float
-    max_i0: float
+from .frequency import AssignmentFrequency
+from .metrics import STAGE_LATENCY, track_run
+from .pipeline import IncrementalSimulation
+from .preview import WhatIfPreview
+from .sampling import SOBOL_MAX_DIMENSION, VarianceTracker
+from .robust import ROBUST_PLAN_NAME
+from .runstats import RunStatistics
+from .server import ComputePool, PoolBusyError
+from .simulation import (
+    MatrixSummary,
+    SimulationConfig,
+    coefficient_generator,
+    run_simulation,
+    sampling_dimension,
+    to_tonnage,
+    tonnage_factor,
+)
+from .strategies import hindsight_strategies, reference_strategy
+from .surrogate import DEFAULT_TOLERANCE, Surrogate
+
+CHECKPOINT_PATH = Path.home() / ".sugar_beet" / "checkpoint.json"
+SURROGATE_PATH = Path.home() / ".sugar_beet" / "surrogate.npz"
+# Larger runs (experiments x batches^2 cells) can outlast a checkpoint interval,
+# so they go to run_simulation, which checkpoints, instead of the pipeline.
+PIPELINE_CELLS = 1_000_000
+
+SAMPLING_LABELS = {
+    "random": "Псевдослучайная",
+    "sobol": "Соболь (QMC)",
+    "halton": "Халтон (QMC)",
+    "lhs": "Латинский гиперкуб",
+    "antithetic": "Антитетическая",
+}
+
+ROBUST_LABELS = {
+    "none": "Не строить",
+    "mean": "Максимум ожидания",
+    "cvar": "Максимум CVaR (10% худших)",
+}
 
 
 class SugarBeetApp:
-    def __init__(self, page: ft.Page) -> None:
+    def __init__(self, page: ft.Page, pool: Optional[ComputePool] = None) -> None:
         self.page = page
+        self.pool = pool
         self.page.title = "Рассчёт сахаризации свеклы"
         self.page.theme = ft.Theme(color_scheme_seed=ft.Colors.TEAL_400)
         self.page.bgcolor = "#F5F7F8"
@@ -67,6 +73,11 @@ class SugarBeetApp:
 
         self.fields: Dict[str, ft.TextField] = {}
         self.results_cache: Dict[str, float] = {}
+        self.pipeline = IncrementalSimulation()
+        # With the run's seed the last estimate is exactly what the run will show.
+        self.preview = WhatIfPreview(self._show_preview, seed=self.pipeline.seed)
+        self.surrogate_error: Optional[str] = None
+        self.surrogate = self._load_surrogate()
 
         self.include_inorganic = ft.Switch(
             value=False,
@@ -74,12 +85,32 @@ class SugarBeetApp:
             on_change=self._toggle_inorganic_fields
         )
 
+        self.capacity_mode = ft.Switch(
+            value=False,
+            active_color=ft.Colors.TEAL_600,
+            on_change=self._toggle_capacity_fields
+        )
+
         self.include_ripening = ft.Switch(
             value=True,
             active_color=ft.Colors.TEAL_600,
             on_change=self._toggle_ripening_fields
         )
 
+        self.use_surrogate = ft.Switch(
+            value=True,
+            active_color=ft.Colors.TEAL_600,
+            visible=self.surrogate is not None,
+        )
+
+        # Estimates are computed in this process, so the web server does not offer them.
+        self.preview_mode = ft.Switch(
+            value=False,
+            active_color=ft.Colors.TEAL_600,
+            visible=pool is None,
+            on_change=self._handle_edit,
+        )
+
         self.dist_group = ft.RadioGroup(
             content=ft.Column([
                 ft.Radio(
@@ -91,7 +122,46 @@ class SugarBeetApp:
                     label="Концентрированное",
                     label_style=ft.TextStyle(color=ft.Colors.GREY_800, size=14)),
             ]),
-            value="uniform"
+            value="uniform",
+            on_change=self._handle_edit,
+        )
+
+        self.sampling_dropdown = ft.Dropdown(
+            value="random",
+            options=[
+                ft.dropdown.Option(key, label) for key, label in SAMPLING_LABELS.items()
+            ],
+            border_radius=8,
+            dense=True,
+            filled=True,
+            bgcolor=ft.Colors.GREY_50,
+            text_style=ft.TextStyle(color=ft.Colors.GREY_800, size=16),
+            on_change=self._handle_edit,
+        )
+        self.robust_dropdown = ft.Dropdown(
+            value="none",
+            options=[
+                ft.dropdown.Option(key, label) for key, label in ROBUST_LABELS.items()
+            ],
+            border_radius=8,
+            dense=True,
+            filled=True,
+            bgcolor=ft.Colors.GREY_50,
+            text_style=ft.TextStyle(color=ft.Colors.GREY_800, size=16),
+            on_change=self._handle_edit,
+        )
+        self.variance = VarianceTracker()
+        self.frequencies = AssignmentFrequency(reference_strategy())
+        self.comparison = PairedComparison()
+        self.statistics = RunStatistics()
+        self.frequency_dropdown = ft.Dropdown(
+            options=[],
+            border_radius=8,
+            dense=True,
+            filled=True,
+            bgcolor=ft.Colors.GREY_50,
+            text_style=ft.TextStyle(color=ft.Colors.GREY_800, size=16),
+            on_change=lambda _: self._update_frequency_chart(),
         )
 
         self.chart = PlotlyChart(self._build_chart_figure(show_annotation=True), expand=True)
@@ -129,8 +199,11 @@ class SugarBeetApp:
         self.tabs: ft.Tabs | None = None
         self.inorganic_params_container = ft.Column(visible=False, spacing=12)
         self.ripening_params_container = ft.Column(visible=True, spacing=12)
+        self.capacity_params_container = ft.Column(visible=False, spacing=12)
 
         self._build_layout()
+        if self.surrogate_error is not None:
+            self._toast(self.surrogate_error)
 
     def _loss_chart_placeholder(self):
         return PlotlyChart(self._build_loss_figure({}), expand=True)
@@ -162,6 +235,7 @@ class SugarBeetApp:
         )
 
         self.loss_chart = PlotlyChart(self._build_loss_figure({}), expand=True)
+        self.frequency_chart = PlotlyChart(build_frequency_figure(None), expand=True)
 
         self.tabs = ft.Tabs(
             selected_index=0,
@@ -193,6 +267,17 @@ class SugarBeetApp:
                     icon=ft.Icons.BAR_CHART,
                     content=ft.Container(content=self.loss_chart, padding=10),
                 ),
+                ft.Tab(
+                    text="Порядок",
+                    icon=ft.Icons.GRID_ON,
+                    content=ft.Column(
+                        controls=[
+                            ft.Container(content=self.frequency_dropdown, width=380),
+                            self.frequency_chart,
+                        ],
+                        expand=True,
+                    ),
+                ),
             ],
             expand=True,
         )
@@ -314,6 +399,15 @@ class SugarBeetApp:
                 spacing=10),
         ]
 
+        self.capacity_params_container.controls = [
+            ft.Text(
+                "Масса партии (т)", size=14, weight=ft.FontWeight.W_500, color=ft.Colors.GREY_800),
+            ft.Row([
+                    self._number_field("Мин", "1000", "min_mass"),
+                    self._number_field("Макс", "3000", "max_mass")],
+                spacing=10),
+        ]
+
         self.ripening_params_container.controls = [
              ft.Container(height=5),
              self._number_field("Длительность дозаривания (v)", "7", "ripening"),
@@ -346,6 +440,38 @@ class SugarBeetApp:
                 self._number_field("Кол-во партий (n)", "15", "batches"),
                 self._number_field("Сут. переработка (т)", "3000", "tonnage"),
                 self._number_field("Эксперименты", "50", "experiments"),
+
+                ft.Row([
+                    ft.Text(
+                        "Учитывать мощность по дням",
+                        size=15,
+                        weight=ft.FontWeight.W_500,
+                        color=ft.Colors.GREY_800,
+                        expand=True),
+                    self.capacity_mode
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                self.capacity_params_container,
+
+                ft.Row([
+                    ft.Text(
+                        "Предпросмотр при вводе",
+                        size=15,
+                        weight=ft.FontWeight.W_500,
+                        color=ft.Colors.GREY_800,
+                        expand=True),
+                    self.preview_mode
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN, visible=self.pool is None),
+
+                ft.Row([
+                    ft.Text(
+                        "Быстрый ответ по модели",
+                        size=15,
+                        weight=ft.FontWeight.W_500,
+                        color=ft.Colors.GREY_800,
+                        expand=True),
+                    self.use_surrogate
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    visible=self.surrogate is not None),
             ], spacing=10),
             bgcolor=ft.Colors.GREY_50,
             padding=15,
@@ -423,7 +549,23 @@ class SugarBeetApp:
                     size=15,
                     color=ft.Colors.GREY_800,
                     weight=ft.FontWeight.W_500),
-                self.dist_group
+                self.dist_group,
+
+                ft.Divider(height=20, thickness=1, color=ft.Colors.GREY_300),
+
+                ft.Text(
+                    "Схема выборки",
+                    size=15,
+                    color=ft.Colors.GREY_800,
+                    weight=ft.FontWeight.W_500),
+                self.sampling_dropdown,
+
+                ft.Text(
+                    "Единый план для всех сценариев",
+                    size=15,
+                    color=ft.Colors.GREY_800,
+                    weight=ft.FontWeight.W_500),
+                self.robust_dropdown
 
             ], spacing=10),
             bgcolor=ft.Colors.GREY_50,
@@ -503,7 +645,8 @@ class SugarBeetApp:
             label_style=ft.TextStyle(color=ft.Colors.GREY_700, size=16),
             focused_border_color=ft.Colors.TEAL,
             content_padding=12,
-            height=45
+            height=45,
+            on_change=self._handle_edit,
         )
         self.fields[key] = tf
         return ft.Container(content=tf, expand=1)
@@ -534,55 +677,44 @@ class SugarBeetApp:
         )
 
     def _build_loss_figure(self, final_values: Dict[str, float]) -> go.Figure:
-        fig = go.Figure()
-
-        if not final_values:
-            fig.update_layout(
-                template="plotly_white",
-                annotations=[dict(
-                    text="Запустите расчёт",
-                    x=0.5, y=0.5, xref="paper", yref="paper",
-                    showarrow=False, font=dict(size=18, color="gray")
-                )]
-            )
-            return fig
-
-        hungarian = final_values["Венгерский (макс.)"]
-
-        algorithms = []
-        losses = []
-
-        for name, val in final_values.items():
-            if "Венгерский" in name:
-                continue
-            algorithms.append(name)
-            losses.append((hungarian - val) / hungarian * 100)
-
-        fig.add_trace(go.Bar(
-            x=algorithms,
-            y=losses,
-            text=[f"{l:.2f}%" for l in losses],
-            textposition="outside",
-            marker=dict(color="#26a69a")
-        ))
-
-        fig.update_layout(
-            template="plotly_white",
-            yaxis_title="Потери (%)",
-            xaxis_title="Алгоритм",
-            margin=dict(l=40, r=40, t=40, b=40),
-        )
-
-        return fig
+        return build_loss_figure(final_values)
 
 
     def _toggle_inorganic_fields(self, e):
         self.inorganic_params_container.visible = self.include_inorganic.value
         self.inorganic_params_container.update()
+        self._handle_edit(e)
+
+    def _toggle_capacity_fields(self, e):
+        self.capacity_params_container.visible = self.capacity_mode.value
+        self.capacity_params_container.update()
+        self._handle_edit(e)
 
     def _toggle_ripening_fields(self, e):
         self.ripening_params_container.visible = self.include_ripening.value
         self.ripening_params_container.update()
+        self._handle_edit(e)
+
+    def _handle_edit(self, _: ft.ControlEvent) -> None:
+        if not self.preview_mode.value or self.loading_overlay.visible:
+            self.preview.cancel()
+            return
+        try:
+            config = self._parse_config()
+        except ValueError:
+            # Fields are often incomplete while being typed.
+            self.preview.cancel()
+            return
+        self.preview.request(config)
+
+    def _show_preview(
+        self, config: SimulationConfig, raw_averages: MatrixSummary, experiments: int
+    ) -> None:
+        if self.loading_overlay.visible:
+            return
+        self.chart.figure = build_preview_figure(
+            list(range(1, config.batches + 1)), to_tonnage(raw_averages, config), experiments)
+        self.chart.update()
 
     def _handle_run(self, _: ft.ControlEvent) -> None:
         try:
@@ -591,29 +723,111 @@ class SugarBeetApp:
             self._toast(str(exc))
             return
 
+        self.preview.cancel()
+        if self._answer_from_surrogate(config):
+            return
+        if self.pool is not None:
+            try:
+                future = self.pool.submit(config)
+            except PoolBusyError:
+                self._toast("Сервер перегружен, повторите расчёт позже.")
+                return
+            self._toggle_loading(True)
+            future.add_done_callback(lambda done: self._handle_pool_result(config, done))
+            return
+
         self._toggle_loading(True)
         time.sleep(0.1)
         threading.Thread(target=self._run_simulation_thread, args=(config,), daemon=True).start()
 
     def _run_simulation_thread(self, config: SimulationConfig):
         try:
-            raw_averages = self._run_simulation(config)
+            with track_run(config.experiments):
+                raw_averages = self._run_simulation(config)
+            self._show_results(config, raw_averages)
+        except Exception as exc:
+            self._toggle_loading(False)
+            # Only runs outside the pipeline write checkpoints, and only between chunks.
+            if SimulationCheckpoint(CHECKPOINT_PATH).load(config) is not None:
+                self._toast(f"Расчёт прерван ({exc}). "
+                            "Повторный запуск продолжит его с последней точки.")
+            else:
+                self._toast(f"Расчёт прерван из-за ошибки: {exc}")
+
+    def _handle_pool_result(self, config: SimulationConfig, future: Future) -> None:
+        self.variance = VarianceTracker()
+        try:
+            raw_averages, self.frequencies, self.comparison, self.statistics = future.result()
+            self._show_results(config, raw_averages)
+        except Exception as exc:
+            self._toggle_loading(False)
+            self._toast(f"Расчёт на сервере не удался: {exc}")
 
-            tonnage_averages = {}
-            for name, values in raw_averages.items():
-                tonnage_averages[name] = [(val / 100.0) * config.daily_tonnage for val in values]
+    def _show_results(self, config: SimulationConfig, raw_averages: MatrixSummary) -> None:
+        tonnage_averages = to_tonnage(raw_averages, config)
 
-            self.results_cache = {name: vals[-1] for name, vals in tonnage_averages.items()}
+        self.results_cache = {name: vals[-1] for name, vals in tonnage_averages.items()}
 
+        runtimes = self.statistics.runtimes()
+        factor = tonnage_factor(config)
+        worst_days = {name: value * factor for name, value in self.statistics.worst_days().items()}
+        probabilities = self._best_probabilities()
+        with STAGE_LATENCY.time(stage="chart_render"):
             self._update_chart(list(range(1, config.batches + 1)), tonnage_averages)
-            self._update_summary(tonnage_averages)
-            self._update_recommendation(tonnage_averages)
+            self._update_summary(tonnage_averages, runtimes, probabilities, worst_days)
+        self._update_recommendation(
+            tonnage_averages, config.sampling, tonnage_factor(config), probabilities)
+        self._update_frequency_options()
 
-            self._toggle_loading(False)
+        self._toggle_loading(False)
 
-        except Exception as exc:
-            print(f"Error in simulation thread: {exc}")
-            self._toggle_loading(False)
+    def _load_surrogate(self) -> Optional[Surrogate]:
+        if not SURROGATE_PATH.exists():
+            return None
+        try:
+            return Surrogate.load(SURROGATE_PATH)
+        except (OSError, ValueError, KeyError) as exc:
+            self.surrogate_error = f"Модель-заменитель не загружена: {exc}"
+            return None
+
+    def _answer_from_surrogate(self, config: SimulationConfig) -> bool:
+        """Show the surrogate's answer when its estimated error is small enough"""
+        if self.surrogate is None or not self.use_surrogate.value:
+            return False
+        estimate = self.surrogate.predict(config)
+        if estimate is None:
+            return False
+        error = max(estimate.errors.values())
+        if not estimate.within(DEFAULT_TOLERANCE):
+            self._toast(f"Погрешность модели ±{error:.2f}% — выполняется полный расчёт")
+            return False
+
+        tonnage_averages = to_tonnage(
+            {name: [value] for name, value in estimate.finals.items()}, config)
+        self.variance = VarianceTracker()
+        self.frequencies = AssignmentFrequency(reference_strategy())
+        self.comparison = PairedComparison()
+        self.statistics = RunStatistics()
+        self.results_cache = {name: vals[-1] for name, vals in tonnage_averages.items()}
+
+        self.chart.figure = self._build_chart_figure(
+            show_annotation=True, text="Ответ суррогатной модели: кривые не рассчитывались")
+        self.chart.update()
+        self._update_summary(tonnage_averages)
+        self._update_recommendation(tonnage_averages, config.sampling)
+        self.recommendation_text.value += (
+            f"\nОценка суррогатной модели, погрешность до ±{error:.2f}% (2σ)")
+        self.recommendation_text.update()
+        self._update_frequency_options()
+        return True
+
+    def _best_probabilities(self) -> Dict[str, float]:
+        """Probability of being the best implementable strategy, from the paired comparison"""
+        if self.comparison.count < 2:
+            return {}
+        hindsight = hindsight_strategies()
+        names = [name for name in self.comparison.names if name not in hindsight]
+        return self.comparison.probability_best(names)
 
     def _toggle_loading(self, is_loading: bool):
         self.loading_overlay.visible = is_loading
@@ -628,7 +842,7 @@ class SugarBeetApp:
             return type_func(val)
 
         try:
-            return SimulationConfig(
+            config = SimulationConfig(
                 batches=get_val("batches", int),
                 ripening_period=get_val("ripening", int),
                 min_sugar=get_val("min_sugar"),
@@ -643,142 +857,93 @@ class SugarBeetApp:
                 include_ripening=self.include_ripening.value,
                 experiments=get_val("experiments", int),
                 dist_type=self.dist_group.value,
+                sampling=self.sampling_dropdown.value,
+                robust_objective=self.robust_dropdown.value,
                 daily_tonnage=get_val("tonnage"),
 
                 min_k=get_val("min_k"), max_k=get_val("max_k"),
                 min_na=get_val("min_na"), max_na=get_val("max_na"),
                 min_n=get_val("min_n"), max_n=get_val("max_n"),
                 min_i0=get_val("min_i0"), max_i0=get_val("max_i0"),
+
+                capacity_mode=self.capacity_mode.value,
+                min_mass=get_val("min_mass"), max_mass=get_val("max_mass"),
             )
         except ValueError as e:
             raise ValueError("Проверьте корректность введенных чисел.") from e
 
-    def _run_simulation(self, config: SimulationConfig) -> MatrixSummary:
-        gen_func = random_matrix if config.dist_type == "uniform" else concentrated_matrix
-
-        averages = {
-            "Венгерский (макс.)": [0.0] * config.batches,
-            "Жадный": [0.0] * config.batches,
-            "Бережливый": [0.0] * config.batches,
-            "Жадный -> Бережливый": [0.0] * config.batches,
-            "Бережливый -> Жадный": [0.0] * config.batches,
-        }
-
-        for _ in range(config.experiments):
-            if config.include_ripening:
-                coef_ripening = gen_func(
-                    config.batches,
-                    config.ripening_period,
-                    config.min_rip_coeff,
-                    config.max_rip_coeff,
-                )
-                coef_degradation = gen_func(
-                    config.batches,
-                    config.batches - config.ripening_period,
-                    config.min_deg_coeff,
-                    config.max_deg_coeff,
-                )
-                coefficients = merge_matrices(coef_ripening, coef_degradation)
-            else:
-                coefficients = gen_func(
-                    config.batches,
-                    config.batches,
-                    config.min_deg_coeff,
-                    config.max_deg_coeff,
-                )
-
-            base_matrix = base_sugar_matrix(
-                config.batches,
-                config.min_sugar,
-                config.max_sugar,
-                coefficients,
-            )
-
-            if config.include_inorganic:
-                inorganic = inorganic_matrix(
-                    config.batches,
-                    config.min_k, config.max_k,
-                    config.min_na, config.max_na,
-                    config.min_n, config.max_n,
-                )
-                losses = calculate_losses_matrix(
-                    config.batches,
-                    inorganic,
-                    config.min_i0,
-                    config.max_i0,
-                )
-                working_matrix = adjust_for_inorganic(base_matrix, losses)
-            else:
-                working_matrix = base_matrix
-
-            self._accumulate_results(
-                averages["Венгерский (макс.)"],
-                hungarian_max_algorithm(working_matrix)[0],
-                config.experiments,
-            )
-            self._accumulate_results(
-                averages["Жадный"],
-                greedy_algorithm(working_matrix)[0],
-                config.experiments,
-            )
-            self._accumulate_results(
-                averages["Бережливый"],
-                thrifty_algorithm(working_matrix)[0],
-                config.experiments,
-            )
-            self._accumulate_results(
-                averages["Жадный -> Бережливый"],
-                greedy_then_thrifty(working_matrix, config.ripening_period)[0],
-                config.experiments,
-            )
-            self._accumulate_results(
-                averages["Бережливый -> Жадный"],
-                thrifty_then_greedy(working_matrix, config.ripening_period)[0],
-                config.experiments,
-            )
-
-        return averages
+        if config.capacity_mode:
+            if config.min_mass < 0 or config.min_mass > config.max_mass:
+                raise ValueError("Диапазон массы партий задан неверно.")
+            capacity = config.daily_tonnage * config.batches
+            if config.max_mass * config.batches > capacity:
+                raise ValueError(
+                    f"Партии могут весить до {config.max_mass * config.batches:.0f} т, "
+                    f"а за {config.batches} дн. завод переработает {capacity:.0f} т. "
+                    "Уменьшите массу партий или увеличьте суточную переработку.")
+        if config.sampling == "sobol":
+            dimension = sampling_dimension(config, coefficient_generator(config))
+            if dimension > SOBOL_MAX_DIMENSION:
+                raise ValueError(
+                    f"Схема Соболя допускает не более {SOBOL_MAX_DIMENSION} случайных величин "
+                    f"на эксперимент, а здесь их {dimension}. Уменьшите число партий "
+                    "или выберите другую схему.")
+        return config
 
-    def _accumulate_results(
-        self, target: List[float], values: List[float], experiments: int
-    ) -> None:
-        for idx, value in enumerate(values):
-            target[idx] += value / experiments
-
-    def _build_chart_figure(self, show_annotation: bool = False) -> go.Figure:
-        fig = go.Figure()
-        annotations_list = []
-        if show_annotation:
-            annotations_list.append(dict(
-                text="Нажмите 'Запустить расчёт'", xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False, font=dict(color="gray", size=18),
-            ))
-
-        fig.update_layout(
-            template="plotly_white", margin=dict(l=40, r=20, t=40, b=40),
-            xaxis_title="День", yaxis_title="Кумулятивный показатель",
-            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            annotations=annotations_list,
-            font=dict(size=14)
-        )
-        return fig
+    def _run_simulation(self, config: SimulationConfig) -> MatrixSummary:
+        self.variance = VarianceTracker()
+        self.frequencies = AssignmentFrequency(reference_strategy())
+        self.comparison = PairedComparison()
+        self.statistics = RunStatistics()
+        checkpoint = SimulationCheckpoint(CHECKPOINT_PATH)
+        if self._use_pipeline(config, checkpoint):
+            return self.pipeline.run(
+                config, self.frequencies, self.comparison, statistics=self.statistics)
+        return run_simulation(
+            config, self.variance, checkpoint, self.frequencies, self.comparison,
+            self.statistics)
+
+    @staticmethod
+    def _use_pipeline(config: SimulationConfig, checkpoint: SimulationCheckpoint) -> bool:
+        """Whether ``config`` is short enough to skip checkpoints and has none to resume"""
+        cells = config.experiments * config.batches * config.batches
+        return (IncrementalSimulation.supports(config) and cells <= PIPELINE_CELLS
+                and checkpoint.load(config) is None)
+
+    def _update_frequency_options(self) -> None:
+        names = list(self.frequencies.counts)
+        self.frequency_dropdown.options = [ft.dropdown.Option(name) for name in names]
+        if self.frequency_dropdown.value not in names:
+            self.frequency_dropdown.value = names[0] if names else None
+        self.frequency_dropdown.update()
+        self._update_frequency_chart()
+
+    def _update_frequency_chart(self) -> None:
+        name = self.frequency_dropdown.value
+        if name in self.frequencies.counts:
+            self.frequency_chart.figure = build_frequency_figure(
+                self.frequencies.frequencies(name), self.frequencies.agreement().get(name))
+        else:
+            self.frequency_chart.figure = build_frequency_figure(None)
+        self.frequency_chart.update()
+
+    def _build_chart_figure(self, show_annotation: bool = False, **kwargs) -> go.Figure:
+        return build_chart_figure(show_annotation, **kwargs)
 
     def _update_chart(self, days: List[int], averages: MatrixSummary) -> None:
-        fig = self._build_chart_figure(show_annotation=False)
-        palette = ["#26a69a", "#ec407a", "#66bb6a", "#ffa726", "#ab47bc"]
-
-        for i, (name, values) in enumerate(averages.items()):
-            color = palette[i % len(palette)]
-            fig.add_trace(go.Scatter(
-                x=days, y=values, mode="lines+markers", name=name,
-                line=dict(color=color, width=3, shape='spline'),
-                marker=dict(size=8, line=dict(width=2, color='white')),
-            ))
-        self.chart.figure = fig
+        self.chart.figure = build_cumulative_figure(days, averages)
         self.chart.update()
 
-    def _build_summary_table(self, final_values: Dict[str, float]) -> ft.DataTable:
+    def _build_summary_table(
+        self,
+        final_values: Dict[str, float],
+        runtimes: Optional[Dict[str, float]] = None,
+        probabilities: Optional[Dict[str, float]] = None,
+        worst_days: Optional[Dict[str, float]] = None,
+    ) -> ft.DataTable:
+        runtimes = runtimes or {}
+        probabilities = probabilities or {}
+        worst_days = worst_days or {}
         rows = []
         if final_values:
             max_val = max(final_values.values())
@@ -815,6 +980,18 @@ class SugarBeetApp:
                         border_radius=6,
                         alignment=ft.alignment.center
                     )),
+                    ft.DataCell(ft.Text(
+                        f"{worst_days[name]:,.0f} т" if name in worst_days else "—",
+                        color=ft.Colors.GREY_800,
+                        size=14)),
+                    ft.DataCell(ft.Text(
+                        f"{probabilities[name] * 100:.1f}%" if name in probabilities else "—",
+                        color=ft.Colors.GREY_800,
+                        size=14)),
+                    ft.DataCell(ft.Text(
+                        f"{runtimes[name]:.2f}" if name in runtimes else "—",
+                        color=ft.Colors.GREY_800,
+                        size=14)),
                 ]))
 
         return ft.DataTable(
@@ -835,6 +1012,28 @@ class SugarBeetApp:
                         size=15,
                         weight=ft.FontWeight.BOLD),
                     numeric=True),
+                ft.DataColumn(ft.Text(
+                        "Худший день",
+                        text_align=ft.TextAlign.RIGHT,
+                        color=ft.Colors.GREY_800,
+                        size=15,
+                        weight=ft.FontWeight.BOLD),
+                    numeric=True,
+                    tooltip="Наименьшая выработка сахара за один день, в среднем по экспериментам"),
+                ft.DataColumn(ft.Text(
+                        "P(лучшая)",
+                        text_align=ft.TextAlign.RIGHT,
+                        color=ft.Colors.GREY_800,
+                        size=15,
+                        weight=ft.FontWeight.BOLD),
+                    numeric=True),
+                ft.DataColumn(ft.Text(
+                        "Время (мс)",
+                        text_align=ft.TextAlign.RIGHT,
+                        color=ft.Colors.GREY_800,
+                        size=15,
+                        weight=ft.FontWeight.BOLD),
+                    numeric=True),
             ],
             rows=rows,
             border_radius=10,
@@ -845,7 +1044,13 @@ class SugarBeetApp:
             divider_thickness=0.5
         )
 
-    def _update_summary(self, averages: MatrixSummary) -> None:
+    def _update_summary(
+        self,
+        averages: MatrixSummary,
+        runtimes: Optional[Dict[str, float]] = None,
+        probabilities: Optional[Dict[str, float]] = None,
+        worst_days: Optional[Dict[str, float]] = None,
+    ) -> None:
         if not averages:
             return
         final_values = {name: values[-1] for name, values in averages.items()}
@@ -857,24 +1062,42 @@ class SugarBeetApp:
         self.best_text.update()
         self.worst_text.update()
 
-        self.summary_table.rows = self._build_summary_table(final_values).rows
+        self.summary_table.rows = self._build_summary_table(
+            final_values, runtimes, probabilities, worst_days).rows
         self.summary_table.update()
 
         self.loss_chart.figure = self._build_loss_figure(final_values)
         self.loss_chart.update()
 
-    def _update_recommendation(self, averages: MatrixSummary) -> None:
+    def _update_recommendation(
+        self,
+        averages: MatrixSummary,
+        sampling: str = "random",
+        scale: float = 1.0,
+        probabilities: Optional[Dict[str, float]] = None,
+    ) -> None:
         if not averages:
             return
 
         final_values = {name: values[-1] for name, values in averages.items()}
-        real_strategies = {k: v for k, v in final_values.items() if "Венгерский" not in k}
+        reference = reference_strategy()
+        hindsight = hindsight_strategies()
+        real_strategies = {k: v for k, v in final_values.items() if k not in hindsight}
 
         if not real_strategies:
             return
 
-        best_strat = max(real_strategies, key=real_strategies.get)
-        ideal_val = final_values.get("Венгерский (макс.)", list(real_strategies.values())[0])
+        # The paired comparison ranks by the probability of being best; the
+        # means are the fallback when it has too few experiments.
+        probabilities = {
+            name: value for name, value in (probabilities or {}).items()
+            if name in real_strategies
+        }
+        if probabilities:
+            best_strat = max(probabilities, key=probabilities.get)
+        else:
+            best_strat = max(real_strategies, key=real_strategies.get)
+        ideal_val = final_values.get(reference, list(real_strategies.values())[0])
         best_val = real_strategies[best_strat]
 
         loss = 0.0
@@ -884,17 +1107,42 @@ class SugarBeetApp:
         rec_msg = (f"Рекомендуемая стратегия: {best_strat}\n"
                    f"Потери относительно эталона: {loss:.2f}%")
 
+        if probabilities:
+            rec_msg += f"\nВероятность быть лучшей: {probabilities[best_strat] * 100:.1f}%"
+            rivals = {name: real_strategies[name] for name in probabilities if name != best_strat}
+            if rivals:
+                rival = max(rivals, key=rivals.get)
+                paired = self.comparison.difference(best_strat, rival, scale=scale)
+                rec_msg += (f"\nПреимущество над «{rival}»: {paired.mean:+,.0f} т "
+                            f"(95% ДИ: {paired.low:,.0f}…{paired.high:,.0f} т), "
+                            f"лучше в {paired.win_rate * 100:.0f}% экспериментов")
+                if not paired.significant:
+                    rec_msg += "\nРазница не значима: увеличьте число экспериментов"
+
+        robust_val = final_values.get(ROBUST_PLAN_NAME)
+        if robust_val is not None and ideal_val != 0:
+            value_of_information = ideal_val - robust_val
+            rec_msg += (f"\nЦенность полной информации: {value_of_information:,.0f} т "
+                        f"({value_of_information / ideal_val * 100:.2f}%)")
+
+        reduction = self.variance.reduction().get(best_strat)
+        if sampling != "random" and reduction is not None:
+            rec_msg += (f"\nСхема выборки: {SAMPLING_LABELS[sampling]}, "
+                        f"снижение дисперсии: ×{reduction:.1f}")
+
         self.recommendation_text.value = rec_msg
         self.recommendation_container.visible = True
         self.recommendation_container.update()
 
     def _reset_fields(self, _: ft.ControlEvent) -> None:
+        self.preview.cancel()
         defaults = {
             "batches": "15", "ripening": "7", "min_sugar": "12", "max_sugar": "22",
             "min_rip": "1.01", "max_rip": "1.15", "min_deg": "0.85", "max_deg": "0.99",
             "experiments": "50", "tonnage": "3000",
             "min_k": "4.8", "max_k": "7.05", "min_na": "0.21", "max_na": "0.82",
-            "min_n": "1.58", "max_n": "2.8", "min_i0": "0.62", "max_i0": "0.64"
+            "min_n": "1.58", "max_n": "2.8", "min_i0": "0.62", "max_i0": "0.64",
+            "min_mass": "1000", "max_mass": "3000",
         }
         for key, value in defaults.items():
             if key in self.fields:
@@ -902,21 +1150,33 @@ class SugarBeetApp:
 
         self.include_inorganic.value = False
         self.include_ripening.value = True
+        self.capacity_mode.value = False
         self.dist_group.value = "uniform"
+        self.sampling_dropdown.value = "random"
+        self.robust_dropdown.value = "none"
         self.inorganic_params_container.visible = False
         self.ripening_params_container.visible = True
+        self.capacity_params_container.visible = False
 
         self.best_text.value = ""
         self.worst_text.value = ""
         self.chart.figure = self._build_chart_figure(show_annotation=True)
         self.summary_table.rows = []
         self.recommendation_container.visible = False
+        self.frequencies = AssignmentFrequency(reference_strategy())
+        self.comparison = PairedComparison()
+        self.statistics = RunStatistics()
+        self.frequency_dropdown.options = []
+        self.frequency_dropdown.value = None
+        self.frequency_chart.figure = build_frequency_figure(None)
 
         self.summary_table.update()
         self.chart.update()
         self.best_text.update()
         self.worst_text.update()
         self.recommendation_container.update()
+        self.frequency_dropdown.update()
+        self.frequency_chart.update()
         if self.tabs:
             self.tabs.update()
 
@@ -924,9 +1184,13 @@ class SugarBeetApp:
             field.update()
         self.include_inorganic.update()
         self.include_ripening.update()
+        self.capacity_mode.update()
         self.inorganic_params_container.update()
         self.ripening_params_container.update()
+        self.capacity_params_container.update()
         self.dist_group.update()
+        self.sampling_dropdown.update()
+        self.robust_dropdown.update()
 
     def _toast(self, message: str) -> None:
         self.page.snack_bar = ft.SnackBar(
@@ -937,4 +1201,12 @@ class SugarBeetApp:
 def launch(page: ft.Page) -> None:
     SugarBeetApp(page)
 
-__all__ = ["SugarBeetApp", "launch"]
+
+def server_target(pool: ComputePool) -> Callable[[ft.Page], None]:
+    """Build a session handler that runs every session on the shared ``pool``"""
+    def launch_session(page: ft.Page) -> None:
+        SugarBeetApp(page, pool=pool)
+
+    return launch_session
+
+__all__ = ["SimulationConfig", "SugarBeetApp", "launch", "server_target"]
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from .algorithms import Matrix, losses_matrix_from_i0_batch
+from .simulation import CHUNK_SIZE, MatrixSummary, evaluate_stack
+from .strategies import Strategy, active_strategies
+
+PathLike = Union[str, Path]
+
+REQUIRED_FIELDS = ("sugar", "k", "na", "n", "i0", "coefficients")
+_READ_SIZE = 1 << 16
+
+
+@dataclass
+class BatchRecord:
+    """Measured data of one batch.
+
+    ``coefficients[d]`` is the measured multiplier taking the sugar content of
+    day ``d`` to day ``d + 1``.
+    """
+
+    batch_id: str
+    sugar: float
+    k: float
+    na: float
+    n: float
+    i0: float
+    coefficients: List[float]
+
+
+def _parse_coefficients(coefficients: Any) -> List[float]:
+    if isinstance(coefficients, str):
+        try:
+            return list(map(float, coefficients.split(";")))
+        except ValueError:
+            # Empty parts, e.g. a trailing separator, are skipped.
+            coefficients = [part for part in coefficients.split(";") if part.strip()]
+    return [float(value) for value in coefficients]
+
+
+def _parse_record(raw: Dict[str, Any], position: int) -> BatchRecord:
+    missing = [name for name in REQUIRED_FIELDS if raw.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"Record {position} is missing fields: {', '.join(missing)}.")
+
+    try:
+        return BatchRecord(
+            batch_id=str(raw.get("batch") or position),
+            sugar=float(raw["sugar"]),
+            k=float(raw["k"]),
+            na=float(raw["na"]),
+            n=float(raw["n"]),
+            i0=float(raw["i0"]),
+            coefficients=_parse_coefficients(raw["coefficients"]),
+        )
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Record {position} contains a non-numeric value.") from exc
+
+
+def _iter_csv(handle: IO[str]) -> Iterator[BatchRecord]:
+    reader = csv.reader(handle)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = {name.strip().lower(): index for index, name in enumerate(header) if name.strip()}
+    missing = [name for name in REQUIRED_FIELDS if name not in columns]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}.")
+
+    # Only the columns a record uses are picked from each row.
+    wanted = [(name, columns[name]) for name in ("batch", *REQUIRED_FIELDS) if name in columns]
+    position = 0
+    for row in reader:
+        if not row:
+            continue
+        position += 1
+        width = len(row)
+        yield _parse_record(
+            {name: row[index] for name, index in wanted if index < width}, position)
+
+
+def _iter_json_lines(handle: IO[str]) -> Iterator[BatchRecord]:
+    position = 0
+    for line in handle:
+        if not line.strip():
+            continue
+        position += 1
+        yield _parse_record(json.loads(line), position)
+
+
+def _iter_json_array(handle: IO[str]) -> Iterator[BatchRecord]:
+    """Decode a top-level JSON array one element at a time"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    position = 0
+    exhausted = False
+
+    while True:
+        stripped = buffer.lstrip()
+        if not started:
+            if stripped.startswith("["):
+                buffer = stripped[1:]
+                started = True
+                continue
+            if stripped:
+                raise ValueError("JSON input must be an array of batch records.")
+        else:
+            stripped = stripped.lstrip(",").lstrip()
+            if stripped.startswith("]"):
+                return
+            if stripped:
+                try:
+                    item, end = decoder.raw_decode(stripped)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                else:
+                    position += 1
+                    yield _parse_record(item, position)
+                    buffer = stripped[end:]
+                    continue
+            buffer = stripped
+
+        if exhausted:
+            raise ValueError("Unexpected end of JSON input.")
+        chunk = handle.read(_READ_SIZE)
+        if not chunk:
+            exhausted = True
+        buffer += chunk
+
+
+def iter_batch_records(path: PathLike) -> Iterator[BatchRecord]:
+    """Stream batch records from a CSV, JSON array or JSON Lines file"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    with path.open("r", encoding="utf-8", newline="") as handle:
+        if suffix == ".csv":
+            yield from _iter_csv(handle)
+        elif suffix in (".jsonl", ".ndjson"):
+            yield from _iter_json_lines(handle)
+        elif suffix == ".json":
+            yield from _iter_json_array(handle)
+        else:
+            raise ValueError(f"Unsupported measurement file type: {path.suffix}")
+
+
+def iter_chunks(records: Iterable[BatchRecord], size: int) -> Iterator[List[BatchRecord]]:
+    """Group consecutive records into lists of ``size``; a short tail is dropped"""
+    if size <= 0:
+        raise ValueError("Chunk size must be positive.")
+    chunk: List[BatchRecord] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+
+def measured_stack(
+    experiments: List[List[BatchRecord]], include_inorganic: bool = True
+) -> np.ndarray:
+    """Build the working matrices of replayed experiments as one ``k x n x n`` stack.
+
+    The measured values are copied into preallocated arrays in a single pass
+    and the sugar and loss matrices of all experiments are computed at once.
+    """
+    count = len(experiments)
+    size = len(experiments[0]) if experiments else 0
+    factors = np.ones((count, size, size))
+    inorganic = np.empty((count, size, 3))
+    i0_values = np.empty((count, size))
+    for index, chunk in enumerate(experiments):
+        if len(chunk) != size:
+            raise ValueError("Every experiment must have the same number of batches.")
+        for batch, record in enumerate(chunk):
+            if len(record.coefficients) < size - 1:
+                raise ValueError(
+                    f"Batch {record.batch_id} needs at least {size - 1} daily coefficients."
+                )
+            # The initial sugar takes the first slot so the running product
+            # multiplies day by day, as sugar_matrix_from_initial does.
+            factors[index, batch, 0] = record.sugar
+            factors[index, batch, 1:] = record.coefficients[: size - 1]
+            inorganic[index, batch] = (record.k, record.na, record.n)
+            i0_values[index, batch] = record.i0
+
+    stack = np.cumprod(factors, axis=2)
+    if not include_inorganic:
+        return stack
+    return np.maximum(stack - losses_matrix_from_i0_batch(inorganic, i0_values), 0.0)
+
+
+def measured_matrix(chunk: List[BatchRecord], include_inorganic: bool = True) -> Matrix:
+    """Build the working matrix of one replayed experiment from measured batches"""
+    if not chunk:
+        raise ValueError("Size must be positive.")
+    return measured_stack([chunk], include_inorganic)[0].tolist()
+
+
+def _add_stack(
+    sums: Dict[str, np.ndarray],
+    experiments: List[List[BatchRecord]],
+    ripening_period: int,
+    include_inorganic: bool,
+    strategies: List[Strategy],
+) -> None:
+    stack = measured_stack(experiments, include_inorganic)
+    results = evaluate_stack(stack, ripening_period, strategies)
+    for name, totals in results.items():
+        sums[name] += totals.sum(axis=0)
+    experiments.clear()
+
+
+def replay_measurements(
+    path: PathLike,
+    batches: int,
+    ripening_period: int,
+    include_inorganic: bool = True,
+) -> Tuple[MatrixSummary, int]:
+    """Replay measured batches through every strategy, ``batches`` records per experiment.
+
+    Returns the averaged cumulative totals and the number of replayed experiments.
+    """
+    if ripening_period < 0 or ripening_period > batches:
+        raise ValueError("Ripening period must be between 0 and the number of batches.")
+
+    strategies = active_strategies()
+    sums = {strategy.name: np.zeros(batches) for strategy in strategies}
+    experiments = 0
+    pending: List[List[BatchRecord]] = []
+    for chunk in iter_chunks(iter_batch_records(path), batches):
+        pending.append(chunk)
+        experiments += 1
+        if len(pending) == CHUNK_SIZE:
+            _add_stack(sums, pending, ripening_period, include_inorganic, strategies)
+    if pending:
+        _add_stack(sums, pending, ripening_period, include_inorganic, strategies)
+
+    if experiments == 0:
+        raise ValueError("The file does not contain enough batches for one experiment.")
+
+    averages = {name: (values / experiments).tolist() for name, values in sums.items()}
+    return averages, experiments
+
+
+__all__ = [
+    "BatchRecord",
+    "iter_batch_records",
+    "iter_chunks",
+    "measured_matrix",
+    "measured_stack",
+    "replay_measurements",
+]
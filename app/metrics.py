@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [*labels, extra] if extra is not None else list(labels)
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{value}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# TYPE {self.name} {self.kind}", f"# HELP {self.name} {self.documentation}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}_total {_format_value(self._value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self._value)}"]
+
+
+class Histogram(_Metric):
+    """Latency histogram with one series per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # label set -> (bucket counts, sum, count)
+        self._series: Dict[Labels, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[Labels, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count)
+                    in self._series.items()}
+
+    def merge(self, snapshot: Dict[Labels, Tuple[List[int], float, int]]) -> None:
+        """Add observations recorded elsewhere, e.g. in a worker process"""
+        with self._lock:
+            for key, (counts, total, count) in snapshot.items():
+                own_counts, own_total, own_count = self._series.get(
+                    key, ([0] * len(self.buckets), 0.0, 0))
+                merged = [left + right for left, right in zip(own_counts, counts)]
+                self._series[key] = (merged, own_total + total, own_count + count)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def totals(self, label: str) -> Dict[str, float]:
+        """Summed observations per value of ``label``"""
+        result: Dict[str, float] = {}
+        for key, (_, total, _) in self.snapshot().items():
+            value = dict(key).get(label)
+            if value is not None:
+                result[value] = result.get(value, 0.0) + total
+        return result
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+MetricT = TypeVar("MetricT", bound=_Metric)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: MetricT) -> MetricT:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        """OpenMetrics text exposition of every registered metric"""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+RUNS_STARTED = REGISTRY.counter("sugar_runs_started", "Simulation runs started.")
+RUNS_COMPLETED = REGISTRY.counter("sugar_runs_completed", "Simulation runs completed.")
+RUNS_FAILED = REGISTRY.counter("sugar_runs_failed", "Simulation runs that raised an error.")
+RUNS_REJECTED = REGISTRY.counter(
+    "sugar_runs_rejected", "Runs refused by admission control of the shared pool.")
+EXPERIMENTS = REGISTRY.counter("sugar_experiments", "Experiments simulated by completed runs.")
+EXPERIMENT_RATE = REGISTRY.gauge(
+    "sugar_experiments_per_second", "Throughput of the most recently completed run.")
+QUEUE_DEPTH = REGISTRY.gauge("sugar_queue_depth", "Runs queued or running in the shared pool.")
+RUN_LATENCY = REGISTRY.histogram("sugar_run_seconds", "Wall time of whole simulation runs.")
+STAGE_LATENCY = REGISTRY.histogram(
+    "sugar_stage_seconds",
+    "Time spent per stage: generation per experiment, each strategy per chunk, chart render.")
+
+
+@contextmanager
+def track_run(experiments: int) -> Iterator[None]:
+    """Count a run as started, then as completed or failed, and time it"""
+    RUNS_STARTED.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        RUNS_FAILED.inc()
+        raise
+    record_completed_run(experiments, time.perf_counter() - start)
+
+
+def record_completed_run(experiments: int, elapsed: float) -> None:
+    RUNS_COMPLETED.inc()
+    EXPERIMENTS.inc(experiments)
+    RUN_LATENCY.observe(elapsed)
+    if elapsed > 0:
+        EXPERIMENT_RATE.set(experiments / elapsed)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def serve_metrics(
+    host: str = "127.0.0.1", port: int = 9100, registry: MetricsRegistry = REGISTRY
+) -> ThreadingHTTPServer:
+    """Expose ``registry`` at ``http://host:port/metrics`` from a daemon thread"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_metrics(path: Union[str, Path], registry: MetricsRegistry = REGISTRY) -> None:
+    """Atomically write the exposition to ``path`` for file-based scrapers"""
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    temporary.write_text(registry.render(), encoding="utf-8")
+    os.replace(temporary, path)
+
+
+def export_metrics(
+    path: Union[str, Path], interval: float = 15.0, registry: MetricsRegistry = REGISTRY
+) -> Callable[[], None]:
+    """Rewrite ``path`` now and every ``interval`` seconds from a daemon thread.
+
+    Returns a function that stops the thread after one last write, so the file
+    ends with the final values of the run.
+    """
+    if interval <= 0:
+        raise ValueError("Export interval must be positive.")
+    stopped = threading.Event()
+
+    def export() -> None:
+        while not stopped.wait(interval):
+            write_metrics(path, registry)
+        write_metrics(path, registry)
+
+    write_metrics(path, registry)
+    thread = threading.Thread(target=export, daemon=True)
+    thread.start()
+
+    def stop() -> None:
+        stopped.set()
+        thread.join()
+
+    return stop
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "REGISTRY",
+    "export_metrics",
+    "serve_metrics",
+    "track_run",
+    "write_metrics",
+]
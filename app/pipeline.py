@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .comparison import PairedComparison
+from .frequency import AssignmentFrequency
+from .robust import ROBUST_PLAN_NAME, robust_plan
+from .runstats import RunStatistics
+from .simulation import (
+    CHUNK_SIZE,
+    MatrixSummary,
+    SimulationConfig,
+    coefficient_generator,
+    draw_base_sugar,
+    draw_coefficients,
+    draw_losses,
+    run_simulation,
+    solve_stack,
+)
+from .strategies import active_strategies, reference_strategy
+
+# Largest number of matrix cells (experiments x batches^2) kept per cached array.
+MAX_CACHED_CELLS = 4_000_000
+
+Inputs = Dict[str, Any]
+# name -> (k x n totals, k x n plans, seconds spent)
+Solved = Dict[str, Tuple[np.ndarray, np.ndarray, float]]
+
+
+class RunCancelled(RuntimeError):
+    """Raised when a pipeline run is cancelled before it completes"""
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One cached step of the pipeline and the inputs that invalidate it.
+
+    A stage with a ``switch`` is skipped while that boolean field is off, so
+    its other fields are then left out of its key.
+    """
+
+    name: str
+    fields: Tuple[str, ...]
+    upstream: Tuple[str, ...]
+    compute: Callable[[SimulationConfig, Inputs, random.Random], Any]
+    switch: Optional[str] = None
+
+    def field_key(self, config: SimulationConfig) -> Tuple:
+        if self.switch is not None and not getattr(config, self.switch):
+            return (False,)
+        return tuple(getattr(config, name) for name in self.fields)
+
+
+def _coefficients(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> np.ndarray:
+    gen_func = coefficient_generator(config)
+    return np.array([draw_coefficients(config, gen_func, rng) for _ in range(config.experiments)])
+
+
+def _base_sugar(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> np.ndarray:
+    return np.array([
+        draw_base_sugar(config, coefficients.tolist(), rng)
+        for coefficients in inputs["coefficients"]
+    ])
+
+
+def _inorganic_losses(
+    config: SimulationConfig, inputs: Inputs, rng: random.Random
+) -> Optional[np.ndarray]:
+    if not config.include_inorganic:
+        return None
+    return np.array([draw_losses(config, rng) for _ in range(config.experiments)])
+
+
+def _working(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> np.ndarray:
+    base, losses = inputs["base_sugar"], inputs["inorganic_losses"]
+    if losses is None:
+        return base
+    # Same clipping as ``adjust_for_inorganic``, over all experiments at once.
+    return np.maximum(base - losses, 0.0)
+
+
+def _strategies(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> Solved:
+    working = inputs["working"]
+    totals: Dict[str, List[np.ndarray]] = {}
+    plans: Dict[str, List[np.ndarray]] = {}
+    timings: Dict[str, float] = {}
+    for start in range(0, len(working), CHUNK_SIZE):
+        chunk = solve_stack(
+            working[start:start + CHUNK_SIZE], config.ripening_period, timings=timings)
+        for name, (values, permutations) in chunk.items():
+            totals.setdefault(name, []).append(values)
+            plans.setdefault(name, []).append(permutations)
+    return {
+        name: (np.concatenate(totals[name]), np.concatenate(plans[name]), timings[name])
+        for name in totals
+    }
+
+
+def _frequencies(
+    config: SimulationConfig, inputs: Inputs, rng: random.Random
+) -> AssignmentFrequency:
+    frequencies = AssignmentFrequency(reference_strategy())
+    frequencies.add({name: plans for name, (_, plans, _) in inputs["strategies"].items()})
+    return frequencies
+
+
+def _comparison(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> PairedComparison:
+    comparison = PairedComparison()
+    comparison.add({name: totals[:, -1] for name, (totals, _, _) in inputs["strategies"].items()})
+    return comparison
+
+
+def _statistics(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> RunStatistics:
+    # Cached strategy results keep the timings of the run that computed them.
+    statistics = RunStatistics()
+    solved = inputs["strategies"]
+    statistics.add(
+        {name: totals for name, (totals, _, _) in solved.items()},
+        {name: seconds for name, (_, _, seconds) in solved.items()},
+    )
+    return statistics
+
+
+def _robust_plan(
+    config: SimulationConfig, inputs: Inputs, rng: random.Random
+) -> Optional[List[float]]:
+    if config.robust_objective == "none":
+        return None
+    working = inputs["working"]
+
+    def scenarios() -> Iterator[np.ndarray]:
+        for start in range(0, len(working), CHUNK_SIZE):
+            yield working[start:start + CHUNK_SIZE]
+
+    return robust_plan(
+        scenarios, config.robust_objective, config.cvar_alpha, config.cvar_time_limit).totals
+
+
+def _aggregation(config: SimulationConfig, inputs: Inputs, rng: random.Random) -> MatrixSummary:
+    averages = {
+        name: totals.mean(axis=0).tolist() for name, (totals, _, _) in inputs["strategies"].items()
+    }
+    if inputs["robust_plan"] is not None:
+        averages[ROBUST_PLAN_NAME] = list(inputs["robust_plan"])
+    return averages
+
+
+_GENERATION = ("experiments", "batches")
+
+STAGES = (
+    Stage(
+        "coefficients",
+        _GENERATION + ("dist_type", "include_ripening", "ripening_period",
+                       "min_rip_coeff", "max_rip_coeff", "min_deg_coeff", "max_deg_coeff"),
+        (),
+        _coefficients,
+    ),
+    Stage("base_sugar", ("min_sugar", "max_sugar"), ("coefficients",), _base_sugar),
+    Stage(
+        "inorganic_losses",
+        _GENERATION + ("include_inorganic", "min_k", "max_k", "min_na", "max_na",
+                       "min_n", "max_n", "min_i0", "max_i0"),
+        (),
+        _inorganic_losses,
+        switch="include_inorganic",
+    ),
+    Stage("working", (), ("base_sugar", "inorganic_losses"), _working),
+    Stage("strategies", ("ripening_period",), ("working",), _strategies),
+    Stage("frequencies", (), ("strategies",), _frequencies),
+    Stage("comparison", (), ("strategies",), _comparison),
+    Stage("statistics", (), ("strategies",), _statistics),
+    Stage(
+        "robust_plan",
+        ("robust_objective", "cvar_alpha", "cvar_time_limit"),
+        ("working",),
+        _robust_plan,
+    ),
+    Stage("aggregation", (), ("strategies", "robust_plan"), _aggregation),
+)
+
+
+class IncrementalSimulation:
+    """Simulation pipeline that only recomputes the stages a config change affects.
+
+    Each stage draws from its own random stream derived from ``seed``, so its
+    output depends only on the inputs it declares and cached upstream arrays
+    stay valid when unrelated fields change. Registered strategies are part of
+    the key of the strategy stage. Capacity-aware runs, quasi-random sampling
+    and runs too large to cache are passed to :func:`run_simulation`. A run
+    given ``cancelled`` checks it before each stage it recomputes and raises
+    :class:`RunCancelled` once it returns true.
+    """
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.recomputed: List[str] = []
+        self._cache: Dict[str, Tuple[Hashable, Any]] = {}
+
+    @staticmethod
+    def supports(config: SimulationConfig) -> bool:
+        cells = config.experiments * config.batches * config.batches
+        return (not config.capacity_mode and config.sampling == "random"
+                and cells <= MAX_CACHED_CELLS)
+
+    def run(
+        self,
+        config: SimulationConfig,
+        frequencies: Optional[AssignmentFrequency] = None,
+        comparison: Optional[PairedComparison] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+        statistics: Optional[RunStatistics] = None,
+    ) -> MatrixSummary:
+        if not self.supports(config):
+            self.recomputed = [stage.name for stage in STAGES]
+            return run_simulation(
+                config, frequencies=frequencies, comparison=comparison, statistics=statistics)
+
+        keys: Dict[str, Hashable] = {}
+        outputs: Dict[str, Any] = {}
+        self.recomputed = []
+        for stage in STAGES:
+            key = (
+                stage.field_key(config),
+                tuple(keys[name] for name in stage.upstream),
+                self._registry_key() if stage.name == "strategies" else None,
+            )
+            keys[stage.name] = key
+            cached = self._cache.get(stage.name)
+            if cached is not None and cached[0] == key:
+                outputs[stage.name] = cached[1]
+                continue
+            if cancelled is not None and cancelled():
+                raise RunCancelled(f"Run cancelled before stage {stage.name}.")
+            rng = random.Random(f"{self.seed}:{stage.name}")
+            inputs = {name: outputs[name] for name in stage.upstream}
+            outputs[stage.name] = stage.compute(config, inputs, rng)
+            self._cache[stage.name] = (key, outputs[stage.name])
+            self.recomputed.append(stage.name)
+        if frequencies is not None:
+            frequencies.merge(outputs["frequencies"])
+        if comparison is not None:
+            comparison.merge(outputs["comparison"])
+        if statistics is not None:
+            statistics.merge(outputs["statistics"])
+        return outputs["aggregation"]
+
+    @staticmethod
+    def _registry_key() -> Hashable:
+        return tuple(
+            (strategy.name, strategy.kernel, strategy.function,
+             tuple(sorted(strategy.parameters.items())))
+            for strategy in active_strategies()
+        )
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+__all__ = ["IncrementalSimulation", "MAX_CACHED_CELLS", "RunCancelled", "STAGES", "Stage"]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import random
+import threading
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .pipeline import IncrementalSimulation, RunCancelled
+from .simulation import MatrixSummary, SimulationConfig
+
+# Experiment counts of the successive estimates; the last one is the configured count.
+PREVIEW_LEVELS = (16, 64, 256)
+# Seconds without further edits before an estimate is started.
+PREVIEW_DELAY = 0.3
+
+# on_result(config, averages, experiments)
+PreviewCallback = Callable[[SimulationConfig, MatrixSummary, int], None]
+
+
+def preview_levels(config: SimulationConfig, levels: Sequence[int] = PREVIEW_LEVELS) -> List[int]:
+    """Experiment counts of the estimates for ``config``, smallest first"""
+    counts = [level for level in levels if level < config.experiments] + [config.experiments]
+    return [
+        count for count in counts
+        if IncrementalSimulation.supports(replace(config, experiments=count))
+    ]
+
+
+class WhatIfPreview:
+    """Estimates of a run that follow the parameters while they are being edited.
+
+    :meth:`request` restarts a short timer; once the edits pause, the config is
+    run at the experiment counts of :func:`preview_levels` and ``on_result`` is
+    called after each of them. Every level has its own pipeline, so unchanged
+    draws stay cached between edits, and all of them share one seed: a smaller
+    estimate uses the first experiments of the larger ones. A newer request
+    cancels the refinement in progress at the next pipeline stage. Configs the
+    pipeline does not support are not previewed.
+    """
+
+    def __init__(
+        self,
+        on_result: PreviewCallback,
+        delay: float = PREVIEW_DELAY,
+        levels: Sequence[int] = PREVIEW_LEVELS,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.on_result = on_result
+        self.delay = delay
+        self.levels = tuple(levels)
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self._pipelines: Dict[int, IncrementalSimulation] = {}
+        self._generation = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        # Only one refinement uses the pipelines at a time.
+        self._run_lock = threading.Lock()
+
+    def request(self, config: SimulationConfig) -> bool:
+        """Schedule estimates for ``config``; false when it cannot be previewed"""
+        with self._lock:
+            self._generation += 1
+            self._cancel_timer()
+            if not preview_levels(config, self.levels):
+                return False
+            self._timer = threading.Timer(
+                self.delay, self._refine, (config, self._generation))
+            self._timer.daemon = True
+            self._timer.start()
+            return True
+
+    def cancel(self) -> None:
+        """Drop the pending estimate and stop the refinement in progress"""
+        with self._lock:
+            self._generation += 1
+            self._cancel_timer()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _stale(self, generation: int) -> bool:
+        return generation != self._generation
+
+    def _refine(self, config: SimulationConfig, generation: int) -> None:
+        with self._run_lock:
+            levels = preview_levels(config, self.levels)
+            for experiments in levels:
+                # The configured count, when it is not a level, shares one pipeline.
+                key = experiments if experiments in self.levels else -1
+                pipeline = self._pipelines.get(key)
+                if pipeline is None:
+                    pipeline = self._pipelines[key] = IncrementalSimulation(self.seed)
+                try:
+                    averages = pipeline.run(
+                        replace(config, experiments=experiments),
+                        cancelled=lambda: self._stale(generation),
+                    )
+                except RunCancelled:
+                    return
+                if self._stale(generation):
+                    return
+                self.on_result(config, averages, experiments)
+
+
+__all__ = ["PREVIEW_DELAY", "PREVIEW_LEVELS", "WhatIfPreview", "preview_levels"]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Union
+
+import kaleido
+
+from .figures import build_cumulative_figure, build_loss_figure, build_summary_figure
+from .simulation import SimulationConfig, run_simulation, to_tonnage
+
+REPORT_FORMATS = ("png", "svg", "pdf")
+
+PathLike = Union[str, Path]
+
+
+def load_configs(path: PathLike) -> List[SimulationConfig]:
+    """Read a JSON list of :class:`SimulationConfig` field mappings"""
+    with Path(path).open("r", encoding="utf-8") as handle:
+        raw = json.load(handle)
+    if not isinstance(raw, list):
+        raise ValueError("Report configuration file must contain a list.")
+    return [SimulationConfig(**item) for item in raw]
+
+
+def save_configs(configs: Sequence[SimulationConfig], path: PathLike) -> None:
+    """Write configurations in the format read by :func:`load_configs`"""
+    with Path(path).open("w", encoding="utf-8") as handle:
+        json.dump([asdict(config) for config in configs], handle, ensure_ascii=False, indent=2)
+
+
+def _report_figures(config: SimulationConfig, raw_averages: Dict[str, List[float]]) -> Dict:
+    tonnage = to_tonnage(raw_averages, config)
+    final_values = {name: values[-1] for name, values in tonnage.items()}
+    return {
+        "chart": build_cumulative_figure(list(range(1, config.batches + 1)), tonnage),
+        "losses": build_loss_figure(final_values),
+        "summary": build_summary_figure(final_values),
+    }
+
+
+async def _render_specs(
+    configs: Sequence[SimulationConfig],
+    names: Sequence[str],
+    output_dir: Path,
+    formats: Sequence[str],
+    pool: ProcessPoolExecutor,
+    written: List[Path],
+) -> AsyncIterator[Dict[str, Any]]:
+    pending = {
+        asyncio.wrap_future(pool.submit(run_simulation, config)): index
+        for index, config in enumerate(configs)
+    }
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            figures = _report_figures(configs[index], future.result())
+            for label, figure in figures.items():
+                for fmt in formats:
+                    path = output_dir / f"{names[index]}_{label}.{fmt}"
+                    written.append(path)
+                    yield {"fig": figure, "path": path, "opts": {"format": fmt}}
+
+
+async def _generate(
+    configs: Sequence[SimulationConfig],
+    names: Sequence[str],
+    output_dir: Path,
+    formats: Sequence[str],
+    workers: Optional[int],
+    render_tabs: int,
+) -> List[Path]:
+    written: List[Path] = []
+    errors: List[Any] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        async with kaleido.Kaleido(n=render_tabs) as renderer:
+            await renderer.write_fig_from_object(
+                _render_specs(configs, names, output_dir, formats, pool, written),
+                error_log=errors,
+            )
+    if errors:
+        raise RuntimeError("Report rendering failed: " + "; ".join(str(e) for e in errors))
+    return written
+
+
+def generate_reports(
+    configs: Sequence[SimulationConfig],
+    output_dir: PathLike,
+    formats: Sequence[str] = ("png",),
+    names: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    render_tabs: int = 2,
+) -> List[Path]:
+    """Simulate every configuration and export its chart, loss chart and summary table.
+
+    Simulations run in a process pool while a single kaleido browser renders the
+    figures of the runs that have already finished. Returns the written files.
+    """
+    if not configs:
+        raise ValueError("At least one configuration is required.")
+    unknown = [fmt for fmt in formats if fmt not in REPORT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Report formats must be chosen from {', '.join(REPORT_FORMATS)}.")
+    if names is None:
+        names = [f"report_{index + 1:03d}" for index in range(len(configs))]
+    if len(names) != len(configs):
+        raise ValueError("Each configuration needs exactly one report name.")
+    if render_tabs <= 0:
+        raise ValueError("At least one render tab is required.")
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    return asyncio.run(_generate(configs, names, output, formats, workers, render_tabs))
+
+
+__all__ = ["REPORT_FORMATS", "generate_reports", "load_configs", "save_configs"]
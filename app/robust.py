@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Sequence
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .algorithms import cvar_max_assignment, plan_totals_batch
+
+ROBUST_OBJECTIVES = ("none", "mean", "cvar")
+ROBUST_PLAN_NAME = "Единый план"
+
+# Produces the same scenario stacks (k x n x n chunks) on every call.
+ScenarioSource = Callable[[], Iterable[np.ndarray]]
+
+
+@dataclass
+class RobustPlan:
+    """One schedule committed before the sugar trajectories are known.
+
+    ``totals`` are the cumulative totals of ``permutation`` averaged over the
+    scenarios and ``cvar`` the mean final total of the worst ``alpha`` share.
+    """
+
+    objective: str
+    alpha: float
+    permutation: List[int]
+    totals: List[float]
+    cvar: float
+    scenarios: int
+
+
+def lower_tail_mean(values: Sequence[float], alpha: float) -> float:
+    """Mean of the worst ``alpha`` share of ``values`` (at least one value)"""
+    if not values:
+        raise ValueError("No values to summarise.")
+    ordered = sorted(values)
+    count = max(1, math.ceil(alpha * len(ordered)))
+    return sum(ordered[:count]) / count
+
+
+def mean_plan(stacks: Iterable[np.ndarray]) -> List[int]:
+    """Assignment maximising expected sugar, solved on the streamed scenario-mean matrix"""
+    total = None
+    count = 0
+    for stack in stacks:
+        total = stack.sum(axis=0) if total is None else total + stack.sum(axis=0)
+        count += len(stack)
+    if total is None:
+        raise ValueError("No scenarios were generated.")
+    rows, cols = linear_sum_assignment(total / count, maximize=True)
+    permutation = [0] * len(cols)
+    for row, col in zip(rows, cols):
+        permutation[col] = int(row)
+    return permutation
+
+
+def robust_plan(
+    scenarios: ScenarioSource,
+    objective: str = "mean",
+    alpha: float = 0.1,
+    time_limit: float = 0.0,
+) -> RobustPlan:
+    """Find the single plan for ``objective`` and evaluate it against every scenario.
+
+    The expected-value plan needs one streaming pass to build the mean matrix and
+    a second one to evaluate it; the CVaR plan keeps the scenarios in memory for
+    its search and is evaluated on them directly. A positive ``time_limit`` lets
+    the CVaR plan also run the exact MILP for that many seconds.
+    """
+    if objective not in ROBUST_OBJECTIVES or objective == "none":
+        raise ValueError(f"Unknown robust objective: {objective}")
+    if not 0 < alpha <= 1:
+        raise ValueError("CVaR level must be in (0, 1].")
+    if time_limit < 0:
+        raise ValueError("CVaR time limit must not be negative.")
+
+    if objective == "mean":
+        permutation = mean_plan(scenarios())
+        evaluated: Iterable[np.ndarray] = scenarios()
+    else:
+        stored = list(scenarios())
+        if not stored:
+            raise ValueError("No scenarios were generated.")
+        permutation = cvar_max_assignment(np.concatenate(stored), alpha, time_limit)
+        evaluated = stored
+
+    sums = np.zeros(len(permutation))
+    finals: List[float] = []
+    for stack in evaluated:
+        totals = plan_totals_batch(stack, permutation)
+        sums += totals.sum(axis=0)
+        finals.extend(totals[:, -1].tolist())
+
+    return RobustPlan(
+        objective=objective,
+        alpha=alpha,
+        permutation=permutation,
+        totals=(sums / len(finals)).tolist(),
+        cvar=lower_tail_mean(finals, alpha),
+        scenarios=len(finals),
+    )
+
+
+__all__ = [
+    "ROBUST_OBJECTIVES",
+    "ROBUST_PLAN_NAME",
+    "RobustPlan",
+    "lower_tail_mean",
+    "mean_plan",
+    "robust_plan",
+]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import numpy as np
+
+
+class RunStatistics:
+    """Per-strategy figures of one run that its averaged curves do not carry.
+
+    ``seconds`` is the time each strategy spent on the experiments of this run
+    only. It is measured around the calls the run makes itself, so runs of
+    other sessions sharing a worker pool and previews computed in between do
+    not show up in it. ``worst_day_sums`` adds up the smallest daily amount of
+    every experiment's schedule; the worst day of the averaged schedule is
+    larger, as the worst days of different experiments fall on different
+    days. Memory does not grow with the number of experiments.
+    """
+
+    def __init__(self) -> None:
+        self.experiments = 0
+        self.seconds: Dict[str, float] = {}
+        self.worst_day_sums: Dict[str, float] = {}
+
+    def add(self, totals: Dict[str, np.ndarray], seconds: Dict[str, float]) -> None:
+        """Record the ``k x n`` cumulative totals of a chunk and the seconds spent on it"""
+        if not totals:
+            return
+        self.experiments += len(next(iter(totals.values())))
+        for name, values in totals.items():
+            values = np.asarray(values, dtype=float)
+            worst = np.diff(values, axis=1, prepend=0.0).min(axis=1).sum() if values.size else 0.0
+            self.worst_day_sums[name] = self.worst_day_sums.get(name, 0.0) + float(worst)
+        for name, spent in seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + spent
+
+    def merge(self, other: "RunStatistics") -> None:
+        self.experiments += other.experiments
+        for name, worst in other.worst_day_sums.items():
+            self.worst_day_sums[name] = self.worst_day_sums.get(name, 0.0) + worst
+        for name, spent in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + spent
+
+    def runtimes(self) -> Dict[str, float]:
+        """Milliseconds per experiment spent by each strategy"""
+        if not self.experiments:
+            return {}
+        return {
+            name: spent * 1000.0 / self.experiments for name, spent in self.seconds.items()
+        }
+
+    def worst_days(self) -> Dict[str, float]:
+        """Mean over the experiments of each strategy's smallest daily amount"""
+        if not self.experiments:
+            return {}
+        return {
+            name: worst / self.experiments for name, worst in self.worst_day_sums.items()
+        }
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "experiments": self.experiments,
+            "seconds": dict(self.seconds),
+            "worst_day_sums": dict(self.worst_day_sums),
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.experiments = int(state["experiments"])
+        self.seconds = {name: float(value) for name, value in state["seconds"].items()}
+        self.worst_day_sums = {
+            name: float(value) for name, value in state["worst_day_sums"].items()}
+
+
+__all__ = ["RunStatistics"]
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import random
+import warnings
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.stats import qmc
+
+from .algorithms import UniformSource
+
+SAMPLING_SCHEMES = ("random", "sobol", "halton", "lhs", "antithetic")
+
+QMC_REPLICATES = 8
+_BLOCK_SIZE = 256
+# Largest dimension scipy's Sobol direction numbers cover.
+SOBOL_MAX_DIMENSION = 21201
+
+
+class _PointStream:
+    """Serve the coordinates of one unit-cube point as successive uniform draws"""
+
+    def __init__(self, point: Sequence[float]) -> None:
+        self._point = point
+        self._position = 0
+
+    def uniform(self, a: float, b: float) -> float:
+        if self._position >= len(self._point):
+            raise RuntimeError(
+                f"The experiment needs more than the {len(self._point)} draws of its point.")
+        u = self._point[self._position]
+        self._position += 1
+        return a + (b - a) * u
+
+
+class _RecordingStream:
+    """Draw pseudo-random uniforms and remember them for the antithetic partner"""
+
+    def __init__(self) -> None:
+        self.draws: List[float] = []
+
+    def uniform(self, a: float, b: float) -> float:
+        u = random.random()
+        self.draws.append(u)
+        return a + (b - a) * u
+
+
+class _CountingStream:
+    """Count the uniform draws one experiment needs"""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def uniform(self, a: float, b: float) -> float:
+        self.count += 1
+        return (a + b) / 2
+
+
+def experiment_dimension(draw: Callable[[UniformSource], object]) -> int:
+    """Number of uniform draws ``draw`` makes for one experiment"""
+    counter = _CountingStream()
+    draw(counter)
+    return counter.count
+
+
+def check_dimension(scheme: str, dimension: int) -> None:
+    """Reject designs the scheme cannot generate before any experiment runs"""
+    if scheme == "sobol" and dimension > SOBOL_MAX_DIMENSION:
+        raise ValueError(
+            f"Sobol sampling supports at most {SOBOL_MAX_DIMENSION} draws per experiment, "
+            f"this configuration needs {dimension}. Use fewer batches or Halton or LHS sampling."
+        )
+
+
+def _make_engine(scheme: str, dimension: int, seed: int) -> qmc.QMCEngine:
+    if scheme == "sobol":
+        return qmc.Sobol(d=dimension, scramble=True, seed=seed)
+    if scheme == "halton":
+        return qmc.Halton(d=dimension, scramble=True, seed=seed)
+    return qmc.LatinHypercube(d=dimension, seed=seed)
+
+
+class ExperimentSampler:
+    """Yield one uniform source per experiment for the chosen sampling scheme.
+
+    Quasi-Monte Carlo and Latin hypercube designs run as ``QMC_REPLICATES``
+    independently scrambled replicates, interleaved across experiments; antithetic
+    sampling pairs every experiment with its mirror ``1 - u``. Each source comes
+    with the index of its group, which :class:`VarianceTracker` uses to estimate
+    the variance of the scheme's estimator.
+    """
+
+    def __init__(
+        self,
+        scheme: str,
+        experiments: int,
+        dimension: int,
+        seeds: Optional[Sequence[int]] = None,
+    ) -> None:
+        if scheme not in SAMPLING_SCHEMES:
+            raise ValueError(f"Unknown sampling scheme: {scheme}")
+        if experiments <= 0:
+            raise ValueError("Number of experiments must be positive.")
+        check_dimension(scheme, dimension)
+        self.scheme = scheme
+        self.experiments = experiments
+        self.dimension = max(dimension, 1)
+        self.position = 0
+        self._pending: List[float] = []
+
+        if seeds is None:
+            replicates = self.groups if self.scheme in ("sobol", "halton", "lhs") else 0
+            seeds = [random.getrandbits(63) for _ in range(replicates)]
+        self.seeds = list(seeds)
+
+    @property
+    def groups(self) -> int:
+        if self.scheme in ("sobol", "halton", "lhs"):
+            return min(QMC_REPLICATES, self.experiments)
+        if self.scheme == "antithetic":
+            return (self.experiments + 1) // 2
+        return self.experiments
+
+    def state(self) -> Dict[str, Any]:
+        """Serializable position of the sampler between two experiments"""
+        return {
+            "scheme": self.scheme,
+            "experiments": self.experiments,
+            "dimension": self.dimension,
+            "seeds": self.seeds,
+            "position": self.position,
+            "pending": list(self._pending),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ExperimentSampler":
+        """Recreate a sampler that continues from a saved :meth:`state`"""
+        sampler = cls(
+            str(state["scheme"]),
+            int(state["experiments"]),
+            int(state["dimension"]),
+            seeds=state["seeds"],
+        )
+        sampler.position = int(state["position"])
+        sampler._pending = list(state["pending"])
+        return sampler
+
+    def __iter__(self) -> Iterator[Tuple[int, UniformSource]]:
+        if self.scheme == "random":
+            sources = self._pseudo_random()
+        elif self.scheme == "antithetic":
+            sources = self._antithetic()
+        else:
+            sources = self._replicated_design()
+        for group, source in sources:
+            self.position += 1
+            yield group, source
+
+    def _pseudo_random(self) -> Iterator[Tuple[int, UniformSource]]:
+        for index in range(self.position, self.experiments):
+            yield index, random
+
+    def _antithetic(self) -> Iterator[Tuple[int, UniformSource]]:
+        for index in range(self.position, self.experiments):
+            if index % 2 == 0:
+                recorder = _RecordingStream()
+                self._pending = recorder.draws
+                yield index // 2, recorder
+            else:
+                mirrored = _PointStream([1.0 - u for u in self._pending])
+                self._pending = []
+                yield index // 2, mirrored
+
+    def _replicated_design(self) -> Iterator[Tuple[int, UniformSource]]:
+        replicates = self.groups
+        engines = [_make_engine(self.scheme, self.dimension, seed) for seed in self.seeds]
+        blocks: List[np.ndarray] = [np.empty((0, self.dimension))] * replicates
+        offsets = [0] * replicates
+
+        def next_block(replicate: int) -> np.ndarray:
+            with warnings.catch_warnings():
+                # Sobol warns about non power-of-two sample sizes.
+                warnings.simplefilter("ignore", UserWarning)
+                return engines[replicate].random(_BLOCK_SIZE)
+
+        # Replay the blocks already consumed so a resumed run draws the same points.
+        for replicate in range(replicates):
+            used = max(0, (self.position - replicate + replicates - 1) // replicates)
+            if used == 0:
+                continue
+            consumed_blocks = (used + _BLOCK_SIZE - 1) // _BLOCK_SIZE
+            for _ in range(consumed_blocks):
+                blocks[replicate] = next_block(replicate)
+            offsets[replicate] = used - (consumed_blocks - 1) * _BLOCK_SIZE
+
+        for index in range(self.position, self.experiments):
+            replicate = index % replicates
+            if offsets[replicate] == len(blocks[replicate]):
+                blocks[replicate] = next_block(replicate)
+                offsets[replicate] = 0
+            point = blocks[replicate][offsets[replicate]]
+            offsets[replicate] += 1
+            yield replicate, _PointStream(point.tolist())
+
+
+class VarianceTracker:
+    """Compare the estimator variance of a sampling scheme with plain Monte Carlo"""
+
+    def __init__(self) -> None:
+        self._group_sums: Dict[str, np.ndarray] = {}
+        self._group_counts = np.zeros(0)
+        self._sums: Dict[str, float] = {}
+        self._squares: Dict[str, float] = {}
+        self._total = 0
+
+    def _grow(self, group: int) -> None:
+        size = max(group + 1, 2 * len(self._group_counts))
+        for name, sums in [("", self._group_counts), *self._group_sums.items()]:
+            grown = np.zeros(size)
+            grown[: len(sums)] = sums
+            if name:
+                self._group_sums[name] = grown
+            else:
+                self._group_counts = grown
+
+    def add(self, group: int, finals: Dict[str, float]) -> None:
+        """Record the final totals of one experiment belonging to ``group``"""
+        if group >= len(self._group_counts):
+            self._grow(group)
+        self._group_counts[group] += 1
+        self._total += 1
+        for name, value in finals.items():
+            if name not in self._group_sums:
+                self._group_sums[name] = np.zeros(len(self._group_counts))
+                self._sums[name] = 0.0
+                self._squares[name] = 0.0
+            self._group_sums[name][group] += value
+            self._sums[name] += value
+            self._squares[name] += value * value
+
+    def state(self) -> Dict[str, Any]:
+        """Serializable snapshot of the accumulated sums"""
+        return {
+            "group_counts": self._group_counts.tolist(),
+            "group_sums": {name: sums.tolist() for name, sums in self._group_sums.items()},
+            "sums": dict(self._sums),
+            "squares": dict(self._squares),
+            "total": self._total,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """Continue accumulating from a saved :meth:`state`"""
+        self._group_counts = np.array(state["group_counts"], dtype=float)
+        self._group_sums = {
+            name: np.array(sums, dtype=float)
+            for name, sums in state["group_sums"].items()
+        }
+        self._sums = dict(state["sums"])
+        self._squares = dict(state["squares"])
+        self._total = int(state["total"])
+
+    def reduction(self) -> Dict[str, Optional[float]]:
+        """Effective variance reduction factor per strategy (``None`` if unknown)"""
+        result: Dict[str, Optional[float]] = {}
+        filled = self._group_counts > 0
+        groups = int(filled.sum())
+        for name, group_sums in self._group_sums.items():
+            if self._total < 2 or groups < 2:
+                result[name] = None
+                continue
+            mean = self._sums[name] / self._total
+            plain = (self._squares[name] - self._total * mean * mean) / (self._total - 1)
+            plain_error = plain / self._total
+
+            group_means = group_sums[filled] / self._group_counts[filled]
+            scheme_error = float(np.var(group_means, ddof=1)) / groups
+            result[name] = plain_error / scheme_error if scheme_error > 0 else None
+        return result
+
+
+__all__ = [
+    "ExperimentSampler",
+    "SAMPLING_SCHEMES",
+    "SOBOL_MAX_DIMENSION",
+    "VarianceTracker",
+    "check_dimension",
+    "experiment_dimension",
+]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from .algorithms import Matrix, assignment_tolerances_batch, hungarian_max_potentials_batch
+from .simulation import CHUNK_SIZE, SimulationConfig, coefficient_generator, generate_working_matrix
+
+
+@dataclass
+class SensitivityReport:
+    """Dual-price sensitivity of the optimal plan, averaged over experiments.
+
+    ``batch_prices`` and ``day_prices`` are the mean LP dual prices of each
+    batch and day; a day's price is its premium over the cheapest day.
+    ``batch_tolerance`` is the mean amount by which a batch's sugar on its
+    planned day may fall before another plan becomes optimal, and
+    ``batch_min_tolerance`` the smallest such margin seen in any experiment.
+    A batch without any alternative plan (a single batch) has an infinite
+    margin; the mean covers the ``finite_tolerances`` experiments with a
+    finite one and is infinite when there are none.
+    """
+
+    size: int
+    experiments: int = 0
+    optimum: float = 0.0
+    batch_prices: List[float] = field(default_factory=list)
+    day_prices: List[float] = field(default_factory=list)
+    batch_tolerance: List[float] = field(default_factory=list)
+    batch_min_tolerance: List[float] = field(default_factory=list)
+    finite_tolerances: List[int] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if self.size <= 0:
+            raise ValueError("Size must be positive.")
+        for values, start in (
+            (self.batch_prices, 0.0),
+            (self.day_prices, 0.0),
+            (self.batch_tolerance, float("inf")),
+            (self.batch_min_tolerance, float("inf")),
+            (self.finite_tolerances, 0),
+        ):
+            if not values:
+                values.extend([start] * self.size)
+
+    def add(self, matrix: Matrix) -> None:
+        """Solve one experiment and fold its prices into the running means"""
+        self.add_stack(np.asarray(matrix, dtype=float)[np.newaxis])
+
+    def add_stack(self, stack: np.ndarray) -> None:
+        """Solve a ``k x n x n`` stack of experiments and fold their prices into the means"""
+        totals, permutations, row_prices, col_prices = hungarian_max_potentials_batch(stack)
+        tolerances = assignment_tolerances_batch(stack, permutations, row_prices, col_prices)
+        count = len(totals)
+        if count == 0:
+            return
+
+        self.experiments += count
+        weight = count / self.experiments
+        self.optimum += (float(totals[:, -1].mean()) - self.optimum) * weight
+        self.batch_prices = (np.asarray(self.batch_prices)
+                             + (row_prices.mean(axis=0) - self.batch_prices) * weight).tolist()
+        self.day_prices = (np.asarray(self.day_prices)
+                           + (col_prices.mean(axis=0) - self.day_prices) * weight).tolist()
+
+        finite = np.isfinite(tolerances)
+        chunk_finite = finite.sum(axis=0)
+        seen = np.asarray(self.finite_tolerances) + chunk_finite
+        chunk_sums = np.where(finite, tolerances, 0.0).sum(axis=0)
+        previous = np.where(seen > chunk_finite, self.batch_tolerance, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = previous + (chunk_sums - chunk_finite * previous) / seen
+        self.batch_tolerance = np.where(seen > 0, means, np.inf).tolist()
+        self.finite_tolerances = seen.tolist()
+        self.batch_min_tolerance = np.minimum(
+            self.batch_min_tolerance, tolerances.min(axis=0)).tolist()
+
+
+def run_sensitivity(config: SimulationConfig) -> SensitivityReport:
+    """Build the dual-price report over ``config.experiments`` generated experiments"""
+    if config.experiments <= 0:
+        raise ValueError("Number of experiments must be positive.")
+    gen_func = coefficient_generator(config)
+    report = SensitivityReport(size=config.batches)
+    for start in range(0, config.experiments, CHUNK_SIZE):
+        count = min(CHUNK_SIZE, config.experiments - start)
+        report.add_stack(np.array(
+            [generate_working_matrix(config, gen_func) for _ in range(count)], dtype=float))
+    return report
+
+
+__all__ = ["SensitivityReport", "run_sensitivity"]
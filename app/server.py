@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from .comparison import PairedComparison
+from .frequency import AssignmentFrequency
+from .metrics import (
+    QUEUE_DEPTH,
+    RUNS_FAILED,
+    RUNS_REJECTED,
+    RUNS_STARTED,
+    STAGE_LATENCY,
+    record_completed_run,
+)
+from .runstats import RunStatistics
+from .simulation import MatrixSummary, SimulationConfig, config_key, run_simulation
+from .strategies import reference_strategy
+
+PoolResult = Tuple[MatrixSummary, AssignmentFrequency, PairedComparison, RunStatistics]
+
+
+def _measured_run(config: SimulationConfig) -> Tuple[PoolResult, Dict[Any, Any]]:
+    """Worker-side run that also returns its statistics and the stage timings of this process"""
+    STAGE_LATENCY.reset()
+    frequencies = AssignmentFrequency(reference_strategy())
+    comparison = PairedComparison()
+    statistics = RunStatistics()
+    averages = run_simulation(
+        config, frequencies=frequencies, comparison=comparison, statistics=statistics)
+    return (averages, frequencies, comparison, statistics), STAGE_LATENCY.snapshot()
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the shared pool refuses a run because its queue is full"""
+
+
+class ComputePool:
+    """Worker pool shared by every session of the web server.
+
+    Runs are executed in a bounded process pool and resolve to the averages,
+    the :class:`AssignmentFrequency`, the :class:`PairedComparison` and the
+    :class:`RunStatistics` of the run. At most ``max_pending`` distinct runs
+    may be queued or running at once; further submissions are rejected with
+    :class:`PoolBusyError`. Results are kept in a bounded LRU store keyed by the
+    configuration, and a run that is already in flight is joined instead of
+    being computed again. When a worker process dies the runs it broke fail and
+    the pool starts a fresh executor for the next ones.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        store_size: int = 128,
+    ) -> None:
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 2) - 1)
+        if max_workers <= 0:
+            raise ValueError("Worker count must be positive.")
+        if max_pending is None:
+            max_pending = max_workers * 2
+        if max_pending < max_workers:
+            raise ValueError("Pending limit cannot be lower than the worker count.")
+        if store_size < 0:
+            raise ValueError("Result store size cannot be negative.")
+
+        self._max_workers = max_workers
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._max_pending = max_pending
+        self._store_size = store_size
+        self._lock = threading.Lock()
+        self._store: OrderedDict[Tuple, PoolResult] = OrderedDict()
+        self._inflight: Dict[Tuple, Future] = {}
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def submit(self, config: SimulationConfig) -> Future:
+        """Schedule ``config`` or reuse a stored or in-flight run of it"""
+        key = config_key(config)
+        with self._lock:
+            if key in self._store:
+                self._store.move_to_end(key)
+                future: Future = Future()
+                future.set_result(self._store[key])
+                return future
+
+            if key in self._inflight:
+                return self._inflight[key]
+
+            if len(self._inflight) >= self._max_pending:
+                RUNS_REJECTED.inc()
+                raise PoolBusyError("Too many simulations are already queued.")
+
+            future = Future()
+            self._inflight[key] = future
+            QUEUE_DEPTH.set(len(self._inflight))
+            RUNS_STARTED.inc()
+            started = time.perf_counter()
+            executor = self._executor
+            try:
+                task = executor.submit(_measured_run, config)
+            except BrokenProcessPool:
+                executor = self._replace_executor(executor)
+                task = executor.submit(_measured_run, config)
+
+        task.add_done_callback(
+            lambda done: self._finish(key, config.experiments, started, done, future, executor))
+        return future
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Swap a broken executor for a fresh one (call with the lock held)"""
+        if self._executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+        return self._executor
+
+    def _finish(
+        self,
+        key: Tuple,
+        experiments: int,
+        started: float,
+        task: Future,
+        future: Future,
+        executor: ProcessPoolExecutor,
+    ) -> None:
+        error = task.exception() if not task.cancelled() else None
+        with self._lock:
+            if isinstance(error, BrokenProcessPool):
+                self._replace_executor(executor)
+            self._inflight.pop(key, None)
+            QUEUE_DEPTH.set(len(self._inflight))
+            if task.cancelled() or error is not None:
+                RUNS_FAILED.inc()
+            else:
+                result, stage_timings = task.result()
+                STAGE_LATENCY.merge(stage_timings)
+                record_completed_run(experiments, time.perf_counter() - started)
+                if self._store_size > 0:
+                    self._store[key] = result
+                    self._store.move_to_end(key)
+                    while len(self._store) > self._store_size:
+                        self._store.popitem(last=False)
+
+        if task.cancelled():
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+__all__ = ["ComputePool", "PoolBusyError"]
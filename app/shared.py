@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import math
+import os
+import random
+import threading
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .algorithms import Matrix
+from .pipeline import RunCancelled
+from .simulation import (
+    CHUNK_SIZE,
+    MatrixSummary,
+    SimulationConfig,
+    _evaluate_chunk,
+    build_sampler,
+    coefficient_generator,
+    draw_masses,
+    generate_working_matrix,
+)
+from .strategies import active_strategies
+
+# Offsets of the arrays inside a block are multiples of this many bytes.
+_ALIGNMENT = 64
+_POLL_INTERVAL = 0.2
+
+# name -> (shape, dtype)
+ArrayLayout = Dict[str, Tuple[Tuple[int, ...], np.dtype]]
+
+
+@dataclass(frozen=True)
+class SharedArraySpec:
+    """Where one array lives inside a shared memory block"""
+
+    name: str
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+    def view(self, buffer: memoryview) -> np.ndarray:
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=buffer, offset=self.offset)
+
+
+@dataclass(frozen=True)
+class SharedLayout:
+    """Picklable description of a block and its arrays, sent to the workers"""
+
+    block: str
+    arrays: Tuple[SharedArraySpec, ...]
+
+
+def _unlink_block(block: shared_memory.SharedMemory, owner: int) -> None:
+    # Forked children inherit the finalizer but never own the block.
+    if os.getpid() != owner:
+        return
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class _Mapping:
+    """Keep a block mapped until the last of its top-level views is collected.
+
+    NumPy does not hold on to the buffer export of an array, so closing the
+    block under a live view would leave it pointing at unmapped memory. Slices
+    keep the top-level array they come from alive, so counting those is enough.
+    """
+
+    def __init__(self, block: shared_memory.SharedMemory, views: Sequence[np.ndarray]) -> None:
+        self._block = block
+        self._live = len(views)
+        self._lock = threading.Lock()
+        for view in views:
+            weakref.finalize(view, self._drop).atexit = False
+        if not views:
+            block.close()
+
+    def _drop(self) -> None:
+        with self._lock:
+            self._live -= 1
+            if self._live == 0:
+                self._block.close()
+
+
+class SharedArrays:
+    """NumPy arrays placed in one shared memory block owned by this process.
+
+    Worker processes attach to the block with :func:`attach_arrays` and write
+    their slices in place; the owner reads the same memory through
+    :attr:`arrays` without copying. :meth:`release` unlinks the block, so its
+    name disappears at once, and it also runs when the owner is garbage
+    collected or the interpreter exits; views kept by the caller stay valid and
+    the memory is unmapped with the last of them. If the owner is killed, the
+    multiprocessing resource tracker unlinks the blocks it registered.
+    """
+
+    def __init__(self, layout: ArrayLayout) -> None:
+        specs = []
+        offset = 0
+        for name, (shape, dtype) in layout.items():
+            spec = SharedArraySpec(name, offset, tuple(int(size) for size in shape),
+                                   np.dtype(dtype).str)
+            specs.append(spec)
+            offset += math.ceil(spec.nbytes / _ALIGNMENT) * _ALIGNMENT
+        self._block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self._finalizer = weakref.finalize(self, _unlink_block, self._block, os.getpid())
+        self.layout = SharedLayout(self._block.name, tuple(specs))
+        self.arrays: Dict[str, np.ndarray] = {
+            spec.name: spec.view(self._block.buf) for spec in specs
+        }
+        _Mapping(self._block, list(self.arrays.values()))
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self) -> None:
+        """Unlink the block; it is unmapped once no view of it is left"""
+        self.arrays = {}
+        self._finalizer()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+@contextmanager
+def attach_arrays(layout: SharedLayout) -> Iterator[Dict[str, np.ndarray]]:
+    """Writable views of the arrays of ``layout`` in a worker process"""
+    block = shared_memory.SharedMemory(name=layout.block)
+    views = {spec.name: spec.view(block.buf) for spec in layout.arrays}
+    try:
+        yield views
+    finally:
+        views.clear()
+        block.close()
+
+
+class ExperimentArrays:
+    """Per-experiment outputs of :func:`run_shared`, as views of shared memory.
+
+    ``totals[name]`` holds the ``k x n`` cumulative totals of every strategy,
+    ``plans[name]`` the batch each strategy processes on each day (absent in
+    capacity mode) and ``matrices`` the ``k x n x n`` working matrices when
+    they were requested. :meth:`release` unlinks the block at once; views
+    taken from it stay valid for as long as they are referenced.
+    """
+
+    def __init__(self, shared: SharedArrays, names: Sequence[str]) -> None:
+        self._shared = shared
+        self.names = list(names)
+        arrays = shared.arrays
+        self.totals = {name: arrays[f"totals/{name}"] for name in self.names}
+        self.plans = {
+            name: arrays[f"plans/{name}"] for name in self.names if f"plans/{name}" in arrays
+        }
+        self.matrices: Optional[np.ndarray] = arrays.get("matrices")
+
+    @property
+    def experiments(self) -> int:
+        return len(next(iter(self.totals.values())))
+
+    def averages(self) -> MatrixSummary:
+        """Mean cumulative totals, as returned by :func:`run_simulation`"""
+        return {name: totals.mean(axis=0).tolist() for name, totals in self.totals.items()}
+
+    def worst_days(self) -> Dict[str, float]:
+        """Mean over the experiments of each strategy's smallest daily amount"""
+        return {
+            name: float(np.diff(totals, axis=1, prepend=0.0).min(axis=1).mean())
+            for name, totals in self.totals.items()
+        }
+
+    def save(self, path: str) -> None:
+        """Write every array into one ``.npz`` file, straight from shared memory"""
+        arrays = {f"totals/{name}": values for name, values in self.totals.items()}
+        arrays.update({f"plans/{name}": values for name, values in self.plans.items()})
+        if self.matrices is not None:
+            arrays["matrices"] = self.matrices
+        np.savez(path, **arrays)
+
+    def release(self) -> None:
+        self.totals, self.plans, self.matrices = {}, {}, None
+        self._shared.release()
+
+    def __enter__(self) -> "ExperimentArrays":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+def _fill_shard(
+    config: SimulationConfig, layout: SharedLayout, start: int, stop: int, seed: int
+) -> int:
+    """Run experiments ``start:stop`` from ``seed`` and write their outputs in place"""
+    random.seed(seed)
+    gen_func = coefficient_generator(config)
+    strategies = active_strategies(config.capacity_mode)
+    shard = replace(config, experiments=stop - start)
+    with attach_arrays(layout) as arrays:
+        matrices: List[Matrix] = []
+        masses: List[List[float]] = []
+        position = start
+
+        def flush() -> None:
+            nonlocal position
+            end = position + len(matrices)
+            results, plans = _evaluate_chunk(config, strategies, matrices, masses)
+            for name, totals in results.items():
+                arrays[f"totals/{name}"][position:end] = totals
+            for name, plan in (plans or {}).items():
+                arrays[f"plans/{name}"][position:end] = plan
+            if "matrices" in arrays:
+                arrays["matrices"][position:end] = matrices
+            position = end
+            matrices.clear()
+            masses.clear()
+
+        for _, rng in build_sampler(shard, gen_func):
+            matrices.append(generate_working_matrix(config, gen_func, rng))
+            if config.capacity_mode:
+                masses.append(draw_masses(config, rng))
+            if len(matrices) == CHUNK_SIZE:
+                flush()
+        if matrices:
+            flush()
+    return stop - start
+
+
+def experiment_layout(config: SimulationConfig, matrices: bool = False) -> ArrayLayout:
+    """Arrays of :class:`ExperimentArrays` for ``config``"""
+    experiments, batches = config.experiments, config.batches
+    layout: ArrayLayout = {}
+    for strategy in active_strategies(config.capacity_mode):
+        layout[f"totals/{strategy.name}"] = ((experiments, batches), np.dtype(float))
+        if not config.capacity_mode:
+            layout[f"plans/{strategy.name}"] = ((experiments, batches), np.dtype(np.int32))
+    if matrices:
+        layout["matrices"] = ((experiments, batches, batches), np.dtype(float))
+    return layout
+
+
+def run_shared(
+    config: SimulationConfig,
+    workers: Optional[int] = None,
+    matrices: bool = False,
+    seed: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> ExperimentArrays:
+    """Run ``config`` in ``workers`` processes that write every experiment's outputs in place.
+
+    The experiments are split into seeded shards, as for the distributed
+    coordinator, so a run is reproducible for a given ``seed`` and shard size
+    whatever the number of workers. Only the shard bounds travel to the
+    workers and nothing but a count travels back. On an error, a crashed
+    worker or ``cancelled()`` (polled while shards run, raising
+    :class:`RunCancelled`) the block is unlinked before the exception
+    propagates. The robust plan of ``config.robust_objective`` is not part of
+    the outputs.
+    """
+    if config.experiments <= 0:
+        raise ValueError("Number of experiments must be positive.")
+    workers = workers or os.cpu_count() or 1
+    if workers <= 0:
+        raise ValueError("Worker count must be positive.")
+    if shard_size is None:
+        shard_size = max(CHUNK_SIZE, math.ceil(config.experiments / (4 * workers)))
+    if shard_size <= 0:
+        raise ValueError("Shard size must be positive.")
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    names = [strategy.name for strategy in active_strategies(config.capacity_mode)]
+    # The block exists before the pool, so forked workers share its resource tracker.
+    shared = SharedArrays(experiment_layout(config, matrices))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {
+            executor.submit(_fill_shard, config, shared.layout, start,
+                            min(start + shard_size, config.experiments), seed + index)
+            for index, start in enumerate(range(0, config.experiments, shard_size))
+        }
+        while pending:
+            done, pending = wait(pending, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            if pending and cancelled is not None and cancelled():
+                raise RunCancelled("Shared run was cancelled.")
+    except BaseException:
+        # Running shards may still write into the mapping; the name goes now.
+        executor.shutdown(wait=False, cancel_futures=True)
+        shared.release()
+        raise
+    executor.shutdown()
+    return ExperimentArrays(shared, names)
+
+
+__all__ = [
+    "ExperimentArrays",
+    "SharedArraySpec",
+    "SharedArrays",
+    "SharedLayout",
+    "attach_arrays",
+    "experiment_layout",
+    "run_shared",
+]
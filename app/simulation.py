@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import astuple, dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .algorithms import (
+    Matrix,
+    UniformSource,
+    adjust_for_inorganic,
+    base_sugar_matrix,
+    calculate_losses_matrix,
+    concentrated_matrix,
+    inorganic_matrix,
+    merge_matrices,
+    random_matrix,
+)
+from .checkpoint import SimulationCheckpoint, capture_random_state, restore_random_state
+from .comparison import PairedComparison
+from .frequency import AssignmentFrequency
+from .metrics import STAGE_LATENCY
+from .robust import ROBUST_PLAN_NAME, ScenarioSource, robust_plan
+from .runstats import RunStatistics
+from .sampling import ExperimentSampler, VarianceTracker, experiment_dimension
+from .strategies import Strategy, active_strategies
+
+MatrixSummary = Dict[str, List[float]]
+
+# Experiments evaluated together by the batched strategy kernels.
+CHUNK_SIZE = 64
+
+
+@dataclass
+class SimulationConfig:
+    batches: int
+    ripening_period: int
+    min_sugar: float
+    max_sugar: float
+
+    min_rip_coeff: float
+    max_rip_coeff: float
+    min_deg_coeff: float
+    max_deg_coeff: float
+
+    include_inorganic: bool
+    include_ripening: bool
+    experiments: int
+    dist_type: str
+    daily_tonnage: float
+
+    min_k: float
+    max_k: float
+    min_na: float
+    max_na: float
+    min_n: float
+    max_n: float
+    min_i0: float
+    max_i0: float
+
+    sampling: str = "random"
+
+    capacity_mode: bool = False
+    min_mass: float = 0.0
+    max_mass: float = 0.0
+
+    robust_objective: str = "none"
+    cvar_alpha: float = 0.1
+    # Seconds for the exact CVaR MILP on top of the exchange search; 0 skips it.
+    cvar_time_limit: float = 0.0
+
+
+def config_key(config: SimulationConfig) -> Tuple:
+    """Hashable identity of a configuration, used to share identical runs"""
+    return astuple(config)
+
+
+def accumulate_results(target: List[float], values: List[float], experiments: int) -> None:
+    """Add the per-experiment share of ``values`` to the running averages"""
+    for idx, value in enumerate(values):
+        target[idx] += value / experiments
+
+
+def coefficient_generator(config: SimulationConfig) -> Callable[..., Matrix]:
+    """Pick the coefficient generator matching ``config.dist_type``"""
+    return random_matrix if config.dist_type == "uniform" else concentrated_matrix
+
+
+def draw_coefficients(
+    config: SimulationConfig, gen_func: Callable[..., Matrix], rng: UniformSource = random
+) -> Matrix:
+    """Daily ripening/degradation multipliers of every batch"""
+    if not config.include_ripening:
+        return gen_func(
+            config.batches,
+            config.batches,
+            config.min_deg_coeff,
+            config.max_deg_coeff,
+            rng,
+        )
+    coef_ripening = gen_func(
+        config.batches,
+        config.ripening_period,
+        config.min_rip_coeff,
+        config.max_rip_coeff,
+        rng,
+    )
+    coef_degradation = gen_func(
+        config.batches,
+        config.batches - config.ripening_period,
+        config.min_deg_coeff,
+        config.max_deg_coeff,
+        rng,
+    )
+    return merge_matrices(coef_ripening, coef_degradation)
+
+
+def draw_base_sugar(
+    config: SimulationConfig, coefficients: Matrix, rng: UniformSource = random
+) -> Matrix:
+    return base_sugar_matrix(
+        config.batches,
+        config.min_sugar,
+        config.max_sugar,
+        coefficients,
+        rng,
+    )
+
+
+def draw_losses(config: SimulationConfig, rng: UniformSource = random) -> Matrix:
+    """Sugar lost to inorganic non-sugars, per batch and day"""
+    inorganic = inorganic_matrix(
+        config.batches,
+        config.min_k, config.max_k,
+        config.min_na, config.max_na,
+        config.min_n, config.max_n,
+        rng,
+    )
+    return calculate_losses_matrix(
+        config.batches,
+        inorganic,
+        config.min_i0,
+        config.max_i0,
+        rng,
+    )
+
+
+def generate_working_matrix(
+    config: SimulationConfig, gen_func: Callable[..., Matrix], rng: UniformSource = random
+) -> Matrix:
+    """Draw one experiment: coefficients, base sugar and optional inorganic losses"""
+    coefficients = draw_coefficients(config, gen_func, rng)
+    base_matrix = draw_base_sugar(config, coefficients, rng)
+    if not config.include_inorganic:
+        return base_matrix
+    return adjust_for_inorganic(base_matrix, draw_losses(config, rng))
+
+
+def _add_seconds(timings: Optional[Dict[str, float]], name: str, started: float) -> None:
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def solve_stack(
+    stack: np.ndarray,
+    ripening_period: int,
+    strategies: Optional[List[Strategy]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Run every registered strategy once over a ``k x n x n`` stack of working matrices.
+
+    Returns the ``k x n`` cumulative totals and plans of each strategy. The
+    seconds each strategy takes are added to ``timings`` when it is given.
+    """
+    if strategies is None:
+        strategies = active_strategies()
+    results: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for strategy in strategies:
+        started = time.perf_counter()
+        with STAGE_LATENCY.time(stage=strategy.stage):
+            results[strategy.name] = strategy.run_batch(stack, ripening_period)
+        _add_seconds(timings, strategy.name, started)
+    return results
+
+
+def evaluate_stack(
+    stack: np.ndarray, ripening_period: int, strategies: Optional[List[Strategy]] = None
+) -> Dict[str, np.ndarray]:
+    """Cumulative totals (``k x n``) of every registered strategy over ``stack``"""
+    solved = solve_stack(stack, ripening_period, strategies)
+    return {name: totals for name, (totals, _) in solved.items()}
+
+
+def evaluate_strategies(matrix: Matrix, ripening_period: int) -> MatrixSummary:
+    """Run every strategy on one working matrix and return their cumulative totals"""
+    stack = np.asarray(matrix, dtype=float)[np.newaxis]
+    return {
+        name: totals[0].tolist()
+        for name, totals in evaluate_stack(stack, ripening_period).items()
+    }
+
+
+def draw_masses(config: SimulationConfig, rng: UniformSource = random) -> List[float]:
+    """Draw the mass (t) of every batch for capacity-aware runs"""
+    if config.min_mass < 0 or config.min_mass > config.max_mass:
+        raise ValueError("Batch mass range is invalid.")
+    return [rng.uniform(config.min_mass, config.max_mass) for _ in range(config.batches)]
+
+
+def evaluate_capacity_strategies(
+    matrix: Matrix,
+    masses: List[float],
+    capacities: List[float],
+    ripening_period: int,
+    timings: Optional[Dict[str, float]] = None,
+) -> MatrixSummary:
+    """Capacity-aware counterparts of :func:`evaluate_strategies`, in tonnes of sugar"""
+    results: MatrixSummary = {}
+    for strategy in active_strategies(capacity_mode=True):
+        started = time.perf_counter()
+        with STAGE_LATENCY.time(stage=strategy.stage):
+            results[strategy.name] = strategy.run_capacity(
+                matrix, masses, capacities, ripening_period)
+        _add_seconds(timings, strategy.name, started)
+    return results
+
+
+def _evaluate_chunk(
+    config: SimulationConfig,
+    strategies: List[Strategy],
+    matrices: List[Matrix],
+    masses: List[List[float]],
+    timings: Optional[Dict[str, float]] = None,
+) -> Tuple[Dict[str, np.ndarray], Optional[Dict[str, np.ndarray]]]:
+    """Totals of every strategy on the chunk and, outside capacity mode, their plans"""
+    if not config.capacity_mode:
+        solved = solve_stack(
+            np.asarray(matrices, dtype=float), config.ripening_period, strategies, timings)
+        return ({name: totals for name, (totals, _) in solved.items()},
+                {name: plans for name, (_, plans) in solved.items()})
+
+    capacities = [config.daily_tonnage] * config.batches
+    rows = [
+        evaluate_capacity_strategies(
+            matrix, batch_masses, capacities, config.ripening_period, timings)
+        for matrix, batch_masses in zip(matrices, masses)
+    ]
+    return {
+        strategy.name: np.array([row[strategy.name] for row in rows], dtype=float)
+        for strategy in strategies
+    }, None
+
+
+def run_simulation(
+    config: SimulationConfig,
+    variance: Optional[VarianceTracker] = None,
+    checkpoint: Optional[SimulationCheckpoint] = None,
+    frequencies: Optional[AssignmentFrequency] = None,
+    comparison: Optional[PairedComparison] = None,
+    statistics: Optional[RunStatistics] = None,
+) -> MatrixSummary:
+    """Average the cumulative sugar of every strategy over ``config.experiments`` runs.
+
+    Every registered strategy is dispatched once per chunk of ``CHUNK_SIZE``
+    experiments. Results are in percent of one day's throughput, or in tonnes when
+    ``config.capacity_mode`` is set. Experiments are drawn with ``config.sampling``;
+    when ``variance`` is given it is filled with the data needed to report the
+    scheme's variance reduction, and ``frequencies`` counts the plans of every
+    strategy outside capacity mode. ``comparison`` receives the final totals of
+    every experiment for paired comparisons between strategies and
+    ``statistics`` the time each strategy spends in this run and the worst day
+    of every experiment. With
+    ``config.robust_objective`` the same scenarios are replayed to add one plan
+    fixed in advance for all of them.
+    With a ``checkpoint`` the run resumes from a matching snapshot, saves new
+    ones periodically and removes it when done.
+    """
+    gen_func = coefficient_generator(config)
+    strategies = active_strategies(config.capacity_mode)
+    names = [strategy.name for strategy in strategies]
+
+    saved = checkpoint.load(config) if checkpoint is not None else None
+    if saved is not None and list(saved["averages"]) != names:
+        # The registry changed since the snapshot was taken.
+        saved = None
+    if saved is not None:
+        averages: MatrixSummary = saved["averages"]
+        sampler = ExperimentSampler.from_state(saved["sampler"])
+        origin = saved["origin"]
+        restore_random_state(saved["random"])
+        if variance is not None and saved["variance"] is not None:
+            variance.restore(saved["variance"])
+        if frequencies is not None and saved["frequencies"] is not None:
+            frequencies.restore(saved["frequencies"])
+        if comparison is not None and saved["comparison"] is not None:
+            comparison.restore(saved["comparison"])
+        if statistics is not None and saved["statistics"] is not None:
+            statistics.restore(saved["statistics"])
+    else:
+        averages = {name: [0.0] * config.batches for name in names}
+        sampler = build_sampler(config, gen_func)
+        origin = {"sampler": sampler.state(), "random": capture_random_state()}
+
+    groups: List[int] = []
+    matrices: List[Matrix] = []
+    masses: List[List[float]] = []
+
+    def flush() -> None:
+        timings: Dict[str, float] = {}
+        results, plans = _evaluate_chunk(config, strategies, matrices, masses, timings)
+        if statistics is not None:
+            statistics.add(results, timings)
+        if frequencies is not None and plans is not None:
+            frequencies.add(plans)
+        if comparison is not None:
+            comparison.add({name: totals[:, -1] for name, totals in results.items()})
+        for name, totals in results.items():
+            accumulate_results(averages[name], totals.sum(axis=0).tolist(), config.experiments)
+        if variance is not None:
+            for index, group in enumerate(groups):
+                variance.add(
+                    group, {name: float(totals[index, -1]) for name, totals in results.items()})
+        groups.clear()
+        matrices.clear()
+        masses.clear()
+
+    for group, rng in sampler:
+        with STAGE_LATENCY.time(stage="generation"):
+            matrices.append(generate_working_matrix(config, gen_func, rng))
+            if config.capacity_mode:
+                masses.append(draw_masses(config, rng))
+        groups.append(group)
+        if len(matrices) < CHUNK_SIZE:
+            continue
+        flush()
+        # Snapshots are only taken between chunks, when every drawn
+        # experiment has been accumulated.
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.save(
+                config, averages, sampler, variance, origin, frequencies, comparison,
+                statistics)
+
+    if matrices:
+        flush()
+    if config.robust_objective != "none" and not config.capacity_mode:
+        current = capture_random_state()
+        plan = robust_plan(
+            replay_scenarios(config, gen_func, origin), config.robust_objective, config.cvar_alpha,
+            config.cvar_time_limit)
+        averages[ROBUST_PLAN_NAME] = plan.totals
+        restore_random_state(current)
+    if checkpoint is not None:
+        checkpoint.clear()
+    return averages
+
+
+def replay_scenarios(
+    config: SimulationConfig, gen_func: Callable[..., Matrix], origin: Dict
+) -> ScenarioSource:
+    """Source regenerating a run's working matrices, in chunks, from its ``origin`` state"""
+    def chunks() -> Iterator[np.ndarray]:
+        sampler = ExperimentSampler.from_state(origin["sampler"])
+        restore_random_state(origin["random"])
+        matrices: List[Matrix] = []
+        for _, rng in sampler:
+            matrices.append(generate_working_matrix(config, gen_func, rng))
+            if len(matrices) == CHUNK_SIZE:
+                yield np.asarray(matrices, dtype=float)
+                matrices = []
+        if matrices:
+            yield np.asarray(matrices, dtype=float)
+
+    return chunks
+
+
+def sampling_dimension(config: SimulationConfig, gen_func: Callable[..., Matrix]) -> int:
+    """Uniform draws one experiment of ``config`` takes (it grows with ``batches ** 2``)"""
+    def draw(rng: UniformSource) -> None:
+        generate_working_matrix(config, gen_func, rng)
+        if config.capacity_mode:
+            draw_masses(config, rng)
+
+    return experiment_dimension(draw)
+
+
+def build_sampler(config: SimulationConfig, gen_func: Callable[..., Matrix]) -> ExperimentSampler:
+    """Sampler drawing the experiments of ``config`` with its sampling scheme"""
+    dimension = sampling_dimension(config, gen_func) if config.sampling != "random" else 0
+    return ExperimentSampler(config.sampling, config.experiments, dimension)
+
+
+def tonnage_factor(config: SimulationConfig) -> float:
+    """Tonnes per unit of a simulated total (capacity-aware totals are already in tonnes)"""
+    if config.capacity_mode:
+        return 1.0
+    return config.daily_tonnage / 100.0
+
+
+def to_tonnage(averages: MatrixSummary, config: SimulationConfig) -> MatrixSummary:
+    """Convert sugar percentages into tonnes for the configured daily throughput"""
+    if config.capacity_mode:
+        return {name: list(values) for name, values in averages.items()}
+    daily_tonnage = config.daily_tonnage
+    return {
+        name: [(val / 100.0) * daily_tonnage for val in values]
+        for name, values in averages.items()
+    }
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "MatrixSummary",
+    "SimulationConfig",
+    "accumulate_results",
+    "build_sampler",
+    "coefficient_generator",
+    "config_key",
+    "draw_base_sugar",
+    "draw_coefficients",
+    "draw_losses",
+    "draw_masses",
+    "evaluate_capacity_strategies",
+    "evaluate_stack",
+    "evaluate_strategies",
+    "generate_working_matrix",
+    "replay_scenarios",
+    "run_simulation",
+    "sampling_dimension",
+    "solve_stack",
+    "to_tonnage",
+    "tonnage_factor",
+]
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .algorithms import (
+    Matrix,
+    bottleneck_max_batch,
+    capacity_greedy_algorithm,
+    capacity_greedy_then_thrifty,
+    capacity_thrifty_algorithm,
+    capacity_thrifty_then_greedy,
+    greedy_batch,
+    greedy_then_thrifty_batch,
+    hungarian_max_batch,
+    lookahead_batch,
+    rollout_batch,
+    thrifty_batch,
+    thrifty_then_greedy_batch,
+    transportation_max_algorithm,
+)
+
+# function(matrix, ripening_period, **parameters) -> (cumulative totals, plan)
+MatrixFunction = Callable[..., Tuple[List[float], Any]]
+# kernel(stack, ripening_period, **parameters) -> (k x n totals, k x n permutations)
+BatchKernel = Callable[..., Tuple[np.ndarray, np.ndarray]]
+# capacity_function(matrix, masses, capacities, ripening_period, **parameters)
+CapacityFunction = Callable[..., Tuple[List[float], Any]]
+
+
+@dataclass(frozen=True)
+class Strategy:
+    """One entry of the strategy registry.
+
+    A strategy provides a per-matrix ``function``, a batched ``kernel`` over a
+    ``k x n x n`` stack, or both; the kernel is preferred when present. Both are
+    called with the ripening period followed by ``parameters`` as keyword
+    arguments. Strategies without ``capacity_function`` are skipped in
+    capacity-aware runs. The ``reference`` strategy is the optimum the others
+    are compared against. ``hindsight`` strategies plan with every day's
+    values known in advance, which no operator can do, so they are reported
+    but never recommended.
+    """
+
+    name: str
+    stage: str
+    function: Optional[MatrixFunction] = None
+    kernel: Optional[BatchKernel] = None
+    capacity_function: Optional[CapacityFunction] = None
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    color: Optional[str] = None
+    reference: bool = False
+    hindsight: bool = False
+
+    def __post_init__(self) -> None:
+        if self.function is None and self.kernel is None:
+            raise ValueError(f"Strategy {self.name} needs a function or a kernel.")
+
+    def run_batch(self, stack: np.ndarray, ripening_period: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Cumulative totals and plans (both ``k x n``) for every matrix of ``stack``"""
+        if self.kernel is not None:
+            totals, permutations = self.kernel(stack, ripening_period, **self.parameters)
+            return np.asarray(totals, dtype=float), np.asarray(permutations, dtype=int)
+        results = [
+            self.function(matrix.tolist(), ripening_period, **self.parameters)
+            for matrix in stack
+        ]
+        return (np.array([totals for totals, _ in results], dtype=float),
+                np.array([plan for _, plan in results], dtype=int))
+
+    def run_capacity(
+        self,
+        matrix: Matrix,
+        masses: Sequence[float],
+        capacities: Sequence[float],
+        ripening_period: int,
+    ) -> List[float]:
+        if self.capacity_function is None:
+            raise ValueError(f"Strategy {self.name} has no capacity-aware variant.")
+        return self.capacity_function(
+            matrix, masses, capacities, ripening_period, **self.parameters)[0]
+
+
+STRATEGIES: "OrderedDict[str, Strategy]" = OrderedDict()
+
+
+def register_strategy(strategy: Strategy, replace: bool = False) -> Strategy:
+    """Add ``strategy`` to the registry; the order of registration is the display order.
+
+    Runs in worker processes only see strategies registered at import time of a
+    module they load, so plug-ins should register themselves on import.
+    """
+    if strategy.name in STRATEGIES and not replace:
+        raise ValueError(f"Strategy {strategy.name} is already registered.")
+    if strategy.reference and any(
+            other.reference for other in STRATEGIES.values() if other.name != strategy.name):
+        raise ValueError("Only one reference strategy can be registered.")
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
+def unregister_strategy(name: str) -> None:
+    if name not in STRATEGIES:
+        raise ValueError(f"Strategy {name} is not registered.")
+    del STRATEGIES[name]
+
+
+def active_strategies(capacity_mode: bool = False) -> List[Strategy]:
+    """Registered strategies applicable to a plain or a capacity-aware run"""
+    return [
+        strategy for strategy in STRATEGIES.values()
+        if not capacity_mode or strategy.capacity_function is not None
+    ]
+
+
+def reference_strategy() -> Optional[str]:
+    """Name of the reference (optimal) strategy, if one is registered"""
+    for strategy in STRATEGIES.values():
+        if strategy.reference:
+            return strategy.name
+    return None
+
+
+def hindsight_strategies() -> Set[str]:
+    """Names of the registered strategies that cannot be carried out in practice"""
+    return {strategy.name for strategy in STRATEGIES.values() if strategy.hindsight}
+
+
+def strategy_color(name: str, fallback: str) -> str:
+    strategy = STRATEGIES.get(name)
+    if strategy is None or strategy.color is None:
+        return fallback
+    return strategy.color
+
+
+register_strategy(Strategy(
+    name="Венгерский (макс.)",
+    stage="hungarian",
+    kernel=lambda stack, ripening_period: hungarian_max_batch(stack),
+    capacity_function=lambda matrix, masses, capacities, ripening_period:
+        transportation_max_algorithm(matrix, masses, capacities),
+    color="#26a69a",
+    reference=True,
+    hindsight=True,
+))
+register_strategy(Strategy(
+    name="Жадный",
+    stage="greedy",
+    kernel=lambda stack, ripening_period: greedy_batch(stack),
+    capacity_function=lambda matrix, masses, capacities, ripening_period:
+        capacity_greedy_algorithm(matrix, masses, capacities),
+    color="#ec407a",
+))
+register_strategy(Strategy(
+    name="Бережливый",
+    stage="thrifty",
+    kernel=lambda stack, ripening_period: thrifty_batch(stack),
+    capacity_function=lambda matrix, masses, capacities, ripening_period:
+        capacity_thrifty_algorithm(matrix, masses, capacities),
+    color="#66bb6a",
+))
+register_strategy(Strategy(
+    name="Жадный -> Бережливый",
+    stage="greedy_then_thrifty",
+    kernel=greedy_then_thrifty_batch,
+    capacity_function=capacity_greedy_then_thrifty,
+    color="#ffa726",
+))
+register_strategy(Strategy(
+    name="Бережливый -> Жадный",
+    stage="thrifty_then_greedy",
+    kernel=thrifty_then_greedy_batch,
+    capacity_function=capacity_thrifty_then_greedy,
+    color="#ab47bc",
+))
+def _register_horizon(depth: int, lookahead_color: str, rollout_color: str) -> None:
+    register_strategy(Strategy(
+        name=f"Упреждение ({depth} дн.)",
+        stage=f"lookahead_{depth}",
+        kernel=lambda stack, ripening_period, depth: lookahead_batch(stack, depth),
+        parameters={"depth": depth},
+        color=lookahead_color,
+    ))
+    register_strategy(Strategy(
+        name=f"Развёртка ({depth} дн.)",
+        stage=f"rollout_{depth}",
+        kernel=lambda stack, ripening_period, depth, candidates: rollout_batch(
+            stack, depth, candidates),
+        parameters={"depth": depth, "candidates": 8},
+        color=rollout_color,
+    ))
+
+
+# Lookahead costs about ten times more per extra day, so the horizons stop at five.
+_register_horizon(3, "#42a5f5", "#8d6e63")
+_register_horizon(4, "#1e88e5", "#6d4c41")
+_register_horizon(5, "#1565c0", "#4e342e")
+
+
+# The bottleneck strategies cost about ten times the Hungarian reference, so
+# runs include them only on request.
+BOTTLENECK_ENV = "SUGAR_BEET_BOTTLENECK"
+BOTTLENECK_STRATEGIES = (
+    Strategy(
+        name="Худший день (макс.)",
+        stage="bottleneck",
+        kernel=lambda stack, ripening_period: bottleneck_max_batch(stack),
+        color="#78909c",
+        hindsight=True,
+    ),
+    Strategy(
+        name="Худший день, затем сумма",
+        stage="bottleneck_lexicographic",
+        kernel=lambda stack, ripening_period: bottleneck_max_batch(stack, lexicographic=True),
+        color="#5c6bc0",
+        hindsight=True,
+    ),
+)
+
+
+def enable_bottleneck_strategies() -> None:
+    """Register the bottleneck strategies in this process and in workers started after it.
+
+    Spawned workers build the registry again on import, so the choice reaches
+    them through the environment.
+    """
+    os.environ[BOTTLENECK_ENV] = "1"
+    for strategy in BOTTLENECK_STRATEGIES:
+        if strategy.name not in STRATEGIES:
+            register_strategy(strategy)
+
+
+if os.environ.get(BOTTLENECK_ENV) == "1":
+    enable_bottleneck_strategies()
+
+
+__all__ = [
+    "STRATEGIES",
+    "Strategy",
+    "active_strategies",
+    "enable_bottleneck_strategies",
+    "hindsight_strategies",
+    "reference_strategy",
+    "register_strategy",
+    "strategy_color",
+    "unregister_strategy",
+]
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy.linalg import LinAlgError, cho_factor, cho_solve, solve_triangular
+from scipy.stats import qmc
+
+from . import algorithms, pipeline, simulation, strategies
+from .algorithms import ALGORITHM_VERSION
+from .global_sensitivity import (
+    Factor,
+    ProgressCallback,
+    default_factors,
+    design_config,
+    evaluate_design,
+    losses_against,
+)
+from .simulation import SimulationConfig
+from .strategies import active_strategies, reference_strategy
+
+SURROGATE_FORMAT = 1
+# Fields that do not change the strategies' expected losses. The robust plan
+# is not modelled at all, so configs asking for it are never covered.
+IGNORED_FIELDS = (
+    "experiments", "daily_tonnage", "sampling", "robust_objective", "cvar_alpha", "cvar_time_limit")
+# Largest estimated error (two standard deviations, in percent) of an accepted answer.
+DEFAULT_TOLERANCE = 0.5
+
+# Candidate lengthscales, in units of the diagonal of the unit cube.
+LENGTHSCALES = np.geomspace(0.05, 2.0, 12)
+NUGGETS = (1e-8, 1e-6, 1e-4, 1e-3, 1e-2, 1e-1)
+
+PathLike = Union[str, Path]
+
+
+def _source(item: Any) -> Optional[str]:
+    try:
+        return inspect.getsource(item)
+    except (OSError, TypeError):
+        return None
+
+
+def code_fingerprint() -> str:
+    """Digest of the simulation and algorithm code and of the registered strategies.
+
+    A surrogate is only valid for the code that produced its training runs.
+    The digest always covers :data:`ALGORITHM_VERSION` and the registry, and
+    the sources of the modules and strategy callables wherever they can be
+    read. Compiled builds have none, so there the version is what tells a
+    stale model apart; sources and compiled builds never share a digest.
+    """
+    digest = hashlib.sha256(
+        f"format {SURROGATE_FORMAT} algorithms {ALGORITHM_VERSION}".encode())
+    for module in (algorithms, pipeline, simulation, strategies):
+        digest.update((_source(module) or "compiled").encode())
+    for strategy in active_strategies():
+        digest.update(repr((strategy.name, strategy.stage, sorted(strategy.parameters.items()),
+                            strategy.reference)).encode())
+        for function in (strategy.kernel, strategy.function):
+            if function is not None:
+                digest.update((_source(function) or "compiled").encode())
+    return digest.hexdigest()
+
+
+def _squared_distances(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    squared = (first * first).sum(axis=1)[:, np.newaxis] + (second * second).sum(axis=1) \
+        - 2.0 * first @ second.T
+    return np.maximum(squared, 0.0)
+
+
+def _matern(squared: np.ndarray, lengthscale: float) -> np.ndarray:
+    # Matern 5/2 kernel with unit variance.
+    scaled = np.sqrt(5.0 * squared) / lengthscale
+    return (1.0 + scaled + scaled * scaled / 3.0) * np.exp(-scaled)
+
+
+@dataclass
+class SurrogateEstimate:
+    """Answer of the surrogate for one configuration.
+
+    ``finals`` are mean final totals in the units of :func:`run_simulation`,
+    ``losses`` the loss of each strategy against the reference in percent and
+    ``errors`` two estimated standard deviations of each answer in percent: of
+    the loss for the strategies and of the optimum for the reference.
+    """
+
+    finals: Dict[str, float]
+    losses: Dict[str, float]
+    errors: Dict[str, float]
+
+    def within(self, tolerance: float = DEFAULT_TOLERANCE) -> bool:
+        return max(self.errors.values()) <= tolerance
+
+
+class Surrogate:
+    """Gaussian-process regression of the strategies' results over config space.
+
+    The inputs are the factor coordinates of designed configurations in the
+    unit cube; the outputs are the optimum's final total and the loss of every
+    other strategy. All outputs share one Matern 5/2 kernel whose lengthscale
+    and nugget minimise the closed-form leave-one-out error. The predictive
+    standard deviation is rescaled so that the leave-one-out residuals have
+    unit variance, which makes it an honest error estimate near the data and
+    lets it grow away from it.
+    """
+
+    def __init__(
+        self,
+        base: SimulationConfig,
+        factors: Sequence[Factor],
+        names: Sequence[str],
+        inputs: np.ndarray,
+        values: np.ndarray,
+        lengthscale: Optional[float] = None,
+        nugget: Optional[float] = None,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        self.base = base
+        self.factors = list(factors)
+        self.names = list(names)
+        self.inputs = np.asarray(inputs, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        if self.inputs.shape != (len(self.values), len(self.factors)):
+            raise ValueError("Inputs must have one row per run and one column per factor.")
+        if self.values.shape[1] != len(self.names):
+            raise ValueError("Values must have one column per strategy.")
+        self.fingerprint = fingerprint or code_fingerprint()
+
+        self._offset = self.values.mean(axis=0)
+        self._scale = self.values.std(axis=0)
+        self._scale[self._scale == 0] = 1.0
+        normalized = (self.values - self._offset) / self._scale
+        squared = _squared_distances(self.inputs, self.inputs)
+        if lengthscale is None or nugget is None:
+            lengthscale, nugget = self._select(squared, normalized, len(self.factors))
+        self.lengthscale, self.nugget = float(lengthscale), float(nugget)
+
+        kernel = _matern(squared, self.lengthscale) + self.nugget * np.eye(len(self.inputs))
+        self._factor = cho_factor(kernel, lower=True)
+        inverse = cho_solve(self._factor, np.eye(len(self.inputs)))
+        self._weights = inverse @ normalized
+        self._amplitude = (normalized * self._weights).sum(axis=0) / len(self.inputs)
+        diagonal = np.diag(inverse)[:, np.newaxis]
+        residuals = self._weights / diagonal
+        z_scores = residuals / np.sqrt(self._amplitude / diagonal)
+        self._calibration = np.sqrt(np.mean(z_scores * z_scores, axis=0))
+
+    @staticmethod
+    def _select(
+        squared: np.ndarray, normalized: np.ndarray, dimension: int
+    ) -> Tuple[float, float]:
+        """Lengthscale and nugget with the smallest leave-one-out error"""
+        reach = np.sqrt(dimension)
+        identity = np.eye(len(squared))
+        best: Optional[Tuple[float, float, float]] = None
+        for lengthscale in LENGTHSCALES * reach:
+            kernel = _matern(squared, lengthscale)
+            for nugget in NUGGETS:
+                try:
+                    factor = cho_factor(kernel + nugget * identity, lower=True)
+                except LinAlgError:
+                    continue
+                inverse = cho_solve(factor, identity)
+                residuals = (inverse @ normalized) / np.diag(inverse)[:, np.newaxis]
+                error = float(np.mean(residuals * residuals))
+                if best is None or error < best[0]:
+                    best = (error, lengthscale, nugget)
+        if best is None:
+            raise ValueError("No kernel fits the training runs.")
+        return best[1], best[2]
+
+    def covers(self, config: SimulationConfig) -> bool:
+        """Whether ``config`` differs from the training base only in factors or ignored fields"""
+        if config.capacity_mode or config.robust_objective != "none":
+            return False
+        varied = {factor.field for factor in self.factors} | set(IGNORED_FIELDS)
+        return all(
+            getattr(config, item.name) == getattr(self.base, item.name)
+            for item in fields(SimulationConfig) if item.name not in varied
+        )
+
+    def predict(self, config: SimulationConfig) -> Optional[SurrogateEstimate]:
+        """Estimate for ``config``, or ``None`` if it lies outside the trained space"""
+        if not self.covers(config):
+            return None
+        try:
+            point = np.array([[factor.coordinate(getattr(config, factor.field))
+                               for factor in self.factors]])
+        except ValueError:
+            return None
+        similarity = _matern(_squared_distances(point, self.inputs), self.lengthscale)[0]
+        mean = similarity @ self._weights * self._scale + self._offset
+        solved = solve_triangular(self._factor[0], similarity, lower=True)
+        # The nugget is the simulation noise a real run of the point would also show.
+        variance = max(1.0 - float(solved @ solved), 0.0) + self.nugget
+        deviation = np.sqrt(self._amplitude * variance) * self._calibration * self._scale
+
+        optimum = float(mean[0])
+        reference = self.names[0]
+        finals = {reference: optimum}
+        losses = {reference: 0.0}
+        errors = {reference: 2 * float(deviation[0]) / abs(optimum) * 100 if optimum else np.inf}
+        for column, name in enumerate(self.names[1:], start=1):
+            losses[name] = float(mean[column])
+            finals[name] = optimum * (1 - losses[name] / 100)
+            errors[name] = 2 * float(deviation[column])
+        return SurrogateEstimate(finals=finals, losses=losses, errors=errors)
+
+    def save(self, path: PathLike) -> None:
+        meta = {
+            "format": SURROGATE_FORMAT,
+            "fingerprint": self.fingerprint,
+            "base": asdict(self.base),
+            "factors": [asdict(factor) for factor in self.factors],
+            "names": self.names,
+            "lengthscale": self.lengthscale,
+            "nugget": self.nugget,
+        }
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with target.open("wb") as handle:
+            np.savez_compressed(
+                handle, inputs=self.inputs, values=self.values, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path: PathLike) -> "Surrogate":
+        """Read a saved surrogate; raises ``ValueError`` if the code has changed since"""
+        with np.load(Path(path), allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            inputs, values = data["inputs"], data["values"]
+        if meta.get("format") != SURROGATE_FORMAT:
+            raise ValueError("Surrogate file has an unsupported format.")
+        if meta["fingerprint"] != code_fingerprint():
+            raise ValueError("Surrogate was trained on different simulation code; refit it.")
+        factors = [
+            Factor(**{**item, "choices": tuple(item["choices"])}) for item in meta["factors"]]
+        return cls(
+            SimulationConfig(**meta["base"]), factors, meta["names"], inputs, values,
+            meta["lengthscale"], meta["nugget"], meta["fingerprint"],
+        )
+
+
+def fit_surrogate(
+    config: SimulationConfig,
+    factors: Optional[Sequence[Factor]] = None,
+    samples: int = 256,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Surrogate:
+    """Run a scrambled Sobol' design of ``samples`` configurations and fit a surrogate"""
+    factors = list(factors) if factors is not None else default_factors(config)
+    if not factors:
+        raise ValueError("At least one factor is required.")
+    if samples < 2 or samples & (samples - 1):
+        raise ValueError("Number of samples must be a power of two.")
+    reference = reference_strategy()
+    if reference is None:
+        raise ValueError("The surrogate needs a reference strategy.")
+    names = [reference] + [
+        strategy.name for strategy in active_strategies() if strategy.name != reference]
+
+    points = qmc.Sobol(d=len(factors), scramble=True, seed=seed).random(samples)
+    finals = evaluate_design(
+        config, factors, points, names, seed=seed, workers=workers, progress=progress)
+    designed = [design_config(config, factors, point) for point in points]
+    inputs = np.array([
+        [factor.coordinate(getattr(item, factor.field)) for factor in factors]
+        for item in designed
+    ])
+    values = np.column_stack([finals[0], losses_against(finals[0], finals[1:]).T])
+    return Surrogate(config, factors, names, inputs, values)
+
+
+__all__ = [
+    "DEFAULT_TOLERANCE",
+    "Surrogate",
+    "SurrogateEstimate",
+    "code_fingerprint",
+    "fit_surrogate",
+]
@@ -1,7 +1,191 @@
+import argparse
+import atexit
+import itertools
+import multiprocessing
+import sys
+
 import flet as ft
 
-from app.gui import launch
+from app.alternatives import alternative_plans
+from app.calibration import calibrate
+from app.distributed import AUTHKEY_ENV, resolve_authkey, run_worker
+from app.global_sensitivity import sobol_analysis
+from app.gui import SURROGATE_PATH, launch, server_target
+from app.ingest import iter_batch_records, measured_matrix, replay_measurements
+from app.metrics import export_metrics, serve_metrics
+from app.reports import generate_reports, load_configs, save_configs
+from app.sensitivity import run_sensitivity
+from app.server import ComputePool
+from app.shared import run_shared
+from app.strategies import enable_bottleneck_strategies, reference_strategy
+from app.surrogate import fit_surrogate
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sugar beet processing planner")
+    parser.add_argument("--server", action="store_true", help="serve the app in web mode")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8550)
+    parser.add_argument("--workers", type=int, default=None, help="shared worker processes")
+    parser.add_argument("--max-pending", type=int, default=None, help="queued runs limit")
+    parser.add_argument(
+        "--worker", metavar="HOST:PORT", default=None, help="serve shards of a coordinator")
+    parser.add_argument("--authkey", default=None,
+                        help=f"shared secret of the coordinator (or set {AUTHKEY_ENV})")
+    parser.add_argument("--report", metavar="CONFIGS.json", default=None,
+                        help="render reports for a JSON list of configurations")
+    parser.add_argument("--report-dir", default="reports")
+    parser.add_argument("--formats", default="png", help="comma-separated: png,svg,pdf")
+    parser.add_argument("--calibrate", metavar="MEASUREMENTS", default=None,
+                        help="fit the configurations of --calibrate-configs to measured batches")
+    parser.add_argument("--calibrate-configs", metavar="CONFIGS.json", default=None,
+                        help="base configurations to calibrate")
+    parser.add_argument("--calibrated", default="calibrated.json",
+                        help="where to write the calibrated configurations")
+    parser.add_argument("--sobol", metavar="CONFIGS.json", default=None,
+                        help="Sobol indices of the strategies' losses around each configuration")
+    parser.add_argument("--sobol-samples", type=int, default=256,
+                        help="Saltelli base samples (a power of two)")
+    parser.add_argument("--sensitivity", metavar="CONFIGS.json", default=None,
+                        help="dual prices and tolerances of the optimal plan per batch and day")
+    parser.add_argument("--alternatives", metavar="MEASUREMENTS", default=None,
+                        help="list the best plans for the measured batches")
+    parser.add_argument("--alternatives-k", type=int, default=20, help="number of plans")
+    parser.add_argument("--alternatives-batches", type=int, default=None,
+                        help="plan only the first batches of the file")
+    parser.add_argument("--replay", metavar="MEASUREMENTS", default=None,
+                        help="run every strategy on measured batches, one experiment per group")
+    parser.add_argument("--replay-batches", type=int, default=15,
+                        help="measured batches per replayed experiment")
+    parser.add_argument("--replay-ripening", type=int, default=7, help="ripening period, days")
+    parser.add_argument("--replay-no-inorganic", action="store_true",
+                        help="leave out the losses from inorganic substances")
+    parser.add_argument("--fit-surrogate", metavar="CONFIG.json", default=None,
+                        help="fit the GUI's surrogate model around a single configuration")
+    parser.add_argument("--surrogate", default=str(SURROGATE_PATH),
+                        help="where to write the surrogate model")
+    parser.add_argument("--surrogate-samples", type=int, default=256,
+                        help="designed configurations (a power of two)")
+    parser.add_argument("--export-experiments", metavar="CONFIG.json", default=None,
+                        help="save every experiment's totals and plans of a single configuration")
+    parser.add_argument("--export-path", default="experiments.npz")
+    parser.add_argument("--export-matrices", action="store_true",
+                        help="also save the working matrices")
+    parser.add_argument("--bottleneck-strategies", action="store_true",
+                        help="also run the worst-day (bottleneck) strategies")
+    parser.add_argument(
+        "--metrics-port", type=int, default=None, help="serve OpenMetrics at /metrics")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="interface of the metrics endpoint")
+    parser.add_argument("--metrics-file", default=None,
+                        help="keep writing OpenMetrics to this file (textfile collectors)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between writes of --metrics-file")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    ft.app(target=launch)
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.bottleneck_strategies:
+        enable_bottleneck_strategies()
+    if args.metrics_port is not None:
+        serve_metrics(args.metrics_host, args.metrics_port)
+    if args.metrics_file is not None:
+        atexit.register(export_metrics(args.metrics_file, args.metrics_interval))
+
+    def show_progress(done: int, total: int) -> None:
+        print(f"\rdesign points: {done}/{total} ({done / total:.0%})",
+              end="", file=sys.stderr, flush=True)
+
+    if args.sensitivity:
+        for config in load_configs(args.sensitivity):
+            report = run_sensitivity(config)
+            print(f"{config.batches} batches, {report.experiments} experiments, "
+                  f"mean optimum {report.optimum:.3f}")
+            print(f"  {'#':>3} {'day price':>10} {'batch price':>12} "
+                  f"{'tolerance':>10} {'min tolerance':>14}")
+            for index in range(report.size):
+                print(f"  {index + 1:>3} {report.day_prices[index]:10.3f} "
+                      f"{report.batch_prices[index]:12.3f} {report.batch_tolerance[index]:10.3f} "
+                      f"{report.batch_min_tolerance[index]:14.3f}")
+    elif args.alternatives:
+        records = list(itertools.islice(
+            iter_batch_records(args.alternatives), args.alternatives_batches))
+        if not records:
+            raise SystemExit("--alternatives needs at least one measured batch")
+        for alternative in alternative_plans(measured_matrix(records), args.alternatives_k):
+            days = ", ".join(str(day + 1) for day in alternative.changed_days) or "-"
+            print(f"#{alternative.rank:<3} total {alternative.total:10.3f}  "
+                  f"gap {alternative.gap:8.3f} ({alternative.gap_percent:.3f}%)  "
+                  f"changed days: {days}")
+    elif args.replay:
+        averages, experiments = replay_measurements(
+            args.replay, args.replay_batches, args.replay_ripening,
+            include_inorganic=not args.replay_no_inorganic)
+        reference = reference_strategy()
+        optimum = averages[reference][-1] if reference in averages else None
+        print(f"{experiments} experiments of {args.replay_batches} batches")
+        for name, totals in averages.items():
+            loss = f"  loss {optimum - totals[-1]:10.3f}" if optimum is not None else ""
+            print(f"  {name:<28} total {totals[-1]:10.3f}{loss}")
+    elif args.export_experiments:
+        configs = load_configs(args.export_experiments)
+        if len(configs) != 1:
+            raise SystemExit("--export-experiments needs exactly one configuration")
+        with run_shared(
+                configs[0], workers=args.workers, matrices=args.export_matrices) as outputs:
+            outputs.save(args.export_path)
+            print(f"{outputs.experiments} experiments written to {args.export_path}")
+    elif args.fit_surrogate:
+        configs = load_configs(args.fit_surrogate)
+        if len(configs) != 1:
+            raise SystemExit("--fit-surrogate needs exactly one configuration")
+        surrogate = fit_surrogate(
+            configs[0], samples=args.surrogate_samples, workers=args.workers,
+            progress=show_progress)
+        print(file=sys.stderr)
+        surrogate.save(args.surrogate)
+        print(f"surrogate written to {args.surrogate}")
+    elif args.sobol:
+        for config in load_configs(args.sobol):
+            result = sobol_analysis(
+                config, samples=args.sobol_samples, workers=args.workers, progress=show_progress)
+            print(file=sys.stderr)
+            for output in result.outputs:
+                print(f"{output}: loss against the optimum")
+                for factor, first, total in result.ranking(output):
+                    print(f"  {factor:<16} S1 {first:6.3f}  ST {total:6.3f}")
+    elif args.calibrate:
+        if not args.calibrate_configs:
+            raise SystemExit("--calibrate needs the base configurations in --calibrate-configs")
+        results = [
+            calibrate(iter_batch_records(args.calibrate), config)
+            for config in load_configs(args.calibrate_configs)
+        ]
+        save_configs([result.config for result in results], args.calibrated)
+        for result in results:
+            print(f"{result.batches} batches, distribution fit: {result.losses}")
+    elif args.report:
+        generate_reports(
+            load_configs(args.report), args.report_dir, formats=args.formats.split(","))
+    elif args.worker:
+        host, port = args.worker.rsplit(":", 1)
+        try:
+            authkey = resolve_authkey(args.authkey)
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        run_worker((host, int(port)), authkey)
+    elif args.server:
+        pool = ComputePool(max_workers=args.workers, max_pending=args.max_pending)
+        try:
+            ft.app(
+                target=server_target(pool),
+                view=ft.AppView.WEB_BROWSER,
+                host=args.host,
+                port=args.port,
+            )
+        finally:
+            pool.shutdown(wait=False)
+    else:
+        ft.app(target=launch)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from app.simulation import SimulationConfig
+
+
+@pytest.fixture
+def config() -> SimulationConfig:
+    """Small configuration that runs in well under a second"""
+    return SimulationConfig(
+        batches=8,
+        ripening_period=3,
+        min_sugar=12.0,
+        max_sugar=22.0,
+        min_rip_coeff=1.01,
+        max_rip_coeff=1.15,
+        min_deg_coeff=0.85,
+        max_deg_coeff=0.99,
+        include_inorganic=True,
+        include_ripening=True,
+        experiments=150,
+        dist_type="uniform",
+        daily_tonnage=3000.0,
+        min_k=4.8,
+        max_k=7.05,
+        min_na=0.21,
+        max_na=0.82,
+        min_n=1.58,
+        max_n=2.8,
+        min_i0=0.62,
+        max_i0=0.64,
+    )
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(20240521)
+
+
+@pytest.fixture
+def stack(rng: np.random.Generator):
+    """Factory of ``k x n x n`` stacks shaped like working matrices"""
+    def make(count: int, size: int) -> np.ndarray:
+        start = rng.uniform(12.0, 22.0, (count, size, 1))
+        return start * np.cumprod(rng.uniform(0.9, 1.1, (count, size, size)), axis=2)
+    return make
@@ -0,0 +1,87 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.algorithms import hungarian_max_k_best
+from app.alternatives import alternative_plans
+
+# Its six plans total 11, 9, 7, 6, 6 and 5; plans 0, 1, 2 and 2, 1, 0 tie at 6.
+MATRIX = [[4.0, 1.0, 3.0], [2.0, 0.0, 5.0], [3.0, 2.0, 2.0]]
+
+
+def ranked_totals(matrix: np.ndarray):
+    days = np.arange(len(matrix))
+    return sorted(
+        (matrix[list(plan), days].sum() for plan in itertools.permutations(days)), reverse=True)
+
+
+@pytest.mark.parametrize("size, k", [(4, 24), (5, 30), (6, 50)])
+def test_k_best_matches_brute_force(stack, size, k):
+    for matrix in stack(5, size):
+        ranked = hungarian_max_k_best(matrix.tolist(), k)
+        expected = ranked_totals(matrix)[:k]
+        assert [totals[-1] for totals, _ in ranked] == pytest.approx(expected)
+        plans = [tuple(plan) for _, plan in ranked]
+        assert len(set(plans)) == len(plans)
+        for totals, plan in ranked:
+            assert sorted(plan) == list(range(size))
+            np.testing.assert_allclose(totals, np.cumsum(matrix[plan, np.arange(size)]))
+
+
+def test_k_best_of_a_known_matrix():
+    ranked = hungarian_max_k_best(MATRIX, 3)
+    assert [plan for _, plan in ranked] == [[0, 2, 1], [2, 0, 1], [1, 2, 0]]
+    assert [totals for totals, _ in ranked] == [
+        [4.0, 6.0, 11.0], [3.0, 4.0, 9.0], [2.0, 4.0, 7.0]]
+
+    # Asking for more plans than exist returns all six, the tied pair in either order.
+    ranked = hungarian_max_k_best(MATRIX, 10)
+    assert [totals[-1] for totals, _ in ranked] == [11.0, 9.0, 7.0, 6.0, 6.0, 5.0]
+    assert {tuple(plan) for _, plan in ranked[3:5]} == {(0, 1, 2), (2, 1, 0)}
+    assert ranked[5][1] == [1, 0, 2]
+
+
+def test_single_batch_has_one_plan():
+    assert hungarian_max_k_best([[5.0]], 3) == [([5.0], [0])]
+    [only] = alternative_plans([[5.0]], 3)
+    assert (only.rank, only.plan, only.gap, only.changed_days) == (1, [0], 0.0, [])
+
+
+def test_k_best_ties_keep_distinct_plans():
+    ranked = hungarian_max_k_best(np.ones((4, 4)).tolist(), 24)
+    assert len({tuple(plan) for _, plan in ranked}) == 24
+
+
+def test_k_best_rejects_non_positive_k(stack):
+    with pytest.raises(ValueError):
+        hungarian_max_k_best(stack(1, 3)[0].tolist(), 0)
+
+
+def test_alternative_plans_report_gaps(stack):
+    matrix = stack(1, 6)[0]
+    plans = alternative_plans(matrix.tolist(), 10)
+    assert [plan.rank for plan in plans] == list(range(1, 11))
+    assert plans[0].gap == 0 and plans[0].changed_days == []
+    optimum = plans[0].total
+    for plan in plans[1:]:
+        assert plan.gap == pytest.approx(optimum - plan.total)
+        assert plan.gap_percent == pytest.approx(plan.gap / optimum * 100)
+        assert plan.changed_days == [
+            day for day in range(6) if plan.plan[day] != plans[0].plan[day]]
+
+
+def test_alternative_plans_of_a_known_matrix():
+    best, second, third = alternative_plans(MATRIX, 3)
+    assert (best.total, best.gap, best.changed_days) == (11.0, 0.0, [])
+    assert (second.plan, second.gap, second.changed_days) == ([2, 0, 1], 2.0, [0, 1])
+    assert second.gap_percent == pytest.approx(200 / 11)
+    assert (third.plan, third.gap, third.changed_days) == ([1, 2, 0], 4.0, [0, 2])
+
+
+def test_tied_and_zero_plans_have_no_gap():
+    plans = alternative_plans(np.full((3, 3), 2.0).tolist(), 6)
+    assert len(plans) == 6
+    assert all(plan.gap == 0 and plan.total == 6.0 for plan in plans)
+    # A zero optimum reports no percentage instead of dividing by it.
+    assert [plan.gap_percent for plan in alternative_plans([[0.0, 0.0], [0.0, 0.0]], 2)] == [0, 0]
@@ -0,0 +1,138 @@
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+from app import algorithms
+from app.algorithms import (
+    bottleneck_lexicographic_algorithm,
+    bottleneck_max_algorithm,
+    bottleneck_max_batch,
+)
+from app.runstats import RunStatistics
+from app.strategies import (
+    BOTTLENECK_ENV,
+    BOTTLENECK_STRATEGIES,
+    STRATEGIES,
+    enable_bottleneck_strategies,
+    hindsight_strategies,
+    reference_strategy,
+    unregister_strategy,
+)
+
+
+# Keeping the batches gives 10 then 1, swapping them 4 and 4.
+SWAP = np.array([[10.0, 4.0], [4.0, 1.0]])
+# Plans 0, 2, 1 (total 11) and 1, 2, 0 (total 7) share the best worst day of 2.
+TIED = np.array([[4.0, 1.0, 3.0], [2.0, 0.0, 5.0], [3.0, 2.0, 2.0]])
+
+
+def brute_force(matrix: np.ndarray):
+    """Best worst day, and the best total among the plans reaching it"""
+    days = np.arange(len(matrix))
+    picked = [matrix[list(plan), days] for plan in itertools.permutations(days)]
+    bottleneck = max(values.min() for values in picked)
+    return bottleneck, max(values.sum() for values in picked if values.min() == bottleneck)
+
+
+def tied_stack(rng: np.random.Generator, count: int, size: int) -> np.ndarray:
+    return rng.integers(0, 4, (count, size, size)).astype(float)
+
+
+def test_worst_day_wins_over_the_total():
+    for lexicographic in (False, True):
+        totals, plans = bottleneck_max_batch(SWAP[np.newaxis], lexicographic)
+        np.testing.assert_array_equal(plans, [[1, 0]])
+        np.testing.assert_array_equal(totals, [[4.0, 8.0]])
+    assert bottleneck_max_algorithm(SWAP.tolist()) == ([4.0, 8.0], [1, 0])
+
+
+def test_lexicographic_plan_breaks_the_bottleneck_tie_by_total():
+    totals, plans = bottleneck_max_batch(TIED[np.newaxis])
+    assert plans[0].tolist() in ([0, 2, 1], [1, 2, 0])
+    assert np.diff(totals[0], prepend=0.0).min() == 2.0
+    totals, plans = bottleneck_max_batch(TIED[np.newaxis], True)
+    np.testing.assert_array_equal(plans, [[0, 2, 1]])
+    np.testing.assert_array_equal(totals, [[4.0, 6.0, 11.0]])
+    assert bottleneck_lexicographic_algorithm(TIED.tolist()) == ([4.0, 6.0, 11.0], [0, 2, 1])
+
+
+@pytest.mark.parametrize("lexicographic", [False, True])
+def test_equal_matrix_single_batch_and_empty_stack(lexicographic):
+    totals, plans = bottleneck_max_batch(np.full((2, 4, 4), 3.0), lexicographic)
+    assert (np.sort(plans, axis=1) == np.arange(4)).all()
+    np.testing.assert_array_equal(totals, [[3.0, 6.0, 9.0, 12.0]] * 2)
+    totals, plans = bottleneck_max_batch(np.array([[[7.0]], [[-2.0]]]), lexicographic)
+    np.testing.assert_array_equal(totals, [[7.0], [-2.0]])
+    np.testing.assert_array_equal(plans, [[0], [0]])
+    for result in bottleneck_max_batch(np.zeros((0, 5, 5)), lexicographic):
+        assert result.shape == (0, 5)
+
+
+@pytest.mark.parametrize("size", [2, 5, 6])
+def test_bottleneck_batch_matches_brute_force(stack, rng, size):
+    for values in (stack(25, size), tied_stack(rng, 25, size)):
+        totals, plans = bottleneck_max_batch(values)
+        lexicographic_totals, lexicographic_plans = bottleneck_max_batch(values, True)
+        for index, matrix in enumerate(values):
+            bottleneck, best_total = brute_force(matrix)
+            assert sorted(plans[index]) == list(range(size))
+            assert matrix[plans[index], np.arange(size)].min() == bottleneck
+            assert matrix[lexicographic_plans[index], np.arange(size)].min() == bottleneck
+            assert lexicographic_totals[index, -1] == pytest.approx(best_total)
+            np.testing.assert_allclose(
+                totals[index], np.cumsum(matrix[plans[index], np.arange(size)]))
+
+
+def test_stacked_search_matches_per_matrix_search(stack, rng, monkeypatch):
+    values = np.concatenate([stack(40, 12), tied_stack(rng, 40, 12)])
+    stacked = bottleneck_max_batch(values, True)
+    monkeypatch.setattr(algorithms, "STACKED_BOTTLENECK_SIZE", 0)
+    single = bottleneck_max_batch(values, True)
+    np.testing.assert_allclose(stacked[0], single[0])
+
+
+def test_single_matrix_algorithms_match_the_batch(stack):
+    values = stack(5, 7)
+    totals, _ = bottleneck_max_batch(values)
+    lexicographic_totals, _ = bottleneck_max_batch(values, True)
+    for index, matrix in enumerate(values):
+        single, plan = bottleneck_max_algorithm(matrix.tolist())
+        assert min(np.diff(single, prepend=0.0)) == pytest.approx(
+            np.diff(totals[index], prepend=0.0).min())
+        assert sorted(plan) == list(range(7))
+        single, _ = bottleneck_lexicographic_algorithm(matrix.tolist())
+        assert single[-1] == pytest.approx(lexicographic_totals[index, -1])
+
+
+def test_bottleneck_strategies_are_opt_in(monkeypatch):
+    names = {strategy.name for strategy in BOTTLENECK_STRATEGIES}
+    if os.environ.get(BOTTLENECK_ENV) != "1":
+        assert not names & set(STRATEGIES)
+    monkeypatch.setenv(BOTTLENECK_ENV, "0")
+    registered = [name for name in names if name not in STRATEGIES]
+    try:
+        enable_bottleneck_strategies()
+        assert names <= set(STRATEGIES)
+        assert os.environ[BOTTLENECK_ENV] == "1"
+        assert names <= hindsight_strategies()
+        assert reference_strategy() in hindsight_strategies()
+    finally:
+        for name in registered:
+            unregister_strategy(name)
+
+
+def test_worst_days_average_each_experiment():
+    totals = np.cumsum(np.array([[3.0, 1.0, 5.0], [2.0, 6.0, 4.0]]), axis=1)
+    statistics = RunStatistics()
+    statistics.add({"plan": totals[:1]}, {"plan": 1.0})
+    statistics.add({"plan": totals[1:]}, {"plan": 3.0})
+    assert statistics.worst_days() == {"plan": pytest.approx(1.5)}
+    assert statistics.runtimes() == {"plan": pytest.approx(2000.0)}
+
+    restored = RunStatistics()
+    restored.restore(statistics.state())
+    restored.merge(statistics)
+    assert restored.experiments == 4
+    assert restored.worst_days() == statistics.worst_days()
@@ -0,0 +1,75 @@
+import random
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.calibration import _PhaseTarget, calibrate, fit_uniform_range
+from app.ingest import BatchRecord
+from app.simulation import coefficient_generator, draw_coefficients
+
+TRUE_RANGES = {
+    "min_sugar": 15.0, "max_sugar": 19.0,
+    "min_rip_coeff": 1.02, "max_rip_coeff": 1.08,
+    "min_deg_coeff": 0.9, "max_deg_coeff": 0.97,
+    "min_k": 5.0, "max_k": 6.5,
+    "min_na": 0.3, "max_na": 0.6,
+    "min_n": 1.8, "max_n": 2.4,
+    "min_i0": 0.6, "max_i0": 0.66,
+}
+
+
+def measured(config, count: int, seed: int):
+    """Records drawn by the simulation's own generators"""
+    rng = random.Random(seed)
+    gen_func = coefficient_generator(config)
+    records = []
+    while len(records) < count:
+        for row in draw_coefficients(config, gen_func, rng):
+            records.append(BatchRecord(
+                batch_id=str(len(records)),
+                sugar=rng.uniform(config.min_sugar, config.max_sugar),
+                k=rng.uniform(config.min_k, config.max_k),
+                na=rng.uniform(config.min_na, config.max_na),
+                n=rng.uniform(config.min_n, config.max_n),
+                i0=rng.uniform(config.min_i0, config.max_i0),
+                coefficients=row[1:],
+            ))
+    return records[:count]
+
+
+@pytest.mark.parametrize("dist_type", ["uniform", "concentrated"])
+def test_calibration_recovers_the_generating_config(config, dist_type):
+    truth = replace(config, dist_type=dist_type, **TRUE_RANGES)
+    other = "concentrated" if dist_type == "uniform" else "uniform"
+    result = calibrate(measured(truth, 600, seed=4), replace(config, dist_type=other), draws=2000)
+    assert result.batches == 600
+    assert result.config.dist_type == dist_type
+    assert result.losses[dist_type] < result.losses[other]
+    for field, value in TRUE_RANGES.items():
+        assert getattr(result.config, field) == pytest.approx(value, rel=0.02), field
+    assert result.config.batches == config.batches
+    assert result.config.ripening_period == config.ripening_period
+
+
+def test_spread_term_is_scaled_by_the_spread():
+    rng = np.random.default_rng(0)
+    observed = 1.0 + rng.uniform(-0.05, 0.05, (200, 1)) + rng.uniform(-0.01, 0.01, (200, 6))
+    target = _PhaseTarget(observed)
+    assert target.spread_scale == pytest.approx(np.std(target.spread))
+    # The same pooled values without their concentration within a batch only
+    # miss the spread quantiles, by many deviations of the spread.
+    shuffled = rng.permutation(observed.ravel()).reshape(observed.shape)
+    assert target.loss(shuffled) > 10.0
+
+
+def test_uniform_range_fit():
+    rng = np.random.default_rng(1)
+    low, high = fit_uniform_range(rng.uniform(3.0, 5.0, 2000), rng.random(4000))
+    assert low == pytest.approx(3.0, abs=0.05)
+    assert high == pytest.approx(5.0, abs=0.05)
+
+
+def test_calibration_needs_two_batches(config):
+    with pytest.raises(ValueError):
+        calibrate(measured(config, 1, seed=0), config)
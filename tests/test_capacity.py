@@ -0,0 +1,52 @@
+import random
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.algorithms import (
+    capacity_greedy_algorithm,
+    capacity_thrifty_algorithm,
+    transportation_max_algorithm,
+)
+from app.simulation import run_simulation
+from app.strategies import active_strategies, reference_strategy
+
+# Sugar content (%) of two batches on two days, 3 t and 1 t, 2 t a day.
+MATRIX = [[10.0, 20.0], [30.0, 5.0]]
+MASSES = [3.0, 1.0]
+CAPACITIES = [2.0, 2.0]
+
+
+def test_transportation_plan_is_optimal():
+    totals, plan = transportation_max_algorithm(MATRIX, MASSES, CAPACITIES)
+    assert totals == pytest.approx([0.4, 0.8])
+    np.testing.assert_allclose(plan, [[1.0, 2.0], [1.0, 0.0]], atol=1e-9)
+
+
+def test_greedy_and_thrifty_fill_the_days_in_order():
+    assert capacity_greedy_algorithm(MATRIX, MASSES, CAPACITIES)[0] == pytest.approx([0.4, 0.8])
+    totals, plan = capacity_thrifty_algorithm(MATRIX, MASSES, CAPACITIES)
+    assert totals == pytest.approx([0.2, 0.45])
+    assert plan == [[2.0, 1.0], [0.0, 1.0]]
+
+
+def test_overfull_plant_is_rejected():
+    with pytest.raises(ValueError, match="capacity"):
+        transportation_max_algorithm(MATRIX, [3.0, 2.0], CAPACITIES)
+
+
+def test_capacity_run_is_in_tonnes_and_bounded_by_the_optimum(config):
+    config = replace(config, capacity_mode=True, min_mass=1000.0, max_mass=3000.0,
+                     experiments=20)
+    random.seed(8)
+    averages = run_simulation(config)
+    assert set(averages) == {strategy.name for strategy in active_strategies(True)}
+
+    optimum = averages[reference_strategy()]
+    # At most every tonne processed at the richest content drawn.
+    assert 0 < optimum[-1] < config.max_mass * config.batches * config.max_sugar / 100
+    for totals in averages.values():
+        assert len(totals) == config.batches
+        assert np.all(np.diff(totals) >= 0)
+        assert totals[-1] <= optimum[-1] + 1e-9
@@ -0,0 +1,91 @@
+import json
+import random
+from dataclasses import replace
+
+import pytest
+
+from app import simulation
+from app.checkpoint import SimulationCheckpoint
+from app.comparison import PairedComparison
+from app.frequency import AssignmentFrequency
+from app.runstats import RunStatistics
+from app.sampling import VarianceTracker
+from app.simulation import CHUNK_SIZE, run_simulation
+from app.strategies import reference_strategy
+
+
+def observed_run(config, checkpoint=None):
+    """Averages and the state of every tracker of one run"""
+    trackers = {
+        "variance": VarianceTracker(),
+        "frequencies": AssignmentFrequency(reference_strategy()),
+        "comparison": PairedComparison(),
+        "statistics": RunStatistics(),
+    }
+    averages = run_simulation(config, checkpoint=checkpoint, **trackers)
+    states = {name: tracker.state() for name, tracker in trackers.items()}
+    # Timings depend on the machine, not on where the run resumed.
+    del states["statistics"]["seconds"]
+    return averages, json.loads(json.dumps(states))
+
+
+def interrupt_after(monkeypatch, chunks: int) -> None:
+    evaluate = simulation._evaluate_chunk
+    calls = []
+
+    def failing(*args, **kwargs):
+        if len(calls) == chunks:
+            raise RuntimeError("interrupted")
+        calls.append(None)
+        return evaluate(*args, **kwargs)
+
+    monkeypatch.setattr(simulation, "_evaluate_chunk", failing)
+
+
+@pytest.mark.parametrize("sampling, robust_objective", [
+    ("random", "none"),
+    ("antithetic", "mean"),
+    ("lhs", "cvar"),
+])
+def test_resumed_run_matches_uninterrupted_run(
+        config, tmp_path, monkeypatch, sampling, robust_objective):
+    config = replace(config, experiments=5 * CHUNK_SIZE + 7, sampling=sampling,
+                     robust_objective=robust_objective)
+    random.seed(11)
+    expected = observed_run(config)
+
+    checkpoint = SimulationCheckpoint(tmp_path / "run.json", interval=0.0)
+    random.seed(11)
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 3)
+        with pytest.raises(RuntimeError, match="interrupted"):
+            observed_run(config, checkpoint)
+    assert checkpoint.load(config) is not None
+
+    # Whatever the generator holds now, the snapshot restores its own state.
+    random.seed(99)
+    assert observed_run(config, checkpoint) == expected
+    assert not checkpoint.path.exists()
+
+
+def test_snapshot_of_another_config_is_ignored(config, tmp_path, monkeypatch):
+    config = replace(config, experiments=3 * CHUNK_SIZE)
+    checkpoint = SimulationCheckpoint(tmp_path / "run.json", interval=0.0)
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 1)
+        with pytest.raises(RuntimeError):
+            run_simulation(config, checkpoint=checkpoint)
+    other = replace(config, max_sugar=config.max_sugar + 1)
+    assert checkpoint.load(config) is not None
+    assert checkpoint.load(other) is None
+
+    random.seed(5)
+    expected = run_simulation(other)
+    random.seed(5)
+    assert run_simulation(other, checkpoint=checkpoint) == expected
+
+
+def test_unreadable_snapshot_starts_over(config, tmp_path):
+    path = tmp_path / "run.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert SimulationCheckpoint(path).load(config) is None
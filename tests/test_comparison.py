@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from app.comparison import PairedComparison
+
+# Final totals of two strategies on five shared experiments; a - b = 1, 0, 1, 2, 1.
+A = np.array([10.0, 12.0, 11.0, 13.0, 14.0])
+B = np.array([9.0, 12.0, 10.0, 11.0, 13.0])
+# Student t quantile for 95% with four degrees of freedom.
+T_975_4 = 2.7764451051977987
+
+
+def test_interval_and_win_rate_of_a_known_sample():
+    comparison = PairedComparison()
+    comparison.add({"a": A, "b": B})
+    result = comparison.difference("a", "b")
+
+    # The differences have mean 1 and sample variance 0.5.
+    half = T_975_4 * np.sqrt(0.5 / 5)
+    assert result.mean == pytest.approx(1.0)
+    assert (result.low, result.high) == pytest.approx((1.0 - half, 1.0 + half))
+    assert result.significant
+    assert result.win_rate == pytest.approx(0.9)
+    assert comparison.win_rate("b", "a") == pytest.approx(0.1)
+    assert result.experiments == 5
+
+
+def test_scale_converts_the_difference_and_its_interval():
+    comparison = PairedComparison()
+    comparison.add({"a": A, "b": B})
+    plain = comparison.difference("a", "b")
+    scaled = comparison.difference("b", "a", scale=30.0)
+    assert scaled.mean == pytest.approx(-30.0 * plain.mean)
+    assert scaled.high - scaled.low == pytest.approx(30.0 * (plain.high - plain.low))
+
+
+def test_chunks_and_merges_match_one_pass():
+    whole = PairedComparison()
+    whole.add({"a": A, "b": B})
+    chunked = PairedComparison()
+    chunked.add({"a": A[:2], "b": B[:2]})
+    chunked.add({"a": A[2:], "b": B[2:]})
+    merged = PairedComparison()
+    for start in range(0, 5, 2):
+        part = PairedComparison()
+        part.add({"a": A[start:start + 2], "b": B[start:start + 2]})
+        merged.merge(part)
+    for other in (chunked, merged):
+        assert other.count == whole.count
+        np.testing.assert_allclose(other.mean, whole.mean)
+        np.testing.assert_allclose(other.covariance(), whole.covariance())
+        np.testing.assert_array_equal(other.wins, whole.wins)
+        np.testing.assert_array_equal(other.ties, whole.ties)
+
+
+def test_identical_strategies_tie():
+    comparison = PairedComparison()
+    comparison.add({"a": A, "copy": A.copy()})
+    result = comparison.difference("a", "copy")
+    assert (result.mean, result.low, result.high) == (0.0, 0.0, 0.0)
+    assert not result.significant
+    assert result.win_rate == 0.5
+
+
+def test_probability_best_follows_the_paired_evidence():
+    comparison = PairedComparison()
+    comparison.add({"a": A, "b": B})
+    assert comparison.probability_best() == {"a": pytest.approx(1.0, abs=0.01),
+                                             "b": pytest.approx(0.0, abs=0.01)}
+    assert PairedComparison().probability_best() == {}
+
+
+def test_chunks_must_name_the_same_strategies():
+    comparison = PairedComparison()
+    comparison.add({"a": A, "b": B})
+    with pytest.raises(ValueError):
+        comparison.add({"b": B, "a": A})
+    with pytest.raises(ValueError):
+        PairedComparison().covariance()
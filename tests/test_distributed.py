@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import pytest
+
+from app.distributed import (
+    AUTHKEY_ENV,
+    ShardCoordinator,
+    _WorkerManager,
+    resolve_authkey,
+    run_shard,
+    run_worker,
+)
+from app.runstats import RunStatistics
+
+# Workers are spawned, as in the Windows build.
+SPAWN = multiprocessing.get_context("spawn")
+
+
+def test_authkey_is_required(monkeypatch):
+    monkeypatch.delenv(AUTHKEY_ENV, raising=False)
+    with pytest.raises(ValueError, match=AUTHKEY_ENV):
+        resolve_authkey()
+    with pytest.raises(ValueError):
+        resolve_authkey("")
+    with pytest.raises(ValueError):
+        ShardCoordinator()
+    with pytest.raises(ValueError):
+        run_worker(("127.0.0.1", 1))
+
+
+def test_authkey_comes_from_the_argument_or_the_environment(monkeypatch):
+    monkeypatch.setenv(AUTHKEY_ENV, "from-env")
+    assert resolve_authkey() == b"from-env"
+    assert resolve_authkey("given") == b"given"
+    assert resolve_authkey(b"raw") == b"raw"
+
+
+@pytest.mark.parametrize("objective", ["mean", "cvar"])
+def test_robust_plans_are_not_sharded(config, objective):
+    robust = replace(config, robust_objective=objective)
+    with pytest.raises(ValueError, match="robust plan"):
+        run_shard(robust, 10, seed=1)
+    coordinator = ShardCoordinator(authkey=b"test")
+    try:
+        with pytest.raises(ValueError, match="robust plan"):
+            coordinator.run(robust, seed=1)
+    finally:
+        coordinator.close()
+
+
+def _dying_worker(address, authkey) -> None:
+    """Take one shard and die without a word, as a killed worker would"""
+    manager = _WorkerManager(address=address, authkey=authkey)
+    manager.connect()
+    tasks = manager.tasks()
+    while True:
+        try:
+            if tasks.take(0.2) is not None:
+                os._exit(1)
+        except queue.Empty:
+            continue
+
+
+def single_process(config, shard_size: int, seed: int):
+    partials = [
+        run_shard(config, min(shard_size, config.experiments - start), seed + index)
+        for index, start in enumerate(range(0, config.experiments, shard_size))
+    ]
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged = merged.merge(partial)
+    return merged
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = ShardCoordinator(
+        authkey=b"test", shard_size=40, shard_timeout=5.0, worker_timeout=30.0)
+    workers = []
+
+    def start(target=run_worker):
+        process = SPAWN.Process(target=target, args=(coordinator.address, b"test"))
+        process.start()
+        workers.append(process)
+        return process
+
+    yield coordinator, start
+    coordinator.close()
+    for process in workers:
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+
+
+def test_local_workers_match_a_single_process_run(config, coordinator):
+    coordinator, start = coordinator
+    for _ in range(3):
+        start()
+    config = replace(config, experiments=230)
+    statistics = RunStatistics()
+    averages = coordinator.run(config, seed=17, statistics=statistics)
+
+    expected = single_process(config, 40, 17)
+    assert averages == expected.averages()
+    assert statistics.experiments == 230
+    assert statistics.worst_days() == expected.statistics.worst_days()
+    assert coordinator.retried == 0
+
+
+def test_shard_of_a_killed_worker_is_retried(config, coordinator):
+    coordinator, start = coordinator
+    dying = start(_dying_worker)
+    config = replace(config, experiments=120)
+    with ThreadPoolExecutor(1) as executor:
+        running = executor.submit(coordinator.run, config, 5)
+        dying.join(60)
+        assert dying.exitcode == 1
+        start()
+        start()
+        averages = running.result(timeout=120)
+    assert coordinator.retried == 1
+    assert averages == single_process(config, 40, 5).averages()
+
+
+def test_run_without_workers_gives_up(config):
+    coordinator = ShardCoordinator(authkey=b"test", shard_size=40, worker_timeout=1.0)
+    try:
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="No worker"):
+            coordinator.run(replace(config, experiments=80), seed=1)
+        assert time.monotonic() - started < 10
+    finally:
+        coordinator.close()
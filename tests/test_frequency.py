@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.frequency import AssignmentFrequency
+from app.simulation import run_simulation
+from app.strategies import reference_strategy
+
+# Two experiments of two days: the reference swaps the batches in the second.
+PLANS = {
+    "best": np.array([[0, 1], [1, 0]]),
+    "fixed": np.array([[0, 1], [0, 1]]),
+}
+
+
+def test_counts_and_agreement_of_a_known_sample():
+    frequencies = AssignmentFrequency("best")
+    frequencies.add(PLANS)
+    np.testing.assert_array_equal(frequencies.counts["best"], [[1, 1], [1, 1]])
+    np.testing.assert_array_equal(frequencies.frequencies("fixed"), [[1.0, 0.0], [0.0, 1.0]])
+    assert frequencies.agreement() == {"best": 1.0, "fixed": 0.5}
+
+
+def test_merged_halves_equal_one_pass():
+    whole = AssignmentFrequency("best")
+    whole.add(PLANS)
+    first, second = AssignmentFrequency("best"), AssignmentFrequency("best")
+    first.add({name: plans[:1] for name, plans in PLANS.items()})
+    second.add({name: plans[1:] for name, plans in PLANS.items()})
+    first.merge(second)
+    assert first.state() == whole.state()
+
+    # An empty tracker takes the reference of what it merges.
+    empty = AssignmentFrequency()
+    empty.merge(whole)
+    assert empty.state() == whole.state()
+
+
+def test_state_round_trip():
+    frequencies = AssignmentFrequency("best")
+    frequencies.add(PLANS)
+    restored = AssignmentFrequency()
+    restored.restore(frequencies.state())
+    assert restored.state() == frequencies.state()
+    assert restored.agreement() == frequencies.agreement()
+
+
+def test_without_a_reference_only_counts_are_kept():
+    frequencies = AssignmentFrequency()
+    frequencies.add(PLANS)
+    assert frequencies.agreement() == {}
+    assert frequencies.counts["fixed"].sum() == 4
+
+
+def test_every_run_plan_is_a_permutation(config):
+    frequencies = AssignmentFrequency(reference_strategy())
+    run_simulation(config, frequencies=frequencies)
+    for name in frequencies.counts:
+        shares = frequencies.frequencies(name)
+        np.testing.assert_allclose(shares.sum(axis=0), 1.0)
+        np.testing.assert_allclose(shares.sum(axis=1), 1.0)
+    assert frequencies.agreement()[reference_strategy()] == pytest.approx(1.0)
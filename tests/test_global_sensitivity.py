@@ -0,0 +1,77 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app import global_sensitivity
+from app.global_sensitivity import (
+    Factor,
+    default_factors,
+    design_config,
+    evaluate_design,
+    sobol_analysis,
+)
+from app.strategies import reference_strategy
+
+# Analytical indices of the Ishigami function with a = 7, b = 0.1.
+ISHIGAMI_FIRST = [0.3139, 0.4424, 0.0]
+ISHIGAMI_TOTAL = [0.5576, 0.4424, 0.2437]
+
+
+def ishigami(x: np.ndarray) -> np.ndarray:
+    return np.sin(x[:, 0]) + 7 * np.sin(x[:, 1]) ** 2 + 0.1 * x[:, 2] ** 4 * np.sin(x[:, 0])
+
+
+def test_indices_of_the_ishigami_function(config, monkeypatch):
+    factors = [Factor(name, -np.pi, np.pi) for name in ("min_sugar", "max_sugar", "min_k")]
+
+    def evaluate(config, factors, points, names, **kwargs):
+        values = np.array([[factor.value(u) for factor, u in zip(factors, point)]
+                           for point in points])
+        # The reference stays at 100, so every loss in percent is the function itself.
+        return np.vstack([np.full(len(points), 100.0)]
+                         + [100.0 - ishigami(values)] * (len(names) - 1))
+
+    monkeypatch.setattr(global_sensitivity, "evaluate_design", evaluate)
+    result = sobol_analysis(config, factors, samples=4096, seed=3)
+
+    assert result.factors == ["min_sugar", "max_sugar", "min_k"]
+    assert reference_strategy() not in result.outputs
+    assert result.evaluations == 4096 * 5
+    np.testing.assert_allclose(result.first_order[0], ISHIGAMI_FIRST, atol=0.05)
+    np.testing.assert_allclose(result.total_order[0], ISHIGAMI_TOTAL, atol=0.05)
+    assert [factor for factor, _, _ in result.ranking(result.outputs[0])] == [
+        "min_sugar", "max_sugar", "min_k"]
+
+
+def test_design_points_are_reproducible_across_workers(config):
+    config = replace(config, experiments=20)
+    factors = default_factors(config)
+    points = np.random.default_rng(1).random((4, len(factors)))
+    names = [reference_strategy(), "Жадный"]
+    single = evaluate_design(config, factors, points, names, seed=9, workers=1)
+    assert single.shape == (2, 4)
+    np.testing.assert_array_equal(
+        evaluate_design(config, factors, points, names, seed=9, workers=2), single)
+    assert np.all(single[0] >= single[1] - 1e-9)
+
+
+def test_crossed_bounds_are_swapped(config):
+    factors = [Factor("min_sugar", 10.0, 30.0), Factor("max_sugar", 10.0, 30.0)]
+    designed = design_config(config, factors, [0.75, 0.25])
+    assert (designed.min_sugar, designed.max_sugar) == (15.0, 25.0)
+
+
+def test_integer_and_choice_factors_round_trip():
+    period = Factor("ripening_period", 1, 5, integer=True)
+    assert [period.value(u) for u in (0.0, 0.5, 0.99)] == [1, 3, 5]
+    assert period.value(period.coordinate(4)) == 4
+    kind = Factor("dist_type", choices=("uniform", "concentrated"))
+    assert kind.value(kind.coordinate("concentrated")) == "concentrated"
+    with pytest.raises(ValueError):
+        period.coordinate(6)
+
+
+def test_samples_must_be_a_power_of_two(config):
+    with pytest.raises(ValueError, match="power of two"):
+        sobol_analysis(config, samples=100)
@@ -0,0 +1,80 @@
+from dataclasses import replace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import gui
+from app.checkpoint import SimulationCheckpoint
+from app.sampling import ExperimentSampler
+
+
+@pytest.fixture
+def window(tmp_path, monkeypatch):
+    monkeypatch.setattr(gui, "CHECKPOINT_PATH", tmp_path / "checkpoint.json")
+    return gui.SugarBeetApp(MagicMock())
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """Names of the paths the window sends its runs down"""
+    calls = []
+
+    def simulate(config, *args):
+        calls.append("run_simulation")
+        return {}
+
+    monkeypatch.setattr(gui, "run_simulation", simulate)
+    return calls
+
+
+def test_short_runs_use_the_pipeline(window, routed, config):
+    window._run_simulation(config)
+    assert routed == []
+    assert "strategies" in window.pipeline.recomputed
+
+
+def test_long_runs_are_checkpointed(window, routed, config):
+    experiments = gui.PIPELINE_CELLS // (config.batches * config.batches) + 1
+    window._run_simulation(replace(config, experiments=experiments))
+    assert routed == ["run_simulation"]
+    assert window.pipeline.recomputed == []
+
+
+def test_interrupted_runs_resume_from_their_checkpoint(window, routed, config):
+    averages = {"plan": [0.0] * config.batches}
+    SimulationCheckpoint(gui.CHECKPOINT_PATH).save(
+        config, averages, ExperimentSampler("random", config.experiments, 0))
+    window._run_simulation(config)
+    assert routed == ["run_simulation"]
+
+
+def capacity_window(window, **values):
+    window.capacity_mode.value = True
+    for key, value in values.items():
+        window.fields[key].value = value
+    return window
+
+
+def test_masses_that_fit_the_capacity_are_accepted(window):
+    config = capacity_window(window, tonnage="3000", max_mass="3000")._parse_config()
+    assert config.capacity_mode
+    assert config.max_mass == config.daily_tonnage
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"tonnage": "3000", "max_mass": "3001"}, "переработает"),
+    ({"min_mass": "2000", "max_mass": "1000"}, "Диапазон"),
+    ({"min_mass": "-1"}, "Диапазон"),
+])
+def test_masses_are_checked_before_the_run(window, values, message):
+    with pytest.raises(ValueError, match=message):
+        capacity_window(window, **values)._parse_config()
+
+
+def test_masses_are_ignored_outside_capacity_mode(window):
+    window.fields["max_mass"].value = "9000"
+    assert not window._parse_config().capacity_mode
+
+
+def test_preview_shares_the_run_seed(window):
+    assert window.preview.seed == window.pipeline.seed
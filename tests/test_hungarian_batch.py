@@ -0,0 +1,63 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.algorithms import hungarian_max_algorithm, hungarian_max_batch, plan_totals_batch
+
+# Its only optimum processes batches 0, 2, 1 for 4 + 2 + 5.
+MATRIX = np.array([[4.0, 1.0, 3.0], [2.0, 0.0, 5.0], [3.0, 2.0, 2.0]])
+
+
+def test_known_optimum_in_day_order():
+    totals, plans = hungarian_max_batch(MATRIX[np.newaxis])
+    np.testing.assert_array_equal(plans, [[0, 2, 1]])
+    np.testing.assert_array_equal(totals, [[4.0, 6.0, 11.0]])
+
+
+@pytest.mark.parametrize("workers", [1, 3, 64])
+def test_every_worker_split_solves_every_matrix(stack, workers):
+    values = stack(30, 6)
+    totals, plans = hungarian_max_batch(values, workers)
+    days = np.arange(6)
+    for matrix, plan, total in zip(values, plans, totals):
+        np.testing.assert_allclose(total, np.cumsum(matrix[plan, days]))
+        optimum = max(matrix[list(order), days].sum() for order in itertools.permutations(days))
+        assert total[-1] == pytest.approx(optimum)
+
+
+def test_plans_match_the_single_solver(stack):
+    values = stack(10, 25)
+    _, plans = hungarian_max_batch(values)
+    for matrix, plan in zip(values, plans):
+        assert plan.tolist() == hungarian_max_algorithm(matrix.tolist())[1]
+
+
+def test_ties_give_a_permutation_with_the_tied_optimum():
+    values = np.stack([np.full((3, 3), 2.0), np.eye(3) + np.eye(3)[::-1]])
+    totals, plans = hungarian_max_batch(values)
+    assert (np.sort(plans, axis=1) == np.arange(3)).all()
+    # The second matrix has two optimal plans worth 4 each.
+    np.testing.assert_array_equal(totals[:, -1], [6.0, 4.0])
+
+
+def test_single_batch_and_empty_stack():
+    totals, plans = hungarian_max_batch(np.array([[[7.0]], [[-1.0]]]))
+    np.testing.assert_array_equal(totals, [[7.0], [-1.0]])
+    np.testing.assert_array_equal(plans, [[0], [0]])
+    for result in hungarian_max_batch(np.zeros((0, 4, 4)), workers=4):
+        assert result.shape == (0, 4)
+
+
+def test_bad_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        hungarian_max_batch(MATRIX[np.newaxis], workers=-1)
+    with pytest.raises(ValueError):
+        hungarian_max_batch(np.zeros((2, 3, 4)))
+
+
+def test_fixed_plan_totals():
+    totals = plan_totals_batch(np.stack([MATRIX, 2 * MATRIX]), [2, 0, 1])
+    np.testing.assert_array_equal(totals, [[3.0, 4.0, 9.0], [6.0, 8.0, 18.0]])
+    with pytest.raises(ValueError, match="permutation"):
+        plan_totals_batch(MATRIX[np.newaxis], [0, 0, 1])
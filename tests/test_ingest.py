@@ -0,0 +1,135 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from app.algorithms import adjust_for_inorganic, losses_matrix_from_i0, sugar_matrix_from_initial
+from app.ingest import (
+    BatchRecord,
+    iter_batch_records,
+    iter_chunks,
+    measured_matrix,
+    measured_stack,
+    replay_measurements,
+)
+from app.simulation import evaluate_strategies
+
+FIELDS = ("batch", "sugar", "k", "na", "n", "i0", "coefficients")
+
+
+@pytest.fixture
+def records(rng):
+    return [
+        BatchRecord(
+            batch_id=f"b{index}",
+            sugar=round(rng.uniform(14, 20), 3),
+            k=round(rng.uniform(5, 7), 3),
+            na=round(rng.uniform(0.2, 0.8), 3),
+            n=round(rng.uniform(1.6, 2.8), 3),
+            i0=round(rng.uniform(0.6, 0.7), 3),
+            coefficients=[round(value, 4) for value in rng.uniform(0.9, 1.1, 9)],
+        )
+        for index in range(40)
+    ]
+
+
+def raw(record: BatchRecord):
+    return {
+        "batch": record.batch_id, "sugar": record.sugar, "k": record.k, "na": record.na,
+        "n": record.n, "i0": record.i0, "coefficients": record.coefficients,
+    }
+
+
+def write(path, records):
+    if path.suffix == ".csv":
+        with path.open("w", encoding="utf-8", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(FIELDS)
+            for record in records:
+                item = raw(record)
+                item["coefficients"] = ";".join(map(str, record.coefficients))
+                writer.writerow([item[name] for name in FIELDS])
+    elif path.suffix == ".json":
+        path.write_text(json.dumps([raw(record) for record in records]), encoding="utf-8")
+    else:
+        path.write_text(
+            "".join(json.dumps(raw(record)) + "\n" for record in records), encoding="utf-8")
+    return path
+
+
+def list_matrix(chunk, include_inorganic):
+    """Working matrix built with the list helpers, one batch at a time"""
+    size = len(chunk)
+    matrix = sugar_matrix_from_initial(
+        [record.sugar for record in chunk],
+        [[1.0, *record.coefficients[:size - 1]] for record in chunk])
+    if not include_inorganic:
+        return matrix
+    losses = losses_matrix_from_i0(
+        size, [[record.k, record.na, record.n] for record in chunk],
+        [record.i0 for record in chunk])
+    return adjust_for_inorganic(matrix, losses)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".json", ".jsonl"])
+def test_every_format_reads_the_same_records(tmp_path, records, suffix):
+    assert list(iter_batch_records(write(tmp_path / f"batches{suffix}", records))) == records
+
+
+def test_csv_columns_may_come_in_any_order(tmp_path):
+    path = tmp_path / "batches.csv"
+    path.write_text(
+        "Coefficients,I0,N,Na,K,Sugar,extra\n"
+        "1.01;0.99;,0.63,2.1,0.5,6.0,17.5,x\n"
+        "\n"
+        "1.02;0.98,0.64,2.2,0.4,5.5,16.0,y\n",
+        encoding="utf-8")
+    parsed = list(iter_batch_records(path))
+    assert [record.batch_id for record in parsed] == ["1", "2"]
+    assert parsed[0].coefficients == [1.01, 0.99]
+    assert parsed[1].sugar == 16.0
+
+
+def test_missing_values_name_the_record(tmp_path):
+    path = tmp_path / "batches.csv"
+    path.write_text(
+        "sugar,k,na,n,i0,coefficients\n17,6,0.5,2,0.63,1.0\n17,6,,2,0.63,1.0\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Record 2 is missing fields: na"):
+        list(iter_batch_records(path))
+
+
+@pytest.mark.parametrize("include_inorganic", [True, False])
+@pytest.mark.parametrize("size", [1, 2, 10])
+def test_stack_matches_the_list_builders(records, include_inorganic, size):
+    chunks = list(iter_chunks(records, size))
+    stack = measured_stack(chunks, include_inorganic)
+    assert stack.shape == (len(chunks), size, size)
+    for matrix, chunk in zip(stack, chunks):
+        np.testing.assert_array_equal(matrix, list_matrix(chunk, include_inorganic))
+        assert measured_matrix(chunk, include_inorganic) == matrix.tolist()
+
+
+def test_short_coefficient_lists_are_rejected(records):
+    records[3].coefficients = records[3].coefficients[:4]
+    with pytest.raises(ValueError, match="b3"):
+        measured_stack([records[:10]])
+
+
+def test_replay_averages_every_experiment(tmp_path, records):
+    path = write(tmp_path / "batches.csv", records[:37])
+    averages, experiments = replay_measurements(path, batches=6, ripening_period=2)
+    assert experiments == 6
+    expected = [evaluate_strategies(list_matrix(chunk, True), 2)
+                for chunk in iter_chunks(records[:37], 6)]
+    for name, totals in averages.items():
+        np.testing.assert_allclose(
+            totals, np.mean([summary[name] for summary in expected], axis=0))
+
+
+def test_replay_needs_one_full_experiment(tmp_path, records):
+    path = write(tmp_path / "batches.jsonl", records[:5])
+    with pytest.raises(ValueError, match="enough batches"):
+        replay_measurements(path, batches=6, ripening_period=2)
+    with pytest.raises(ValueError):
+        replay_measurements(path, batches=4, ripening_period=5)
@@ -0,0 +1,72 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.algorithms import greedy_batch, lookahead_batch, rollout_batch
+from app.strategies import STRATEGIES
+
+# Greedy takes batch 0 on day 0 for 10 and is left with 1; the optimum is 9 + 20.
+TRAP = np.array([[[10.0, 20.0], [9.0, 1.0]]])
+
+
+def test_a_day_of_lookahead_avoids_the_greedy_trap():
+    np.testing.assert_array_equal(greedy_batch(TRAP)[0], [[10.0, 11.0]])
+    for totals, plans in (lookahead_batch(TRAP, depth=2), rollout_batch(TRAP, depth=1)):
+        np.testing.assert_array_equal(totals, [[9.0, 29.0]])
+        np.testing.assert_array_equal(plans, [[1, 0]])
+
+
+def test_without_lookahead_both_are_greedy(stack):
+    values = stack(15, 8)
+    greedy = greedy_batch(values)
+    for totals, plans in (lookahead_batch(values, depth=1), rollout_batch(values, depth=0)):
+        np.testing.assert_array_equal(plans, greedy[1])
+        np.testing.assert_allclose(totals, greedy[0])
+
+
+def test_lookahead_over_the_whole_horizon_is_optimal(stack):
+    values = stack(15, 5)
+    totals, plans = lookahead_batch(values, depth=5)
+    days = np.arange(5)
+    for matrix, total in zip(values, totals):
+        optimum = max(matrix[list(plan), days].sum() for plan in itertools.permutations(days))
+        assert total[-1] == pytest.approx(optimum)
+
+
+@pytest.mark.parametrize("kernel", [
+    lambda values: lookahead_batch(values, depth=3),
+    lambda values: rollout_batch(values, depth=3, candidates=2),
+])
+def test_ties_still_give_a_permutation(kernel):
+    values = np.full((2, 4, 4), 5.0)
+    values[1, :2] = 6.0
+    totals, plans = kernel(values)
+    assert (np.sort(plans, axis=1) == np.arange(4)).all()
+    np.testing.assert_array_equal(totals[0], [5.0, 10.0, 15.0, 20.0])
+    # Any order of the richer pair is optimal here; only the total is fixed.
+    assert totals[1, -1] == 22.0
+
+
+@pytest.mark.parametrize("kernel", [lookahead_batch, rollout_batch])
+def test_single_batch_and_empty_stack(kernel):
+    totals, plans = kernel(np.array([[[7.0]], [[3.0]]]))
+    np.testing.assert_array_equal(totals, [[7.0], [3.0]])
+    np.testing.assert_array_equal(plans, [[0], [0]])
+    for result in kernel(np.zeros((0, 6, 6))):
+        assert result.shape == (0, 6)
+
+
+def test_horizons_three_to_five_are_registered():
+    depths = {strategy.parameters["depth"] for strategy in STRATEGIES.values()
+              if strategy.stage.startswith(("lookahead", "rollout"))}
+    assert depths == {3, 4, 5}
+
+
+def test_invalid_horizons_are_rejected():
+    with pytest.raises(ValueError):
+        lookahead_batch(TRAP, depth=0)
+    with pytest.raises(ValueError):
+        rollout_batch(TRAP, depth=-1)
+    with pytest.raises(ValueError):
+        rollout_batch(TRAP, candidates=0)
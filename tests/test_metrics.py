@@ -0,0 +1,70 @@
+import urllib.request
+
+import pytest
+
+from app.metrics import CONTENT_TYPE, MetricsRegistry, export_metrics, serve_metrics
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.counter("runs", "Runs.").inc(3)
+    registry.gauge("rate", "Rate.").set(2.5)
+    latency = registry.histogram("seconds", "Latency.", buckets=(1.0, 0.1))
+    latency.observe(0.25, stage="b")
+    latency.observe(0.5, stage="b")
+    latency.observe(0.05, stage="a")
+    return registry
+
+
+def test_exposition_format(registry):
+    assert registry.render() == "\n".join([
+        "# TYPE runs counter",
+        "# HELP runs Runs.",
+        "runs_total 3",
+        "# TYPE rate gauge",
+        "# HELP rate Rate.",
+        "rate 2.5",
+        "# TYPE seconds histogram",
+        "# HELP seconds Latency.",
+        'seconds_bucket{stage="a",le="0.1"} 1',
+        'seconds_bucket{stage="a",le="1"} 1',
+        'seconds_bucket{stage="a",le="+Inf"} 1',
+        'seconds_sum{stage="a"} 0.05',
+        'seconds_count{stage="a"} 1',
+        'seconds_bucket{stage="b",le="0.1"} 0',
+        'seconds_bucket{stage="b",le="1"} 2',
+        'seconds_bucket{stage="b",le="+Inf"} 2',
+        'seconds_sum{stage="b"} 0.75',
+        'seconds_count{stage="b"} 2',
+        "# EOF",
+    ]) + "\n"
+
+
+def test_duplicate_names_are_rejected(registry):
+    with pytest.raises(ValueError):
+        registry.gauge("runs", "Again.")
+
+
+def test_endpoint_listens_on_loopback_by_default(registry):
+    server = serve_metrics(port=0, registry=registry)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_file_ends_with_the_final_values(registry, tmp_path):
+    path = tmp_path / "sugar.prom"
+    stop = export_metrics(path, interval=60.0, registry=registry)
+    assert "runs_total 3" in path.read_text(encoding="utf-8")
+
+    registry.counter("late", "Registered after the first write.").inc()
+    stop()
+    assert path.read_text(encoding="utf-8") == registry.render()
+    assert not path.with_name(path.name + ".tmp").exists()
@@ -0,0 +1,58 @@
+from dataclasses import replace
+
+import pytest
+
+from app.pipeline import STAGES, IncrementalSimulation, RunCancelled
+
+ALL_STAGES = [stage.name for stage in STAGES]
+AFTER_WORKING = ["working", "strategies", "frequencies", "comparison", "statistics",
+                 "robust_plan", "aggregation"]
+
+
+@pytest.mark.parametrize("include_inorganic, changes, recomputed", [
+    (True, {"max_sugar": 23.0}, ["base_sugar"] + AFTER_WORKING),
+    (True, {"max_k": 7.5}, ["inorganic_losses"] + AFTER_WORKING),
+    (True, {"robust_objective": "mean"}, ["robust_plan", "aggregation"]),
+    (True, {"daily_tonnage": 1000.0}, []),
+    (False, {"max_k": 7.5, "min_i0": 0.6}, []),
+    (False, {"include_inorganic": True}, ["inorganic_losses"] + AFTER_WORKING),
+    (True, {"experiments": 160}, ALL_STAGES),
+    (False, {"experiments": 160},
+     [name for name in ALL_STAGES if name != "inorganic_losses"]),
+])
+def test_only_affected_stages_are_recomputed(config, include_inorganic, changes, recomputed):
+    config = replace(config, include_inorganic=include_inorganic)
+    simulation = IncrementalSimulation(seed=3)
+    simulation.run(config)
+    assert simulation.recomputed == ALL_STAGES
+    simulation.run(replace(config, **changes))
+    assert simulation.recomputed == recomputed
+
+
+@pytest.mark.parametrize("changes", [
+    {"max_sugar": 23.0},
+    {"include_inorganic": False},
+    {"ripening_period": 4},
+    {"robust_objective": "cvar"},
+])
+def test_cached_run_matches_a_fresh_one(config, changes):
+    simulation = IncrementalSimulation(seed=8)
+    simulation.run(config)
+    changed = replace(config, **changes)
+    assert simulation.run(changed) == IncrementalSimulation(seed=8).run(changed)
+
+
+def test_cancelled_run_stops_before_the_next_stage(config):
+    simulation = IncrementalSimulation(seed=1)
+    with pytest.raises(RunCancelled, match="coefficients"):
+        simulation.run(config, cancelled=lambda: True)
+    simulation.run(config)
+    simulation.run(config, cancelled=lambda: True)
+    assert simulation.recomputed == []
+
+
+def test_unsupported_configs_run_the_full_simulation(config):
+    simulation = IncrementalSimulation(seed=1)
+    averages = simulation.run(replace(config, sampling="sobol"))
+    assert simulation.recomputed == ALL_STAGES
+    assert len(next(iter(averages.values()))) == config.batches
@@ -0,0 +1,45 @@
+import threading
+from dataclasses import replace
+
+import pytest
+
+from app.pipeline import IncrementalSimulation
+from app.preview import WhatIfPreview, preview_levels
+
+
+def collect(config, seed: int):
+    """Estimates the preview reports for ``config``, in order"""
+    results = []
+    finished = threading.Event()
+
+    def on_result(requested, averages, experiments):
+        assert requested == config
+        results.append((experiments, averages))
+        if experiments == config.experiments:
+            finished.set()
+
+    preview = WhatIfPreview(on_result, delay=0.0, seed=seed)
+    assert preview.request(config)
+    assert finished.wait(60)
+    return results
+
+
+def test_levels_end_at_the_configured_count(config):
+    assert preview_levels(config) == [16, 64, 150]
+    assert preview_levels(replace(config, experiments=64)) == [16, 64]
+    assert preview_levels(replace(config, experiments=10)) == [10]
+    assert preview_levels(replace(config, sampling="sobol")) == []
+
+
+def test_estimates_are_the_pipeline_results_of_their_level(config):
+    results = collect(config, seed=42)
+    assert [experiments for experiments, _ in results] == [16, 64, 150]
+    for experiments, averages in results:
+        expected = IncrementalSimulation(42).run(replace(config, experiments=experiments))
+        assert averages == expected
+
+
+def test_unsupported_configs_are_not_previewed(config):
+    preview = WhatIfPreview(lambda *args: pytest.fail("previewed"), delay=0.0)
+    assert not preview.request(replace(config, capacity_mode=True))
+
@@ -0,0 +1,53 @@
+import json
+from dataclasses import replace
+
+import pytest
+
+from app.reports import _report_figures, generate_reports, load_configs, save_configs
+from app.strategies import reference_strategy
+
+
+def test_figures_are_in_tonnes_with_losses_against_the_reference(config):
+    config = replace(config, batches=2, daily_tonnage=3000.0)
+    raw = {reference_strategy(): [50.0, 100.0], "Жадный": [40.0, 90.0]}
+    figures = _report_figures(config, raw)
+
+    chart = {trace.name: list(trace.y) for trace in figures["chart"].data}
+    assert chart == {reference_strategy(): [1500.0, 3000.0], "Жадный": [1200.0, 2700.0]}
+    assert list(figures["chart"].data[0].x) == [1, 2]
+
+    losses = figures["losses"].data[0]
+    assert list(losses.x) == ["Жадный"]
+    assert list(losses.y) == pytest.approx([10.0])
+
+    names, scores, shares = figures["summary"].data[0].cells.values
+    assert list(names) == [reference_strategy(), "Жадный"]
+    assert list(scores) == ["3,000 т", "2,700 т"]
+    assert list(shares) == ["-0.00%", "-10.00%"]
+
+
+def test_configs_round_trip(config, tmp_path):
+    path = tmp_path / "configs.json"
+    configs = [config, replace(config, batches=12, sampling="sobol")]
+    save_configs(configs, path)
+    assert load_configs(path) == configs
+
+
+def test_config_file_must_hold_a_list(config, tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"batches": 8}), encoding="utf-8")
+    with pytest.raises(ValueError, match="list"):
+        load_configs(path)
+
+
+@pytest.mark.parametrize("arguments", [
+    {"formats": ("png", "gif")},
+    {"formats": ()},
+    {"names": ["one", "two"]},
+    {"render_tabs": 0},
+])
+def test_bad_requests_fail_before_any_run(config, tmp_path, arguments):
+    output = tmp_path / "reports"
+    with pytest.raises(ValueError):
+        generate_reports([config], output, **arguments)
+    assert not output.exists()
@@ -0,0 +1,92 @@
+import itertools
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app import algorithms, robust
+from app.algorithms import cvar_max_assignment
+from app.robust import lower_tail_mean, mean_plan, robust_plan
+from app.simulation import run_simulation
+
+# Keeping the batches is worth 18 or 2, swapping them 4 or 10: the mean prefers
+# keeping, the worse of the two scenarios prefers swapping.
+SCENARIOS = np.array([[[9.0, 2.0], [2.0, 9.0]], [[1.0, 5.0], [5.0, 1.0]]])
+
+
+def tail_value(stack: np.ndarray, plan, alpha: float) -> float:
+    finals = stack[:, list(plan), np.arange(stack.shape[1])].sum(axis=1)
+    return lower_tail_mean(finals.tolist(), alpha)
+
+
+def brute_force(stack: np.ndarray, alpha: float) -> float:
+    return max(tail_value(stack, plan, alpha)
+               for plan in itertools.permutations(range(stack.shape[1])))
+
+
+def test_mean_and_tail_disagree_on_a_known_pair():
+    assert mean_plan([SCENARIOS]) == [0, 1]
+    assert cvar_max_assignment(SCENARIOS, 0.5) == [1, 0]
+    # Over the whole distribution the CVaR is the mean again.
+    assert cvar_max_assignment(SCENARIOS, 1.0) == [0, 1]
+
+    plan = robust_plan(lambda: iter([SCENARIOS[:1], SCENARIOS[1:]]), "cvar", alpha=0.5)
+    assert plan.permutation == [1, 0]
+    assert plan.totals == [3.5, 7.0]
+    assert (plan.cvar, plan.scenarios) == (4.0, 2)
+
+
+def test_mean_plan_maximises_the_expected_total(stack):
+    values = stack(40, 6)
+    plan = mean_plan([values[:25], values[25:]])
+    expected = max(values.mean(axis=0)[list(candidate), np.arange(6)].sum()
+                   for candidate in itertools.permutations(range(6)))
+    assert values.mean(axis=0)[plan, np.arange(6)].sum() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("alpha", [0.1, 0.5])
+def test_exact_cvar_plan_matches_brute_force(stack, alpha):
+    values = stack(30, 5)
+    plan = cvar_max_assignment(values, alpha, time_limit=10.0)
+    assert tail_value(values, plan, alpha) == pytest.approx(brute_force(values, alpha))
+    heuristic = cvar_max_assignment(values, alpha)
+    assert tail_value(values, heuristic, alpha) <= tail_value(values, plan, alpha) + 1e-9
+
+
+@pytest.mark.parametrize("cells", [1, 7, 40])
+def test_blocked_swap_search_matches_one_block(stack, monkeypatch, cells):
+    values = stack(30, 7)
+    whole = cvar_max_assignment(values, 0.2)
+    # Fewer cells than scenarios still scores one exchange per block.
+    monkeypatch.setattr(algorithms, "_SWAP_CELLS", cells * len(values))
+    assert cvar_max_assignment(values, 0.2) == whole
+    monkeypatch.setattr(algorithms, "_SWAP_CELLS", 1)
+    assert cvar_max_assignment(values, 0.2) == whole
+
+
+def test_ties_single_batch_and_no_scenarios():
+    # Every plan is worth the same, so the mean optimum is kept as it is.
+    tied = np.full((5, 4, 4), 3.0)
+    plan = cvar_max_assignment(tied, 0.2)
+    assert sorted(plan) == [0, 1, 2, 3]
+    assert tail_value(tied, plan, 0.2) == 12.0
+    assert cvar_max_assignment(np.array([[[4.0]], [[1.0]]]), 0.5, time_limit=1.0) == [0]
+    with pytest.raises(ValueError, match="No scenarios"):
+        cvar_max_assignment(np.zeros((0, 3, 3)), 0.5)
+    with pytest.raises(ValueError):
+        cvar_max_assignment(SCENARIOS, 0.0)
+
+
+def test_time_limit_reaches_the_solver(config, monkeypatch):
+    limits = []
+
+    def recording(stack, alpha, time_limit=0.0):
+        limits.append(time_limit)
+        return list(range(stack.shape[1]))
+
+    monkeypatch.setattr(robust, "cvar_max_assignment", recording)
+    config = replace(config, robust_objective="cvar", cvar_time_limit=2.5)
+    run_simulation(config)
+    assert limits == [2.5]
+    with pytest.raises(ValueError):
+        robust_plan(lambda: iter([np.ones((2, 3, 3))]), "cvar", time_limit=-1.0)
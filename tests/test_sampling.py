@@ -0,0 +1,60 @@
+import random
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.sampling import SOBOL_MAX_DIMENSION, ExperimentSampler, _PointStream
+from app.simulation import (
+    build_sampler,
+    coefficient_generator,
+    run_simulation,
+    sampling_dimension,
+)
+from app.strategies import reference_strategy
+
+
+def final_totals(config, scheme: str, seeds) -> np.ndarray:
+    reference = reference_strategy()
+    finals = []
+    for seed in seeds:
+        random.seed(seed)
+        finals.append(run_simulation(replace(config, sampling=scheme))[reference][-1])
+    return np.array(finals)
+
+
+@pytest.mark.parametrize("scheme", ["sobol", "antithetic"])
+def test_scheme_is_no_worse_than_plain_monte_carlo(config, scheme):
+    config = replace(config, experiments=64)
+    plain = final_totals(config, "random", range(12)).var(ddof=1)
+    assert final_totals(config, scheme, range(12)).var(ddof=1) <= plain
+
+
+@pytest.mark.parametrize("scheme", ["random", "sobol", "halton", "lhs", "antithetic"])
+def test_results_are_reproducible_per_seed(config, scheme):
+    config = replace(config, experiments=40)
+    first, again, other = final_totals(config, scheme, [3, 3, 4])
+    assert first == again
+    assert first != other
+
+
+def test_point_stream_refuses_to_run_out_of_coordinates():
+    stream = _PointStream([0.25, 0.5])
+    assert stream.uniform(0.0, 4.0) == 1.0
+    assert stream.uniform(2.0, 4.0) == 3.0
+    with pytest.raises(RuntimeError):
+        stream.uniform(0.0, 1.0)
+
+
+def test_sobol_dimension_is_checked_up_front(config):
+    with pytest.raises(ValueError, match=str(SOBOL_MAX_DIMENSION)):
+        ExperimentSampler("sobol", 10, SOBOL_MAX_DIMENSION + 1)
+    ExperimentSampler("halton", 10, SOBOL_MAX_DIMENSION + 1)
+
+    # 143 batches take 21164 draws per experiment, 144 take 21456.
+    largest = replace(config, batches=143, sampling="sobol")
+    assert sampling_dimension(largest, coefficient_generator(largest)) <= SOBOL_MAX_DIMENSION
+    build_sampler(largest, coefficient_generator(largest))
+    too_large = replace(largest, batches=144)
+    with pytest.raises(ValueError, match="Sobol"):
+        build_sampler(too_large, coefficient_generator(too_large))
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.algorithms import (
+    greedy_algorithm,
+    greedy_batch,
+    greedy_then_thrifty,
+    greedy_then_thrifty_batch,
+    thrifty_algorithm,
+    thrifty_batch,
+    thrifty_then_greedy,
+    thrifty_then_greedy_batch,
+)
+
+MATRIX = np.array([[4.0, 1.0, 3.0], [2.0, 0.0, 5.0], [3.0, 2.0, 2.0]])
+
+PAIRS = [
+    (greedy_batch, greedy_algorithm),
+    (thrifty_batch, thrifty_algorithm),
+    (lambda values: greedy_then_thrifty_batch(values, 2),
+     lambda matrix: greedy_then_thrifty(matrix, 2)),
+    (lambda values: thrifty_then_greedy_batch(values, 2),
+     lambda matrix: thrifty_then_greedy(matrix, 2)),
+]
+
+
+@pytest.mark.parametrize("kernel, plan, totals", [
+    (greedy_batch, [0, 2, 1], [4.0, 6.0, 11.0]),
+    (thrifty_batch, [1, 0, 2], [2.0, 3.0, 5.0]),
+    (lambda values: greedy_then_thrifty_batch(values, 1), [0, 1, 2], [4.0, 4.0, 6.0]),
+    (lambda values: thrifty_then_greedy_batch(values, 1), [1, 2, 0], [2.0, 4.0, 7.0]),
+])
+def test_known_plans_of_a_small_matrix(kernel, plan, totals):
+    result_totals, result_plans = kernel(MATRIX[np.newaxis])
+    np.testing.assert_array_equal(result_plans, [plan])
+    np.testing.assert_array_equal(result_totals, [totals])
+
+
+@pytest.mark.parametrize("batch, single", PAIRS[:2])
+def test_selection_kernels_match_single_algorithms(stack, batch, single):
+    values = stack(20, 9)
+    totals, plans = batch(values)
+    for index, matrix in enumerate(values):
+        expected_totals, expected_plan = single(matrix.tolist())
+        assert plans[index].tolist() == expected_plan
+        np.testing.assert_allclose(totals[index], expected_totals)
+
+
+@pytest.mark.parametrize("batch, single", [
+    (greedy_then_thrifty_batch, greedy_then_thrifty),
+    (thrifty_then_greedy_batch, thrifty_then_greedy),
+])
+@pytest.mark.parametrize("ripening_period", [0, 4, 9])
+def test_phased_kernels_match_single_algorithms(stack, batch, single, ripening_period):
+    values = stack(20, 9)
+    totals, plans = batch(values, ripening_period)
+    for index, matrix in enumerate(values):
+        expected_totals, expected_plan = single(matrix.tolist(), ripening_period)
+        assert plans[index].tolist() == expected_plan
+        np.testing.assert_allclose(totals[index], expected_totals)
+
+
+@pytest.mark.parametrize("batch, single", PAIRS)
+def test_ties_break_like_the_single_algorithms(rng, batch, single):
+    # Three distinct values on a 6 x 6 matrix leave ties on almost every day.
+    values = rng.integers(0, 3, size=(25, 6, 6)).astype(float)
+    values[0] = 1.0
+    totals, plans = batch(values)
+    # With every value equal the first free batch is taken each day.
+    np.testing.assert_array_equal(plans[0], np.arange(6))
+    for index, matrix in enumerate(values):
+        expected_totals, expected_plan = single(matrix.tolist())
+        assert plans[index].tolist() == expected_plan
+        np.testing.assert_array_equal(totals[index], expected_totals)
+
+
+@pytest.mark.parametrize("kernel", [
+    greedy_batch,
+    thrifty_batch,
+    lambda values: greedy_then_thrifty_batch(values, 1),
+    lambda values: thrifty_then_greedy_batch(values, 0),
+])
+def test_single_batch_and_empty_stack(kernel):
+    totals, plans = kernel(np.array([[[7.0]], [[3.0]]]))
+    np.testing.assert_array_equal(totals, [[7.0], [3.0]])
+    np.testing.assert_array_equal(plans, [[0], [0]])
+    for result in kernel(np.zeros((0, 6, 6))):
+        assert result.shape == (0, 6)
+
+
+@pytest.mark.parametrize("kernel", [greedy_then_thrifty_batch, thrifty_then_greedy_batch])
+@pytest.mark.parametrize("ripening_period", [-1, 4])
+def test_ripening_outside_the_horizon_is_rejected(kernel, ripening_period):
+    with pytest.raises(ValueError, match="Ripening period"):
+        kernel(MATRIX[np.newaxis], ripening_period)
+
+
+def test_non_square_stack_is_rejected():
+    with pytest.raises(ValueError):
+        greedy_batch(np.zeros((2, 3, 4)))
+    with pytest.raises(ValueError):
+        thrifty_batch(np.zeros((2, 0, 0)))
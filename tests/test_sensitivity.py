@@ -0,0 +1,135 @@
+import itertools
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.algorithms import (
+    assignment_tolerances,
+    assignment_tolerances_batch,
+    hungarian_max_potentials,
+    hungarian_max_potentials_batch,
+)
+from app.sensitivity import SensitivityReport, run_sensitivity
+
+
+def brute_force_tolerances(matrix: np.ndarray, plan: np.ndarray) -> np.ndarray:
+    """Optimum minus the best plan that moves each batch off its planned day, by batch"""
+    days = np.arange(len(matrix))
+    plans = [np.array(other) for other in itertools.permutations(days)]
+    optimum = matrix[plan, days].sum()
+    tolerances = np.empty(len(matrix))
+    for day, batch in enumerate(plan):
+        others = [matrix[other, days].sum() for other in plans if other[day] != batch]
+        tolerances[batch] = optimum - max(others) if others else np.inf
+    return tolerances
+
+
+def test_prices_are_optimal_duals(stack, rng):
+    values = np.concatenate([stack(20, 7), rng.integers(0, 5, (20, 7, 7)).astype(float)])
+    totals, plans, row_prices, col_prices = hungarian_max_potentials_batch(values)
+    for index, matrix in enumerate(values):
+        slack = row_prices[index][:, np.newaxis] + col_prices[index] - matrix
+        assert slack.min() >= -1e-9
+        np.testing.assert_allclose(slack[plans[index], np.arange(7)], 0.0, atol=1e-9)
+        assert row_prices[index].sum() + col_prices[index].sum() == pytest.approx(
+            totals[index, -1])
+        assert col_prices[index].min() == pytest.approx(0.0)
+
+
+def test_single_matrix_prices_match_the_batch(stack):
+    matrix = stack(1, 8)[0]
+    totals, plan, row_prices, col_prices = hungarian_max_potentials(matrix.tolist())
+    batch = hungarian_max_potentials_batch(matrix[np.newaxis])
+    np.testing.assert_allclose(totals, batch[0][0])
+    assert plan == batch[1][0].tolist()
+    tolerances = assignment_tolerances(matrix.tolist(), plan, row_prices, col_prices)
+    np.testing.assert_allclose(tolerances, brute_force_tolerances(matrix, np.array(plan)))
+
+
+def test_single_matrix_totals_are_in_day_order():
+    # Batch 0 goes on day 1 and batch 1 on day 0.
+    matrix = [[1.0, 5.0], [4.0, 2.0]]
+    totals, plan, _, _ = hungarian_max_potentials(matrix)
+    assert plan == [1, 0]
+    assert totals == [4.0, 9.0]
+
+
+def test_known_margins_of_a_two_by_two_matrix():
+    # Swapping the plan loses 9 - 3, whichever batch is moved.
+    values = np.array([[[1.0, 5.0], [4.0, 2.0]]])
+    totals, plans, row_prices, col_prices = hungarian_max_potentials_batch(values)
+    np.testing.assert_array_equal(totals, [[4.0, 9.0]])
+    np.testing.assert_array_equal(plans, [[1, 0]])
+    tolerances = assignment_tolerances_batch(values, plans, row_prices, col_prices)
+    np.testing.assert_allclose(tolerances, [[6.0, 6.0]])
+
+
+def test_tied_plans_leave_no_margin():
+    values = np.full((2, 4, 4), 2.0)
+    totals, plans, row_prices, col_prices = hungarian_max_potentials_batch(values)
+    np.testing.assert_array_equal(totals, [[2.0, 4.0, 6.0, 8.0]] * 2)
+    assert (np.sort(plans, axis=1) == np.arange(4)).all()
+    tolerances = assignment_tolerances_batch(values, plans, row_prices, col_prices)
+    np.testing.assert_allclose(tolerances, 0.0, atol=1e-12)
+
+
+def test_single_batch_and_empty_stack_prices():
+    values = np.array([[[5.0]], [[2.0]]])
+    totals, plans, row_prices, col_prices = hungarian_max_potentials_batch(values)
+    np.testing.assert_array_equal(totals, [[5.0], [2.0]])
+    np.testing.assert_array_equal(plans, [[0], [0]])
+    np.testing.assert_allclose(row_prices + col_prices, totals)
+    np.testing.assert_array_equal(
+        assignment_tolerances_batch(values, plans, row_prices, col_prices), [[np.inf]] * 2)
+    empty = hungarian_max_potentials_batch(np.zeros((0, 3, 3)))
+    assert [result.shape for result in empty] == [(0, 3)] * 4
+    assert assignment_tolerances_batch(np.zeros((0, 3, 3)), *empty[1:]).shape == (0, 3)
+
+
+@pytest.mark.parametrize("size", [2, 4, 6])
+def test_tolerances_match_brute_force(stack, size):
+    values = stack(15, size)
+    _, plans, row_prices, col_prices = hungarian_max_potentials_batch(values)
+    tolerances = assignment_tolerances_batch(values, plans, row_prices, col_prices)
+    for index, matrix in enumerate(values):
+        np.testing.assert_allclose(
+            tolerances[index], brute_force_tolerances(matrix, plans[index]), atol=1e-9)
+
+
+def test_report_means_do_not_depend_on_chunking(stack):
+    values = stack(30, 6)
+    whole = SensitivityReport(size=6)
+    whole.add_stack(values)
+    chunked = SensitivityReport(size=6)
+    for start in range(0, 30, 7):
+        chunked.add_stack(values[start:start + 7])
+    chunked.add_stack(values[:0])
+    assert chunked.experiments == whole.experiments == 30
+    assert chunked.optimum == pytest.approx(whole.optimum)
+    for name in ("batch_prices", "day_prices", "batch_tolerance", "batch_min_tolerance"):
+        np.testing.assert_allclose(getattr(chunked, name), getattr(whole, name))
+
+    _, plans, row_prices, col_prices = hungarian_max_potentials_batch(values)
+    tolerances = assignment_tolerances_batch(values, plans, row_prices, col_prices)
+    np.testing.assert_allclose(whole.batch_tolerance, tolerances.mean(axis=0))
+    np.testing.assert_allclose(whole.batch_prices, row_prices.mean(axis=0))
+
+
+def test_single_batch_has_an_infinite_margin():
+    report = SensitivityReport(size=1)
+    report.add([[5.0]])
+    report.add([[7.0]])
+    assert report.optimum == pytest.approx(6.0)
+    assert report.batch_tolerance == [np.inf]
+    assert report.finite_tolerances == [0]
+
+
+def test_run_sensitivity(config):
+    report = run_sensitivity(replace(config, experiments=70))
+    assert report.experiments == 70
+    assert len(report.batch_tolerance) == config.batches
+    assert all(np.isfinite(report.batch_tolerance))
+    assert min(report.batch_min_tolerance) >= 0
+    with pytest.raises(ValueError):
+        run_sensitivity(replace(config, experiments=0))
@@ -0,0 +1,54 @@
+import os
+import signal
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+
+import pytest
+
+from app.server import ComputePool, PoolBusyError
+
+
+@pytest.fixture
+def pool():
+    pool = ComputePool(max_workers=1, max_pending=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_queue_behind_each_other(pool, config):
+    first = pool.submit(config)
+    second = pool.submit(replace(config, max_sugar=23.0))
+    assert pool.pending == 2
+    assert pool.submit(config) is first
+
+    averages, frequencies, comparison, statistics = first.result(timeout=60)
+    assert all(len(totals) == config.batches for totals in averages.values())
+    assert statistics.experiments == config.experiments
+    second.result(timeout=60)
+    assert pool.pending == 0
+
+    # Finished runs are answered from the store.
+    assert pool.submit(config).result(timeout=0)[0] == averages
+
+
+def test_full_queue_rejects_new_runs(pool, config):
+    slow = replace(config, experiments=1000)
+    running = [pool.submit(slow), pool.submit(replace(slow, max_sugar=23.0))]
+    with pytest.raises(PoolBusyError):
+        pool.submit(replace(slow, max_sugar=24.0))
+    # Joining a run already in flight is not a new run.
+    assert pool.submit(slow) is running[0]
+
+
+def test_pool_recovers_from_a_dead_worker(pool, config):
+    doomed = pool.submit(replace(config, experiments=20000))
+    while not pool._executor._processes:
+        pass
+    for pid in list(pool._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+    with pytest.raises(BrokenProcessPool):
+        doomed.result(timeout=60)
+    assert pool.pending == 0
+
+    averages = pool.submit(config).result(timeout=60)[0]
+    assert all(len(totals) == config.batches for totals in averages.values())
@@ -0,0 +1,94 @@
+from dataclasses import replace
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from app import shared
+from app.pipeline import RunCancelled
+from app.shared import SharedArrays, attach_arrays, run_shared
+from app.simulation import CHUNK_SIZE
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Every block run_shared creates"""
+    blocks = []
+
+    class Recording(SharedArrays):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            blocks.append(self)
+
+    monkeypatch.setattr(shared, "SharedArrays", Recording)
+    return blocks
+
+
+def assert_unlinked(block: SharedArrays) -> None:
+    assert block.released
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=block.layout.block)
+
+
+def test_outputs_do_not_depend_on_worker_count(config):
+    config = replace(config, experiments=3 * CHUNK_SIZE + 5)
+    with run_shared(config, workers=1, seed=7, shard_size=CHUNK_SIZE) as single, \
+            run_shared(config, workers=2, seed=7, shard_size=CHUNK_SIZE) as parallel:
+        assert single.experiments == parallel.experiments == config.experiments
+        for name in single.names:
+            np.testing.assert_array_equal(single.totals[name], parallel.totals[name])
+            np.testing.assert_array_equal(single.plans[name], parallel.plans[name])
+        assert single.averages() == parallel.averages()
+
+
+def test_outputs_follow_the_written_matrices(config):
+    config = replace(config, experiments=100)
+    with run_shared(config, workers=2, seed=3, shard_size=40, matrices=True) as outputs:
+        matrices = outputs.matrices
+        assert matrices.shape == (100, config.batches, config.batches)
+        assert np.count_nonzero(matrices.any(axis=(1, 2))) == 100
+        days = np.arange(config.batches)
+        for name in outputs.names:
+            plans = outputs.plans[name]
+            assert (np.sort(plans, axis=1) == days).all()
+            picked = matrices[np.arange(100)[:, np.newaxis], plans, days]
+            np.testing.assert_allclose(outputs.totals[name], np.cumsum(picked, axis=1))
+            worst = np.diff(outputs.totals[name], axis=1, prepend=0.0).min(axis=1).mean()
+            assert outputs.worst_days()[name] == pytest.approx(worst)
+
+
+def test_release_unlinks_the_block_and_keeps_views(config, created):
+    outputs = run_shared(replace(config, experiments=20), workers=1, seed=1)
+    name = outputs.names[0]
+    totals = outputs.totals[name]
+    expected = totals.copy()
+    outputs.release()
+    assert_unlinked(created[0])
+    np.testing.assert_array_equal(totals, expected)
+
+
+def test_cancelled_run_unlinks_the_block(config, created):
+    config = replace(config, experiments=40 * CHUNK_SIZE)
+    with pytest.raises(RunCancelled):
+        run_shared(config, workers=1, seed=1, shard_size=CHUNK_SIZE, cancelled=lambda: True)
+    assert_unlinked(created[0])
+
+
+def test_failing_worker_unlinks_the_block(config, created):
+    config = replace(config, experiments=10, ripening_period=config.batches + 1)
+    with pytest.raises(ValueError):
+        run_shared(config, workers=1, seed=1)
+    assert_unlinked(created[0])
+
+
+def test_attached_views_write_into_the_owner():
+    with SharedArrays({"values": ((2, 3), np.dtype(float))}) as block:
+        with attach_arrays(block.layout) as arrays:
+            arrays["values"][1] = [1.0, 2.0, 3.0]
+        np.testing.assert_array_equal(block.arrays["values"], [[0, 0, 0], [1, 2, 3]])
+    assert_unlinked(block)
+
+
+def test_empty_run_is_rejected(config):
+    with pytest.raises(ValueError):
+        run_shared(replace(config, experiments=0))
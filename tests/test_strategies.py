@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from app.simulation import evaluate_strategies
+from app.strategies import (
+    STRATEGIES,
+    Strategy,
+    active_strategies,
+    reference_strategy,
+    register_strategy,
+    unregister_strategy,
+)
+
+
+def diagonal(matrix, ripening_period, offset=0):
+    """Process batch ``(d + offset) mod n`` on day ``d``"""
+    size = len(matrix)
+    plan = [(day + offset) % size for day in range(size)]
+    return np.cumsum([matrix[plan[day]][day] for day in range(size)]).tolist(), plan
+
+
+@pytest.fixture
+def plugin():
+    strategy = register_strategy(Strategy(
+        name="Сдвиг", stage="shift", function=diagonal, parameters={"offset": 1}))
+    yield strategy
+    unregister_strategy(strategy.name)
+
+
+def test_plugin_runs_its_function_per_matrix_with_its_parameters(plugin):
+    stack = np.array([[[1.0, 2.0], [3.0, 4.0]], [[5.0, 6.0], [7.0, 8.0]]])
+    totals, plans = plugin.run_batch(stack, ripening_period=1)
+    np.testing.assert_array_equal(totals, [[3.0, 5.0], [7.0, 13.0]])
+    np.testing.assert_array_equal(plans, [[1, 0], [1, 0]])
+
+
+def test_plugin_joins_every_run_in_registration_order(plugin):
+    results = evaluate_strategies([[1.0, 4.0], [3.0, 2.0]], ripening_period=1)
+    assert list(results) == list(STRATEGIES)
+    assert list(results)[-1] == "Сдвиг"
+    assert results["Сдвиг"] == [3.0, 7.0]
+    # The shifted plan is the only optimum of this matrix.
+    assert results[reference_strategy()] == [3.0, 7.0]
+
+
+def test_strategies_without_capacity_variant_skip_capacity_runs(plugin):
+    assert plugin in active_strategies()
+    assert plugin not in active_strategies(capacity_mode=True)
+    with pytest.raises(ValueError, match="capacity"):
+        plugin.run_capacity([[1.0]], [1.0], [1.0], 0)
+
+
+def test_registry_rejects_conflicts(plugin):
+    with pytest.raises(ValueError, match="already registered"):
+        register_strategy(Strategy(name="Сдвиг", stage="shift", function=diagonal))
+    with pytest.raises(ValueError, match="reference"):
+        register_strategy(Strategy(
+            name="Другой эталон", stage="other", function=diagonal, reference=True))
+    with pytest.raises(ValueError, match="function or a kernel"):
+        Strategy(name="Пустой", stage="empty")
+    with pytest.raises(ValueError, match="not registered"):
+        unregister_strategy("Пустой")
+
+
+def test_replacing_keeps_the_display_position(plugin):
+    names = list(STRATEGIES)
+    replacement = register_strategy(
+        Strategy(name="Сдвиг", stage="shift", function=diagonal), replace=True)
+    assert list(STRATEGIES) == names
+    assert STRATEGIES["Сдвиг"] is replacement
+    assert replacement.parameters == {}
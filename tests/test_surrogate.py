@@ -0,0 +1,94 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app import surrogate as surrogate_module
+from app.global_sensitivity import Factor, design_config
+from app.surrogate import Surrogate, code_fingerprint, fit_surrogate
+
+FACTORS = [Factor("max_sugar", 20.0, 24.0), Factor("ripening_period", 2, 4, integer=True)]
+
+
+@pytest.fixture
+def surrogate(config):
+    return fit_surrogate(replace(config, experiments=64), FACTORS, samples=16, workers=1)
+
+
+def test_answers_reproduce_the_training_runs(surrogate):
+    for point, values in zip(surrogate.inputs, surrogate.values):
+        designed = design_config(
+            surrogate.base, FACTORS, [min(coordinate, 0.999) for coordinate in point])
+        estimate = surrogate.predict(designed)
+        assert estimate is not None
+        optimum = estimate.finals[surrogate.names[0]]
+        assert optimum == pytest.approx(values[0], rel=1e-3)
+        losses = [estimate.losses[name] for name in surrogate.names[1:]]
+        np.testing.assert_allclose(losses, values[1:], atol=0.05)
+
+
+def test_ignored_fields_stay_covered(surrogate):
+    config = replace(surrogate.base, experiments=5000, daily_tonnage=1000.0,
+                     sampling="sobol", cvar_time_limit=3.0)
+    assert surrogate.covers(config)
+    assert surrogate.predict(config) is not None
+
+
+@pytest.mark.parametrize("changes", [
+    {"robust_objective": "mean"},
+    {"robust_objective": "cvar"},
+    {"capacity_mode": True, "min_mass": 1.0, "max_mass": 2.0},
+    {"min_sugar": 13.0},
+    {"include_inorganic": False},
+])
+def test_untrained_fields_fall_back_to_simulation(surrogate, changes):
+    config = replace(surrogate.base, **changes)
+    assert not surrogate.covers(config)
+    assert surrogate.predict(config) is None
+
+
+@pytest.mark.parametrize("changes", [
+    {"max_sugar": 19.9},
+    {"max_sugar": 24.5},
+    {"ripening_period": 1},
+    {"ripening_period": 5},
+])
+def test_values_outside_the_trained_ranges_are_rejected(surrogate, changes):
+    assert surrogate.predict(replace(surrogate.base, **changes)) is None
+
+
+def test_factor_coordinates_reject_extrapolation():
+    assert FACTORS[0].coordinate(22.0) == pytest.approx(0.5)
+    assert FACTORS[1].coordinate(3) == pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        FACTORS[0].coordinate(24.01)
+    with pytest.raises(ValueError):
+        FACTORS[1].coordinate(5)
+
+
+def test_saved_model_answers_the_same(surrogate, tmp_path):
+    path = tmp_path / "surrogate.npz"
+    surrogate.save(path)
+    loaded = Surrogate.load(path)
+    config = replace(surrogate.base, max_sugar=21.3, ripening_period=3)
+    assert loaded.predict(config) == surrogate.predict(config)
+
+
+def test_model_of_other_code_is_rejected(surrogate, tmp_path, monkeypatch):
+    path = tmp_path / "surrogate.npz"
+    surrogate.save(path)
+    monkeypatch.setattr(surrogate_module, "ALGORITHM_VERSION",
+                        surrogate_module.ALGORITHM_VERSION + 1)
+    with pytest.raises(ValueError, match="refit"):
+        Surrogate.load(path)
+
+
+def test_fingerprint_without_sources(monkeypatch):
+    from_sources = code_fingerprint()
+    assert code_fingerprint() == from_sources
+    monkeypatch.setattr(surrogate_module, "_source", lambda item: None)
+    compiled = code_fingerprint()
+    assert compiled != from_sources
+    monkeypatch.setattr(surrogate_module, "ALGORITHM_VERSION",
+                        surrogate_module.ALGORITHM_VERSION + 1)
+    assert code_fingerprint() != compiled